@@ -6,13 +6,97 @@
 
 import os
 import shutil
+import argparse
 
 # Corrected import to match the function name in module_three.py
-from module_one import process_file_for_ocr
+from module_one import process_file_for_ocr, ORIENTATION_STRATEGIES, SKEW_MODES, DEFAULT_DPI
 from module_two import run_ocr_on_folder
 from module_three import run_extraction_on_folder
+from pipeline import (run_pipeline_parallel, run_pipeline_streaming, run_pipeline_incremental,
+                      run_pipeline_staged, STAGE_NAMES)
+from result_cache import ResultCache, DEFAULT_CACHE_DIR
+from ocr_backend import BACKEND_NAMES, set_default_backend
+from token_store import TOKEN_FORMATS
+from ingest_daemon import IngestDaemon, DEFAULT_SETTLE, DEFAULT_POLL_INTERVAL
+import metrics
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lab report digitization pipeline")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for per-page preprocess/OCR/extract (1 = sequential)")
+    parser.add_argument("--no-artifacts", action="store_true",
+                        help="Stream pages in memory without writing cleaned images or token CSVs")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Keep previous outputs and only process new or changed reports")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="Directory of the content-hash result cache (used by --incremental)")
+    parser.add_argument("--cache-size-mb", type=int, default=2048,
+                        help="Maximum result cache size before LRU eviction")
+    parser.add_argument("--ocr-backend", choices=BACKEND_NAMES, default="auto",
+                        help="OCR engine: persistent tesserocr engines, pytesseract subprocesses, "
+                             "or auto (tesserocr when installed)")
+    parser.add_argument("--orientation", choices=ORIENTATION_STRATEGIES, default="osd",
+                        help="Page orientation check: OSD on every page, a cheap heuristic with OSD "
+                             "only when unsure, or judged from a single OCR pass")
+    parser.add_argument("--skew", choices=SKEW_MODES, default="exact",
+                        help="Skew estimation: every dark pixel at full resolution, the same on a "
+                             "downscaled copy, or a projection-profile search on sampled ink points")
+    parser.add_argument("--grayscale-render", action="store_true",
+                        help="Have poppler render PDF pages directly in grayscale")
+    parser.add_argument("--render-threads", type=int, default=1,
+                        help="PDF pages rendered ahead in background threads while a page is processed")
+    parser.add_argument("--no-text-layer", action="store_true",
+                        help="Always OCR PDF pages, even when they carry an embedded text layer")
+    parser.add_argument("--dpi", type=lambda v: v if v == "auto" else int(v), default=DEFAULT_DPI,
+                        help="PDF rendering resolution, or 'auto' to pick the lowest DPI that keeps "
+                             "text large enough for OCR on each page")
+    parser.add_argument("--roi-ocr", action="store_true",
+                        help="OCR only the detected text blocks of each page instead of the full page")
+    parser.add_argument("--token-format", choices=TOKEN_FORMATS, default="bin",
+                        help="OCR token artifacts: one columnar store per report, or legacy per-page CSV")
+    parser.add_argument("--staged", action="store_true",
+                        help="Run rasterize, preprocess, OCR, extract and write concurrently as "
+                             "stages connected by bounded queues (--workers sets the OCR threads)")
+    parser.add_argument("--stage-workers", default="",
+                        help="Threads per stage with --staged/--watch, e.g. 'preprocess=2,ocr=4'")
+    parser.add_argument("--queue-size", type=int, default=4,
+                        help="Pages allowed to wait in front of each stage with --staged/--watch")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running: process reports as they are dropped into the input "
+                             "folder (staged pipeline; previous outputs are kept)")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                        help="Seconds a dropped file must stay unchanged before --watch processes it")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between folder scans when --watch cannot use inotify")
+    parser.add_argument("--poll", action="store_true",
+                        help="Make --watch poll the input folder instead of using inotify "
+                             "(e.g. on network shares)")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Append per-page stage timings and a run summary to this JSON Lines file")
+    args = parser.parse_args()
+    set_default_backend(args.ocr_backend)
+    metrics.configure(args.metrics_file)
+
+    # The original folder-to-folder Module 1 -> 2 -> 3 flow only supports the
+    # baseline settings (full OCR of every page, OSD orientation, exact deskew)
+    legacy_flow = (args.workers == 1 and not args.staged and not args.watch
+                   and not args.no_artifacts and args.no_text_layer
+                   and args.orientation == "osd" and args.skew == "exact"
+                   and not args.grayscale_render and args.dpi == DEFAULT_DPI
+                   and not args.roi_ocr)
+    options = {'orientation': args.orientation, 'skew': args.skew,
+               'grayscale': args.grayscale_render, 'render_threads': args.render_threads,
+               'text_layer': not args.no_text_layer, 'dpi': args.dpi, 'roi': args.roi_ocr,
+               'token_format': args.token_format}
+
+    stage_workers = {'ocr': args.workers}
+    for entry in filter(None, args.stage_workers.split(",")):
+        name, _, count = entry.partition("=")
+        if name.strip() not in STAGE_NAMES or not count.strip().isdigit():
+            parser.error(f"--stage-workers: expected <stage>=<threads> with a stage in "
+                         f"{', '.join(STAGE_NAMES)}, got '{entry}'")
+        stage_workers[name.strip()] = max(1, int(count))
+
     # Define project directories
     INPUT_FOLDER = "input_reports"
     CLEANED_IMAGES_FOLDER = "output_cleaned_images"
@@ -24,27 +108,79 @@ if __name__ == "__main__":
     print(f"Student: Soham Chawla (2022A7PS0069P)")
     print("=" * 70)
 
-    # Clean up previous runs
-    if os.path.exists(CLEANED_IMAGES_FOLDER): shutil.rmtree(CLEANED_IMAGES_FOLDER)
-    if os.path.exists(OCR_TOKEN_FOLDER): shutil.rmtree(OCR_TOKEN_FOLDER)
-    if os.path.exists(EXTRACTION_FOLDER): shutil.rmtree(EXTRACTION_FOLDER)
+    # Clean up previous runs (incremental and watch runs reuse them)
+    if not args.incremental and not args.watch:
+        if os.path.exists(CLEANED_IMAGES_FOLDER): shutil.rmtree(CLEANED_IMAGES_FOLDER)
+        if os.path.exists(OCR_TOKEN_FOLDER): shutil.rmtree(OCR_TOKEN_FOLDER)
+        if os.path.exists(EXTRACTION_FOLDER): shutil.rmtree(EXTRACTION_FOLDER)
     
-    if not os.path.exists(INPUT_FOLDER) or not os.listdir(INPUT_FOLDER):
+    if args.watch:
+        # === MODULES 1-3: WATCH-FOLDER INGESTION ===
+        print("\n" + "=" * 70)
+        print("MODULES 1-3: WATCH-FOLDER INGESTION")
+        print("=" * 70)
+        IngestDaemon(INPUT_FOLDER, EXTRACTION_FOLDER,
+                     cleaned_dir=None if args.no_artifacts else CLEANED_IMAGES_FOLDER,
+                     tokens_dir=None if args.no_artifacts else OCR_TOKEN_FOLDER,
+                     stage_workers=stage_workers, queue_size=args.queue_size, options=options,
+                     settle=args.settle, poll_interval=args.poll_interval,
+                     use_inotify=not args.poll).run()
+    elif not os.path.exists(INPUT_FOLDER) or not os.listdir(INPUT_FOLDER):
         print(f"\n❌ Input folder '{INPUT_FOLDER}' is missing or empty.")
+    elif args.incremental:
+        # === MODULES 1-3: INCREMENTAL EXECUTION ===
+        print("\n" + "=" * 70)
+        print("MODULES 1-3: INCREMENTAL EXECUTION")
+        print("=" * 70)
+        cache = ResultCache(args.cache_dir, max_bytes=args.cache_size_mb * 1024 * 1024)
+        run_pipeline_incremental(
+            INPUT_FOLDER, EXTRACTION_FOLDER, cache,
+            cleaned_dir=None if args.no_artifacts else CLEANED_IMAGES_FOLDER,
+            tokens_dir=None if args.no_artifacts else OCR_TOKEN_FOLDER,
+            workers=args.workers,
+            options=options,
+        )
+        print("\n🎉 PIPELINE COMPLETE!")
+    elif args.staged:
+        # === MODULES 1-3: STAGED (PIPELINED) EXECUTION ===
+        print("\n" + "=" * 70)
+        print("MODULES 1-3: STAGED EXECUTION")
+        print("=" * 70)
+        run_pipeline_staged(INPUT_FOLDER, EXTRACTION_FOLDER,
+                            cleaned_dir=None if args.no_artifacts else CLEANED_IMAGES_FOLDER,
+                            tokens_dir=None if args.no_artifacts else OCR_TOKEN_FOLDER,
+                            stage_workers=stage_workers, queue_size=args.queue_size,
+                            options=options)
+        print("\n🎉 PIPELINE COMPLETE!")
+    elif not legacy_flow:
+        cleaned_dir = None if args.no_artifacts else CLEANED_IMAGES_FOLDER
+        tokens_dir = None if args.no_artifacts else OCR_TOKEN_FOLDER
+        # === MODULES 1-3: IN-MEMORY PER-PAGE EXECUTION ===
+        print("\n" + "=" * 70)
+        print(f"MODULES 1-3: STREAMING EXECUTION ({args.workers} worker(s))")
+        print("=" * 70)
+        if args.workers > 1:
+            run_pipeline_parallel(INPUT_FOLDER, cleaned_dir, tokens_dir,
+                                  EXTRACTION_FOLDER, workers=args.workers, options=options)
+        else:
+            run_pipeline_streaming(INPUT_FOLDER, EXTRACTION_FOLDER, cleaned_dir, tokens_dir,
+                                   options=options)
+        print("\n🎉 PIPELINE COMPLETE!")
     else:
         # === MODULE 1: PREPROCESSING ===
         print("\n" + "=" * 70)
         print("MODULE 1: FILE INPUT & PREPROCESSING")
         print("=" * 70)
         for file_name in os.listdir(INPUT_FOLDER):
-            process_file_for_ocr(os.path.join(INPUT_FOLDER, file_name), CLEANED_IMAGES_FOLDER)
+            process_file_for_ocr(os.path.join(INPUT_FOLDER, file_name), CLEANED_IMAGES_FOLDER,
+                                 thread_count=args.render_threads)
         print("\n✓ Module 1 (Preprocessing) complete.")
 
         # === MODULE 2: OCR & TOKENIZATION ===
         print("\n" + "=" * 70)
         print("MODULE 2: OCR & TOKENIZATION")
         print("=" * 70)
-        run_ocr_on_folder(CLEANED_IMAGES_FOLDER, OCR_TOKEN_FOLDER)
+        run_ocr_on_folder(CLEANED_IMAGES_FOLDER, OCR_TOKEN_FOLDER, token_format=args.token_format)
         print("\n✓ Module 2 (OCR & Tokenization) complete.")
 
         # === MODULE 3: RULE-BASED EXTRACTION ===
@@ -66,4 +202,10 @@ if __name__ == "__main__":
         print("\nOutput directories:")
         print(f"  1. Cleaned images: ./{CLEANED_IMAGES_FOLDER}/")
         print(f"  2. OCR tokens:     ./{OCR_TOKEN_FOLDER}/")
-        print(f"  3. Extracted JSON: ./{EXTRACTION_FOLDER}/")
\ No newline at end of file
+        print(f"  3. Extracted JSON: ./{EXTRACTION_FOLDER}/")
+
+    # Where the time went (all modes)
+    metrics.print_stage_summary()
+    mode = ("watch" if args.watch else "incremental" if args.incremental else "staged" if args.staged
+            else "legacy" if legacy_flow else "parallel" if args.workers > 1 else "streaming")
+    metrics.emit_run_summary(mode=mode, workers=args.workers)
\ No newline at end of file
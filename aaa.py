@@ -9,28 +9,11 @@ import re
 import json
 import pandas as pd
 
+from module_three import group_tokens_into_token_lines, CATALOG
+
 def group_tokens_into_lines(df, y_tolerance=20):
     """Group tokens into lines by y-coordinate."""
-    lines = []
-    df_sorted = df.sort_values(['top', 'left']).reset_index(drop=True)
-    
-    current_line = []
-    current_y = None
-    
-    for _, row in df_sorted.iterrows():
-        if current_y is None or abs(row['top'] - current_y) <= y_tolerance:
-            current_line.append(row.to_dict())
-            current_y = row['top'] if current_y is None else (current_y + row['top']) / 2
-        else:
-            if current_line:
-                lines.append(sorted(current_line, key=lambda x: x['left']))
-            current_line = [row.to_dict()]
-            current_y = row['top']
-    
-    if current_line:
-        lines.append(sorted(current_line, key=lambda x: x['left']))
-    
-    return lines
+    return group_tokens_into_token_lines(df, y_tolerance).to_dicts()
 
 
 def extract_fields(lines):
@@ -69,13 +52,8 @@ def extract_tests(lines):
     tests = []
     seen = set()
     
-    # Medical test keywords for validation
-    medical_keywords = [
-        'hemoglobin', 'hematocrit', 'platelet', 'glucose', 'cholesterol',
-        'triglyceride', 'creatinine', 'urea', 'bilirubin', 'protein',
-        'albumin', 'ast', 'alt', 'phosphatase', 'rbc', 'wbc', 'hdl', 'ldl',
-        'sgot', 'sgpt', 'count', 'fasting'
-    ]
+    # Medical test keywords for validation (legacy list in the analyte catalog)
+    medical_keywords = CATALOG.legacy_keywords
     
     # Valid unit patterns
     unit_pattern = r'(mg/dl|g/dl|mmol/l|%|u/l|million/[uμ]l|thousand/[uμ]l|cells/[uμ]l)'
@@ -0,0 +1,306 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Analyte Catalog: Data-driven test names, units, ranges and fix rules
+# =============================================================================
+
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+from collections import deque, namedtuple
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "analyte_catalog.json")
+
+# Bump when the compiled (pickled) layout changes
+COMPILED_FORMAT_VERSION = 2
+
+# One catalog entry. `keywords`/`aliases` are lowercase keyword sequences
+# matched per token by substring; `range` is (min, max) or None;
+# `decimal_fix` is a DecimalFix or None.
+Analyte = namedtuple('Analyte', ['name', 'keywords', 'unit', 'range', 'aliases', 'decimal_fix'])
+
+# Values in [min, max] are divided by `divisor` (a missed decimal point)
+DecimalFix = namedtuple('DecimalFix', ['min', 'max', 'divisor'])
+
+
+# ============================================================================
+# MATCHING
+# ============================================================================
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton reporting which keywords occur inside a string.
+    
+    One pass over the characters of a token finds every keyword it contains,
+    independent of how many keywords the catalog has.
+    """
+    
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._output = [set()]
+        
+        for kw_id, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._output.append(set())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].add(kw_id)
+        
+        # Breadth-first construction of failure links
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0) if state else 0
+                self._output[child] |= self._output[self._fail[child]]
+        
+        self._cache = {}
+    
+    def find(self, text):
+        """Frozenset of keyword ids occurring as substrings of text."""
+        found = self._cache.get(text)
+        if found is not None:
+            return found
+        
+        state = 0
+        hits = set()
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                hits |= self._output[state]
+        
+        found = frozenset(hits)
+        if len(self._cache) < 65536:
+            self._cache[text] = found
+        return found
+
+
+class TestNameMatcher:
+    """
+    Token trie over catalog keyword sequences, with an Aho-Corasick automaton
+    per token.
+    
+    Each level of the trie corresponds to one token; an edge is taken when
+    its keyword occurs inside that token (the same substring semantics as
+    the pattern tables). All candidate names are collected in one walk over
+    the line's tokens and the highest-priority one wins, which preserves the
+    "multi-word patterns first, in table order" rule.
+    """
+    
+    def __init__(self, entries):
+        """
+        Args:
+            entries: Iterable of (display_name, keywords) in priority order
+        """
+        keyword_ids = {}
+        for _, keywords in entries:
+            for keyword in keywords:
+                keyword_ids.setdefault(keyword, len(keyword_ids))
+        self._automaton = KeywordAutomaton(keyword_ids)
+        
+        # Trie node: {'children': {keyword_id: node}, 'match': (priority, name)}
+        self._root = {'children': {}, 'match': None}
+        for priority, (name, keywords) in enumerate(entries):
+            node = self._root
+            for keyword in keywords:
+                node = node['children'].setdefault(keyword_ids[keyword], {'children': {}, 'match': None})
+            if node['match'] is None:
+                node['match'] = (priority, name, len(keywords))
+    
+    @classmethod
+    def from_analytes(cls, analytes):
+        """
+        Build a matcher from catalog analytes.
+        
+        Priority: multi-word keyword sequences (names, then aliases) in catalog
+        order, then single-word names, then single-word aliases.
+        """
+        multi_entries = []
+        single_entries = []
+        for analyte in analytes:
+            target = multi_entries if len(analyte.keywords) > 1 else single_entries
+            target.append((analyte.name, list(analyte.keywords)))
+        for analyte in analytes:
+            for alias in analyte.aliases:
+                target = multi_entries if len(alias) > 1 else single_entries
+                target.append((analyte.name, list(alias)))
+        return cls(multi_entries + single_entries)
+    
+    def match(self, tokens_lower, start_idx=0):
+        """
+        Returns:
+            tuple: (test_name, tokens_consumed) or (None, 0) if no match
+        """
+        best = None
+        frontier = [self._root]
+        idx = start_idx
+        
+        while frontier and idx < len(tokens_lower):
+            present = self._automaton.find(tokens_lower[idx])
+            next_frontier = []
+            for node in frontier:
+                for kw_id in present:
+                    child = node['children'].get(kw_id)
+                    if child is None:
+                        continue
+                    if child['match'] and (best is None or child['match'] < best):
+                        best = child['match']
+                    if child['children']:
+                        next_frontier.append(child)
+            frontier = next_frontier
+            idx += 1
+        
+        if best is None:
+            return None, 0
+        return best[1], best[2]
+
+
+# ============================================================================
+# CATALOG
+# ============================================================================
+
+class AnalyteCatalog:
+    """
+    Immutable, indexed view of the analyte catalog.
+    
+    Lookups by display name are a single dict access; test-name matching
+    uses a TestNameMatcher compiled from every keyword sequence and alias.
+    """
+    
+    def __init__(self, analytes, version=1, source_sha256=None, legacy_keywords=()):
+        self.version = version
+        self.source_sha256 = source_sha256
+        self.analytes = tuple(analytes)
+        # Keyword filter of the original extractor (aaa.py), kept verbatim
+        self.legacy_keywords = tuple(legacy_keywords)
+        self._by_name = {a.name: a for a in self.analytes}
+        self.matcher = TestNameMatcher.from_analytes(self.analytes)
+    
+    def __len__(self):
+        return len(self.analytes)
+    
+    def __contains__(self, name):
+        return name in self._by_name
+    
+    def get(self, name):
+        """Analyte for a display name, or None."""
+        return self._by_name.get(name)
+    
+    def match_test_name(self, tokens_lower, start_idx=0):
+        """See TestNameMatcher.match()."""
+        return self.matcher.match(tokens_lower, start_idx)
+    
+    def keywords(self):
+        """Sorted list of every keyword used by names and aliases."""
+        words = set()
+        for analyte in self.analytes:
+            words.update(analyte.keywords)
+            for alias in analyte.aliases:
+                words.update(alias)
+        return sorted(words)
+
+
+def _parse_analyte(entry):
+    """Validate one JSON catalog entry and convert it to an Analyte."""
+    name = entry['name']
+    keywords = tuple(kw.lower() for kw in entry['keywords'])
+    if not keywords:
+        raise ValueError(f"Analyte '{name}' has no keywords")
+    
+    value_range = entry.get('range')
+    if value_range is not None:
+        value_range = (value_range[0], value_range[1])
+    
+    decimal_fix = entry.get('decimal_fix')
+    if decimal_fix is not None:
+        decimal_fix = DecimalFix(decimal_fix['min'], decimal_fix['max'], decimal_fix['divisor'])
+    
+    return Analyte(
+        name=name,
+        keywords=keywords,
+        unit=entry.get('unit', ''),
+        range=value_range,
+        aliases=tuple(tuple(kw.lower() for kw in alias) for alias in entry.get('aliases', [])),
+        decimal_fix=decimal_fix,
+    )
+
+
+def parse_catalog(data, source_sha256=None):
+    """Build an AnalyteCatalog from the decoded JSON document."""
+    analytes = [_parse_analyte(entry) for entry in data['analytes']]
+    
+    names = [a.name for a in analytes]
+    duplicates = {n for n in names if names.count(n) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate analytes in catalog: {sorted(duplicates)}")
+    
+    legacy_keywords = [kw.lower() for kw in data.get('legacy_keywords', [])]
+    return AnalyteCatalog(analytes, version=data.get('version', 1), source_sha256=source_sha256,
+                          legacy_keywords=legacy_keywords)
+
+
+def load_catalog(path=DEFAULT_CATALOG_PATH, compiled_path=None):
+    """
+    Load the analyte catalog, using a pickled compiled form when up to date.
+    
+    The compiled file stores the fully built catalog (indexes and matcher)
+    together with the SHA-256 of the JSON it came from, so startup with a
+    large catalog only costs an unpickle. It is rebuilt whenever the JSON
+    changes; failure to write it is not an error.
+    
+    Args:
+        path: JSON catalog file
+        compiled_path: Compiled cache file (default: <path>.pkl)
+    
+    Returns:
+        AnalyteCatalog
+    """
+    compiled_path = compiled_path or path + ".pkl"
+    
+    with open(path, 'rb') as f:
+        raw = f.read()
+    source_hash = hashlib.sha256(raw).hexdigest()
+    
+    try:
+        with open(compiled_path, 'rb') as f:
+            compiled = pickle.load(f)
+        if compiled['format'] == COMPILED_FORMAT_VERSION and compiled['source_sha256'] == source_hash:
+            return compiled['catalog']
+    except Exception:
+        pass  # missing, stale or unreadable (e.g. torn): rebuild from the JSON
+    
+    catalog = parse_catalog(json.loads(raw.decode('utf-8')), source_sha256=source_hash)
+    
+    # Unique temp file: every worker process loads the catalog on import and
+    # may rewrite the compiled form at the same time
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(compiled_path)),
+                                        prefix=os.path.basename(compiled_path) + ".", suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({
+                'format': COMPILED_FORMAT_VERSION,
+                'source_sha256': source_hash,
+                'catalog': catalog,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, compiled_path)
+    except OSError:
+        pass
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    return catalog
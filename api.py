@@ -6,20 +6,64 @@
 
 import os
 import json
-import pandas as pd
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, JSONResponse
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from functools import partial
+
+import anyio
+from fastapi import FastAPI, Query, Header, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import Dict, List, Any
+from starlette.requests import ClientDisconnect
+from typing import Dict, List, Any, Optional
+
+from token_store import load_page_tokens
+from corrections_log import append_correction, page_stem_of
+from report_index import get_index, forget_extractions, review_status, STATUSES, SORT_COLUMNS
+from report_cache import ReportCache, etag_matches, accepts_gzip
+from metrics import registry, render_prometheus
+from job_queue import JobManager, UploadWriter
+
+@asynccontextmanager
+async def lifespan(app):
+    # Reconcile the report index with the folder before serving listings
+    if os.path.isdir(EXTRACTION_FOLDER):
+        await run_io(report_index)
+    yield
+    # Stop the upload workers with the server instead of orphaning them
+    jobs.shutdown()
 
-app = FastAPI(title="Lab Report Review UI")
+app = FastAPI(title="Lab Report Review UI", lifespan=lifespan)
 
 # --- FOLDER PATHS ---
 EXTRACTION_FOLDER = "output_extracted_data"
 CORRECTIONS_FOLDER = "output_corrections"
 CONFIRMED_FOLDER = "output_confirmed"
 TOKENS_FOLDER = "output_ocr_tokens"
+UPLOADS_FOLDER = "uploaded_reports"
+REVIEWER_HTML = "static/reviewer.html"
+
+# Threads for blocking file I/O; handlers never touch the disk on the event loop.
+# Saves get their own pool so quick reads never queue behind them.
+READ_THREADS = 8
+SAVE_THREADS = 2
+UPLOAD_THREADS = 4
+_read_limiter = anyio.CapacityLimiter(READ_THREADS)
+_save_limiter = anyio.CapacityLimiter(SAVE_THREADS)
+_upload_limiter = anyio.CapacityLimiter(UPLOAD_THREADS)
+
+# Uploaded reports are processed by worker processes (see job_queue); job
+# progress is kept in memory and pushed to event-stream clients as it changes
+jobs = JobManager(UPLOADS_FOLDER, EXTRACTION_FOLDER, TOKENS_FOLDER)
+JOB_EVENT_POLL = 0.25  # seconds between checks for progress
+JOB_KEEPALIVE = 15     # seconds between keep-alive comments on a quiet stream
+
+# Parsed reports kept in memory (LRU, revalidated against the file's mtime)
+REPORT_CACHE_BYTES = 64 * 1024 ** 2
+_report_cache = ReportCache(REPORT_CACHE_BYTES)
 
 os.makedirs(CORRECTIONS_FOLDER, exist_ok=True)
 os.makedirs(CONFIRMED_FOLDER, exist_ok=True)
@@ -30,59 +74,237 @@ class ReportData(BaseModel):
     fields: Dict[str, Any]
     test_results: List[Dict[str, Any]]
 
+# --- BLOCKING HELPERS (run on the I/O threadpool) ---
+
+async def run_io(function, *args, limiter=None):
+    """Runs a blocking function on a bounded I/O threadpool (reads by default)."""
+    return await anyio.to_thread.run_sync(partial(function, *args), limiter=limiter or _read_limiter)
+
+def read_text(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+def read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def write_json(path, data):
+    """Writes JSON atomically so concurrent readers never see a partial file."""
+    text = json.dumps(data, indent=2)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def report_index():
+    """The extraction folder's report index, reconciled with the folder on first use."""
+    global _index_ready
+    index = get_index(EXTRACTION_FOLDER)
+    with _index_lock:
+        if not _index_ready:
+            added, removed = index.reconcile(EXTRACTION_FOLDER, CONFIRMED_FOLDER)
+            print(f"Report index: {added} report(s) indexed, {removed} missing removed "
+                  f"({EXTRACTION_FOLDER})")
+            _index_ready = True
+    return index
+
+def list_reports(**query):
+    if not os.path.exists(EXTRACTION_FOLDER):
+        return None
+    return report_index().list_reports(**query)
+
+def write_training_data(report_name, corrected):
+    """Saves the confirmed report and logs the correction (see save_corrected_data)."""
+    # 1. Save the clean, confirmed JSON data (for final use)
+    write_json(os.path.join(CONFIRMED_FOLDER, report_name), corrected)
+    report_path = os.path.join(EXTRACTION_FOLDER, report_name)
+    _report_cache.invalidate(report_path)
+    try:
+        original = read_json(report_path)
+        report_index().set_status(report_name, review_status(original, corrected))
+    except FileNotFoundError:
+        pass
+
+    # 2. Log the correction for training. The page's tokens are snapshotted
+    #    into the corrections folder (deduplicated by content hash), where
+    #    corrections_log.export_training_set reads them back.
+    page_stem = page_stem_of(report_name)
+    tokens = load_page_tokens(TOKENS_FOLDER, page_stem)
+    if tokens is None:
+        return page_stem
+    append_correction(CORRECTIONS_FOLDER, report_name, corrected, tokens)
+    return None
+
+_reviewer_html = None
+_index_ready = False
+_index_lock = threading.Lock()
+
+# --- REQUEST METRICS ---
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Counts and times requests per route template (exposed on /metrics)."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    registry.observe_request(request.method, route.path if route else "unmatched",
+                             str(response.status_code), time.perf_counter() - start)
+    return response
+
 # --- API ENDPOINTS ---
 
 @app.get("/", response_class=HTMLResponse)
 async def serve_reviewer_ui():
-    with open("static/reviewer.html", "r") as f:
-        return HTMLResponse(content=f.read(), status_code=200)
+    # Read once, then served from memory
+    global _reviewer_html
+    if _reviewer_html is None:
+        _reviewer_html = await run_io(read_text, REVIEWER_HTML)
+    return HTMLResponse(content=_reviewer_html, status_code=200)
 
 @app.get("/api/reports")
-async def get_list_of_reports():
-    if not os.path.exists(EXTRACTION_FOLDER):
+async def get_list_of_reports(offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500),
+                              status: Optional[str] = None, flagged: Optional[bool] = None,
+                              min_confidence: Optional[float] = None,
+                              max_confidence: Optional[float] = None,
+                              q: Optional[str] = None, sort: str = "extracted_at",
+                              order: str = Query("desc", pattern="^(asc|desc)$")):
+    """
+    One page of the report listing, served from the report index.
+
+    Filters: status (pending/confirmed/corrected), flagged, confidence
+    bounds and a name substring (q). Sortable by any of SORT_COLUMNS.
+    """
+    if status is not None and status not in STATUSES:
+        return JSONResponse(content={"error": f"status must be one of {STATUSES}"}, status_code=400)
+    if sort not in SORT_COLUMNS:
+        return JSONResponse(content={"error": f"sort must be one of {SORT_COLUMNS}"}, status_code=400)
+
+    listing = await run_io(partial(list_reports, offset=offset, limit=limit, status=status,
+                                   flagged=flagged, min_confidence=min_confidence,
+                                   max_confidence=max_confidence, search=q, sort=sort,
+                                   descending=order == "desc"))
+    if listing is None:
         return JSONResponse(content={"error": f"Directory not found: {EXTRACTION_FOLDER}"}, status_code=404)
-    reports = [f for f in os.listdir(EXTRACTION_FOLDER) if f.endswith('.json')]
-    return {"reports": reports}
+    total, items = listing
+    return {"reports": [item['name'] for item in items], "items": items,
+            "total": total, "offset": offset, "limit": limit}
 
 @app.get("/api/report/{report_name}")
-async def get_report_data(report_name: str):
+async def get_report_data(report_name: str, if_none_match: Optional[str] = Header(None),
+                          accept_encoding: Optional[str] = Header(None)):
+    """
+    A report's extraction result, from the in-memory cache when unchanged.
+
+    Responses carry an ETag; a request whose If-None-Match still matches
+    gets 304 Not Modified, so the browser reuses its copy. Bodies are sent
+    gzip-compressed when the client accepts it.
+    """
     report_path = os.path.join(EXTRACTION_FOLDER, report_name)
-    if not os.path.exists(report_path):
+    try:
+        report = await run_io(_report_cache.get, report_path)
+    except FileNotFoundError:
+        # Deleted since it was indexed: stop listing it
+        if os.path.isdir(EXTRACTION_FOLDER):
+            await run_io(forget_extractions, EXTRACTION_FOLDER, [report_name])
         return JSONResponse(content={"error": "Report not found"}, status_code=404)
-    with open(report_path, 'r') as f:
-        return json.load(f)
+
+    # no-cache: browsers may store the report but must revalidate it each time
+    headers = {"ETag": report.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, report.etag):
+        return Response(status_code=304, headers=headers)
+    if report.gzip_body is not None and accepts_gzip(accept_encoding):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=report.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=report.body, media_type="application/json", headers=headers)
 
 @app.post("/api/save/{report_name}")
 async def save_corrected_data(report_name: str, corrected_data: ReportData):
-    """Saves corrected data and generates a detailed training file."""
-    
-    # 1. Save the clean, confirmed JSON data (for final use)
-    confirmed_path = os.path.join(CONFIRMED_FOLDER, report_name)
-    with open(confirmed_path, 'w') as f:
-        json.dump(corrected_data.dict(), f, indent=2)
-
-    # 2. Generate the detailed training file
-    # This file links the original OCR tokens to the corrected labels
-    source_tokens_filename = report_name.replace('_extracted.json', '_tokens.csv')
-    tokens_path = os.path.join(TOKENS_FOLDER, source_tokens_filename)
-    
-    if not os.path.exists(tokens_path):
-        return JSONResponse(content={"error": f"Token file not found: {source_tokens_filename}"}, status_code=404)
-        
-    # Load original OCR tokens
-    tokens_df = pd.read_csv(tokens_path)
-    all_tokens = tokens_df.to_dict('records')
-    
-    # Create the training data structure
-    training_data = {
-        "source_file": report_name,
-        "original_tokens": all_tokens,  # Include all original tokens
-        "corrected_labels": corrected_data.dict() # Include the corrected high-level data
-    }
-    
-    correction_filename = f"correction_{report_name}"
-    correction_path = os.path.join(CORRECTIONS_FOLDER, correction_filename)
-    with open(correction_path, 'w') as f:
-        json.dump(training_data, f, indent=2)
-
-    return {"message": f"Successfully saved confirmed report and training data for {report_name}"}
\ No newline at end of file
+    """Saves corrected data and appends it to the training-data log."""
+    missing_stem = await run_io(write_training_data, report_name, corrected_data.dict(),
+                                  limiter=_save_limiter)
+    if missing_stem is not None:
+        return JSONResponse(content={"error": f"Tokens not found for: {missing_stem}"}, status_code=404)
+
+    return {"message": f"Successfully saved confirmed report and training data for {report_name}"}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage timings, counters and request totals in the Prometheus text format."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# --- PROCESSING JOBS ---
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: Request):
+    """
+    Queues uploaded reports (multipart/form-data, any number of PDF/image
+    file parts) for preprocessing, OCR and extraction.
+
+    Files are streamed to disk chunk by chunk as they arrive. Returns the
+    job at once (202); poll GET /api/jobs/{id} or follow its event stream.
+    """
+    job = jobs.create()
+    try:
+        upload = UploadWriter(request.headers.get('content-type'), job.upload_path)
+    except ValueError as e:
+        await run_io(jobs.discard, job, limiter=_upload_limiter)
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    try:
+        async for chunk in request.stream():
+            upload.feed(chunk)
+            if upload.pending:
+                await run_io(upload.flush, limiter=_upload_limiter)
+        upload.finish()
+        await run_io(upload.flush, limiter=_upload_limiter)
+    except (ValueError, ClientDisconnect) as e:
+        upload.close()
+        await run_io(jobs.discard, job, limiter=_upload_limiter)
+        status_code = 413 if upload.too_large else 400
+        return JSONResponse(content={"error": f"Upload failed: {e}"}, status_code=status_code)
+
+    if not upload.files and not upload.skipped:
+        await run_io(jobs.discard, job, limiter=_upload_limiter)
+        return JSONResponse(content={"error": "No files in the upload"}, status_code=400)
+    await run_io(jobs.submit, job, upload.files, upload.skipped, limiter=_upload_limiter)
+    return JSONResponse(content=job.as_dict(), status_code=202,
+                        headers={"Location": f"/api/jobs/{job.id}"})
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Progress of a job: page and report counts, and the results of each report."""
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    return job.as_dict()
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events for a job: a 'progress' event (counts only) whenever
+    a page finishes, then one 'done' event with the full job, after which
+    the stream ends.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+
+    async def events():
+        version = None
+        quiet = 0.0
+        while True:
+            if job.version != version:
+                version = job.version
+                if job.finished:
+                    yield f"event: done\ndata: {json.dumps(job.as_dict())}\n\n"
+                    return
+                yield f"event: progress\ndata: {json.dumps(job.as_dict(reports=False))}\n\n"
+                quiet = 0.0
+            elif quiet >= JOB_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                quiet = 0.0
+            await asyncio.sleep(JOB_EVENT_POLL)
+            quiet += JOB_EVENT_POLL
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
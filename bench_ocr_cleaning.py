@@ -0,0 +1,100 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Benchmark: Per-page overhead of OCR token cleaning (pandas vs. batched NumPy)
+# =============================================================================
+
+import time
+import random
+import argparse
+import pandas as pd
+
+from module_two import clean_ocr_data, clean_ocr_batch
+
+WORDS = ['Hemoglobin', '13.5', 'g/dL', '12.0-16.0', 'Patient', 'Name:', 'WBC',
+         '7,200', 'cells/cumm', 'Platelet', 'Count', 'Date:', '12/03/2024', 'Dr.']
+
+
+def clean_ocr_data_pandas(ocr_data_dict):
+    """The previous DataFrame-per-step implementation of clean_ocr_data (reference)."""
+    df = pd.DataFrame(ocr_data_dict)
+    tokens_df = df[df.conf != -1].copy()
+    for col in ['left', 'top', 'width', 'height', 'conf']:
+        tokens_df[col] = pd.to_numeric(tokens_df[col], errors='coerce')
+    tokens_df = tokens_df[tokens_df['text'].str.strip().astype(bool)]
+    tokens_df = tokens_df.dropna(subset=['conf', 'text', 'left', 'top', 'width', 'height'])
+    final_df = tokens_df[['conf', 'text', 'left', 'top', 'width', 'height']].copy()
+    final_df.reset_index(drop=True, inplace=True)
+    return final_df
+
+
+def synthetic_ocr_output(words, rng):
+    """
+    image_to_data(..., Output.DICT) for a page of `words` words.
+
+    Like Tesseract, every line is preceded by structural rows (conf -1,
+    empty text) and a few words come back blank.
+    """
+    data = {key: [] for key in ['level', 'page_num', 'block_num', 'par_num', 'line_num',
+                                'word_num', 'left', 'top', 'width', 'height', 'conf', 'text']}
+
+    def add(level, conf, text, left, top):
+        values = {'level': level, 'page_num': 1, 'block_num': 1, 'par_num': 1, 'line_num': 1,
+                  'word_num': 1, 'left': left, 'top': top, 'width': 9 * max(1, len(text)),
+                  'height': 28, 'conf': conf, 'text': text}
+        for key, value in values.items():
+            data[key].append(value)
+
+    for i in range(words):
+        top = 150 + 40 * (i // 8)
+        if i % 8 == 0:
+            for level in (2, 3, 4):
+                add(level, -1, '', 100, top)
+        text = ' ' if rng.random() < 0.05 else rng.choice(WORDS)
+        add(5, rng.randint(30, 96), text, 100 + 250 * (i % 8), top)
+    return data
+
+
+def best_of(function, repeat):
+    """Fastest of `repeat` timed calls, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR token cleaning.")
+    parser.add_argument("--pages", type=int, default=200, help="Pages per run")
+    parser.add_argument("--words", type=int, nargs='+', default=[50, 200, 800],
+                        help="Words per page (one row of results each)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'words/page':>10} {'pandas':>12} {'per page':>12} {'batch':>12} {'batch+frames':>14}")
+    print(f"{'':>10} {'(us/page)':>12} {'(us/page)':>12} {'(us/page)':>12} {'(us/page)':>14}")
+
+    for words in args.words:
+        pages = [synthetic_ocr_output(words, rng) for _ in range(args.pages)]
+
+        # Same tokens from every path
+        batch = clean_ocr_batch(pages)
+        for i, page in enumerate(pages[:10]):
+            pd.testing.assert_frame_equal(clean_ocr_data_pandas(page), batch.frame(i))
+
+        timings = [
+            best_of(lambda: [clean_ocr_data_pandas(p) for p in pages], args.repeat),
+            best_of(lambda: [clean_ocr_data(p) for p in pages], args.repeat),
+            best_of(lambda: clean_ocr_batch(pages), args.repeat),
+            best_of(lambda: clean_ocr_batch(pages).frames(), args.repeat),
+        ]
+        per_page = [t / args.pages * 1e6 for t in timings]
+        print(f"{words:>10} {per_page[0]:>12.0f} {per_page[1]:>12.0f} "
+              f"{per_page[2]:>12.0f} {per_page[3]:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Benchmark: Per-stage latency, throughput and accuracy on synthetic reports
+# =============================================================================
+
+import os
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+import cv2
+import numpy as np
+import pandas as pd
+
+import metrics
+from module_one import (preprocess_page, estimate_orientation, rotate_upright, load_page,
+                        ORIENTATION_STRATEGIES, SKEW_MODES)
+from module_two import ocr_page
+from module_three import extract
+from ocr_backend import get_backend
+from synthetic_reports import synthetic_dataset, render_page, save_pdf, ROTATIONS
+
+REPORT_SCHEMA = 1
+
+
+# ============================================================================
+# ACCURACY
+# ============================================================================
+
+def _same_value(found, expected):
+    try:
+        return float(found) == float(expected)
+    except (TypeError, ValueError):
+        return str(found) == str(expected)
+
+
+def score_page(truth_page, result):
+    """
+    Compares an extraction result with a page's ground truth.
+
+    Returns:
+        dict: Counts (fields, tests found by name, tests matching exactly, ...)
+    """
+    expected_fields = truth_page['fields']
+    found_fields = {name: field['value'] for name, field in result['fields'].items()}
+    expected_tests = {t['test_name']: t for t in truth_page['tests']}
+
+    counts = {
+        'fields': len(expected_fields),
+        'fields_correct': sum(1 for name, value in expected_fields.items()
+                              if found_fields.get(name) == value),
+        'tests': len(expected_tests),
+        'tests_extracted': len(result['test_results']),
+        'tests_found': 0, 'values_correct': 0, 'units_correct': 0,
+        'ranges_correct': 0, 'tests_exact': 0,
+    }
+    for test in result['test_results']:
+        expected = expected_tests.get(test['test_name'])
+        if expected is None:
+            continue
+        checks = (_same_value(test['value'], expected['value']),
+                  test.get('unit', '') == expected['unit'],
+                  test.get('reference_range') == expected['reference_range'])
+        counts['tests_found'] += 1
+        counts['values_correct'] += checks[0]
+        counts['units_correct'] += checks[1]
+        counts['ranges_correct'] += checks[2]
+        counts['tests_exact'] += all(checks)
+    return counts
+
+
+def summarize_accuracy(page_scores):
+    """Ratios over all pages (recall/precision by test name, value accuracy of found tests)."""
+    total = {key: sum(score[key] for score in page_scores) for key in page_scores[0]}
+
+    def ratio(numerator, denominator):
+        return round(total[numerator] / total[denominator], 4) if total[denominator] else None
+
+    recall, precision = ratio('tests_found', 'tests'), ratio('tests_found', 'tests_extracted')
+    return {
+        'field_accuracy': ratio('fields_correct', 'fields'),
+        'test_recall': recall,
+        'test_precision': precision,
+        'test_f1': (round(2 * recall * precision / (recall + precision), 4)
+                    if recall and precision else 0.0),
+        'value_accuracy': ratio('values_correct', 'tests_found'),
+        'unit_accuracy': ratio('units_correct', 'tests_found'),
+        'range_accuracy': ratio('ranges_correct', 'tests_found'),
+        'exact_test_rate': ratio('tests_exact', 'tests'),
+        'counts': total,
+    }
+
+
+# ============================================================================
+# TIMING
+# ============================================================================
+
+def summarize_pages(records, wall):
+    """
+    Latency and throughput per stage from per-page metric records.
+
+    Latencies are per page (a stage called several times on one page counts
+    once, with its total); pages_per_s is the stage's throughput on one core.
+    """
+    per_stage = {}
+    for record in records:
+        for name, seconds in record['stages'].items():
+            per_stage.setdefault(name, []).append(seconds)
+
+    stages = {}
+    for name, values in per_stage.items():
+        values = np.array(values)
+        p50, p95 = np.percentile(values, [50, 95])
+        stages[name] = {
+            'pages': len(values),
+            'total_s': round(float(values.sum()), 6),
+            'mean_ms': round(1000 * float(values.mean()), 3),
+            'p50_ms': round(1000 * float(p50), 3),
+            'p95_ms': round(1000 * float(p95), 3),
+            'max_ms': round(1000 * float(values.max()), 3),
+            'pages_per_s': round(len(values) / values.sum(), 2) if values.sum() else None,
+        }
+    page_walls = np.array([record['wall_s'] for record in records])
+    return {
+        'pages': len(records),
+        'wall_s': round(wall, 4),
+        'pages_per_s': round(len(records) / wall, 2) if wall else None,
+        'page_p50_ms': round(1000 * float(np.percentile(page_walls, 50)), 3),
+        'page_p95_ms': round(1000 * float(np.percentile(page_walls, 95)), 3),
+        'peak_rss_mb': max(record['peak_rss_mb'] for record in records),
+        'stages': stages,
+    }
+
+
+def timed_runs(pages, repeat, run_page):
+    """
+    Runs run_page(item) on every page `repeat` times, each page in its own
+    metrics page scope.
+
+    Returns:
+        tuple: (timing summary, results of the first run)
+    """
+    records, results = [], []
+    start = time.perf_counter()
+    for run in range(repeat):
+        for item in pages:
+            with metrics.page_scope(item['report'], item['page']) as record:
+                result = run_page(item)
+            records.append(record.as_dict())
+            if run == 0:
+                results.append(result)
+    return summarize_pages(records, time.perf_counter() - start), results
+
+
+# ============================================================================
+# PHASES
+# ============================================================================
+
+def bench_tokens(pages, repeat):
+    """Module 3 only: line grouping and extraction on synthetic OCR tokens."""
+    summary, results = timed_runs(pages, repeat, lambda item: extract(item['tokens']))
+    summary['accuracy'] = summarize_accuracy(
+        [score_page(item['truth'], result) for item, result in zip(pages, results)])
+    return summary
+
+
+def bench_images(pages, repeat, orientation, skew_mode, with_ocr, pdf_paths, dpi):
+    """
+    Modules 1-3 on rendered scans: rasterize (PDF input, if poppler is
+    available), orientation, deskew, threshold, then OCR and extraction
+    when Tesseract is available.
+
+    Without Tesseract the orientation estimate runs as the heuristic alone
+    (no OSD fallback) so no stage is timed failing.
+    """
+    def run_page(item):
+        info = {}
+        if pdf_paths:
+            image = load_page(pdf_paths[item['report']], item['page'], dpi=dpi, grayscale=True)
+        else:
+            image = item['image']
+
+        if with_ocr:
+            binary = preprocess_page(image, orientation, info, skew_mode)
+        else:
+            with metrics.stage('orientation'):
+                rotation, confident = estimate_orientation(image)
+            upright = rotate_upright(image, rotation) if confident else image
+            binary = preprocess_page(upright, 'ocr', info, skew_mode)
+            info['rotation'] = rotation if confident else None  # None: would need OSD
+
+        result = extract(ocr_page(binary)) if with_ocr else None
+        return info, result
+
+    summary, results = timed_runs(pages, repeat, run_page)
+
+    expected_rotations = [item['truth']['scan']['rotation'] for item in pages]
+    rotations = [info.get('rotation') for info, _ in results]
+    summary['orientation_accuracy'] = round(
+        sum(r == e for r, e in zip(rotations, expected_rotations)) / len(pages), 4)
+    # The correction angle should cancel the applied skew
+    skew_errors = [abs(info['skew_angle'] + item['truth']['scan']['skew'])
+                   for item, (info, _) in zip(pages, results) if 'skew_angle' in info]
+    summary['skew_mae_deg'] = round(float(np.mean(skew_errors)), 3) if skew_errors else None
+    if with_ocr:
+        summary['accuracy'] = summarize_accuracy(
+            [score_page(item['truth'], result) for item, (_, result) in zip(pages, results)])
+    return summary
+
+
+# ============================================================================
+# ENVIRONMENT / REPORT
+# ============================================================================
+
+def ocr_available():
+    """True if the OCR backend can run (Tesseract installed)."""
+    try:
+        get_backend().image_to_data(np.full((32, 32), 255, dtype=np.uint8))
+        return True
+    except Exception:
+        return False
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(with_ocr, with_pdf):
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'opencv': cv2.__version__,
+        'ocr_backend': get_backend().name if with_ocr else None,
+        'pdf_rasterizer': 'poppler' if with_pdf else None,
+    }
+
+
+def print_phase(name, phase):
+    print(f"\n{name}: {phase['pages']} page runs, {phase['pages_per_s']} pages/s, "
+          f"page p50 {phase['page_p50_ms']:.1f} ms, p95 {phase['page_p95_ms']:.1f} ms, "
+          f"peak {phase['peak_rss_mb']} MB")
+    print(f"  {'stage':<14} {'pages/s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for stage_name, s in sorted(phase['stages'].items(), key=lambda item: -item[1]['total_s']):
+        print(f"  {stage_name:<14} {s['pages_per_s'] or 0:>9.1f} {s['mean_ms']:>9.2f} "
+              f"{s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['max_ms']:>9.2f}")
+    if 'orientation_accuracy' in phase:
+        print(f"  orientation accuracy: {phase['orientation_accuracy']}, "
+              f"skew error (mean abs): {phase['skew_mae_deg']} deg")
+    accuracy = phase.get('accuracy')
+    if accuracy:
+        print("  " + ", ".join(f"{key}: {value}" for key, value in accuracy.items() if key != 'counts'))
+
+
+def print_comparison(report, baseline):
+    """Stage p50 and accuracy changes against an earlier report."""
+    print(f"\nCompared with {baseline.get('created')} ({(baseline.get('git_commit') or '?')[:10]}):")
+    for phase_name, phase in report['phases'].items():
+        old_phase = baseline.get('phases', {}).get(phase_name)
+        if not old_phase:
+            continue
+        for stage_name, s in phase['stages'].items():
+            old = old_phase['stages'].get(stage_name)
+            if old and old['p50_ms']:
+                change = 100 * (s['p50_ms'] - old['p50_ms']) / old['p50_ms']
+                print(f"  {phase_name}/{stage_name:<14} p50 {old['p50_ms']:>9.2f} -> "
+                      f"{s['p50_ms']:>9.2f} ms ({change:+.1f}%)")
+        quality = dict(phase.get('accuracy') or {}, orientation_accuracy=phase.get('orientation_accuracy'),
+                       skew_mae_deg=phase.get('skew_mae_deg'))
+        old_quality = dict(old_phase.get('accuracy') or {}, orientation_accuracy=old_phase.get('orientation_accuracy'),
+                           skew_mae_deg=old_phase.get('skew_mae_deg'))
+        for key, value in quality.items():
+            old = old_quality.get(key)
+            if key != 'counts' and old is not None and value != old:
+                print(f"  {phase_name}/{key:<14} {old} -> {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic lab reports.")
+    parser.add_argument("--reports", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=1, help="Pages per report")
+    parser.add_argument("--tests", type=int, default=12, help="Table rows per page")
+    parser.add_argument("--rotation", default="0", choices=[str(r) for r in ROTATIONS] + ['random'])
+    parser.add_argument("--skew", type=float, default=2.0, help="Maximum skew in degrees")
+    parser.add_argument("--noise", type=float, default=0.1, help="Scan and token noise, 0-1")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the dataset")
+    parser.add_argument("--orientation", choices=ORIENTATION_STRATEGIES, default="osd")
+    parser.add_argument("--skew-mode", choices=SKEW_MODES, default="exact")
+    parser.add_argument("--no-images", action="store_true",
+                        help="Benchmark extraction on synthetic tokens only (no rendering)")
+    parser.add_argument("--output", default="bench_report.json", help="JSON report path")
+    parser.add_argument("--compare", default=None, help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+    with_ocr = not args.no_images and ocr_available()
+    with_pdf = not args.no_images and shutil.which('pdftoppm') is not None
+
+    print(f"Generating {args.reports} report(s) x {args.pages} page(s), {args.tests} tests/page, "
+          f"rotation {args.rotation}, skew <= {args.skew} deg, noise {args.noise} (seed {args.seed})")
+    pages, images_by_report = [], {}
+    for truth, page_words, page_tokens in synthetic_dataset(args.reports, args.pages, args.tests,
+                                                            args.rotation, args.skew, args.noise,
+                                                            args.dpi, args.seed):
+        for page, words, (_, tokens) in zip(truth['pages'], page_words, page_tokens):
+            item = {'report': truth['report'], 'page': page['page'], 'truth': page, 'tokens': tokens}
+            if not args.no_images:
+                item['image'] = render_page(words, args.dpi, **page['scan'])
+                images_by_report.setdefault(truth['report'], []).append(item['image'])
+            pages.append(item)
+
+    report = {
+        'schema': REPORT_SCHEMA,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': git_commit(),
+        'environment': environment(with_ocr, with_pdf),
+        'config': config,
+        'phases': {},
+    }
+
+    report['phases']['tokens'] = bench_tokens(pages, args.repeat)
+    print_phase("Extraction on synthetic tokens", report['phases']['tokens'])
+
+    if not args.no_images:
+        if not with_ocr:
+            print("\n  [Warning] Tesseract not available: timing preprocessing only "
+                  "(heuristic orientation, no OCR or OCR accuracy)")
+        pdf_dir = None
+        try:
+            pdf_paths = None
+            if with_pdf:
+                pdf_dir = tempfile.mkdtemp(prefix="bench_pdf_")
+                pdf_paths = {}
+                for name, images in images_by_report.items():
+                    pdf_paths[name] = os.path.join(pdf_dir, f"{name}.pdf")
+                    save_pdf(pdf_paths[name], images, args.dpi)
+            else:
+                print("  [Warning] poppler not found: pages are used as rendered (no rasterize stage)")
+            report['phases']['images'] = bench_images(pages, args.repeat, args.orientation,
+                                                      args.skew_mode, with_ocr, pdf_paths, args.dpi)
+        finally:
+            if pdf_dir:
+                shutil.rmtree(pdf_dir, ignore_errors=True)
+        print_phase("Scans", report['phases']['images'])
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Corrections Log: Append-only store of reviewer corrections (training data)
+# =============================================================================
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; single-process use only there
+    fcntl = None
+
+from token_store import (load_page_tokens, write_report_tokens, TokenStore, STORE_SUFFIX,
+                         BOX_COLUMNS)
+
+LOG_FILE = "corrections.jsonl"
+LEGACY_PREFIX = "correction_"
+# Reviewed pages' tokens, one store per distinct content (see snapshot_tokens)
+SNAPSHOT_DIR = "tokens"
+
+_lock = threading.Lock()
+
+
+def log_path(corrections_dir):
+    return os.path.join(corrections_dir, LOG_FILE)
+
+
+def page_stem_of(report_name):
+    """Token page stem a report file refers to ('x_page_01_extracted.json' -> 'x_page_01')."""
+    return report_name.replace('_extracted.json', '')
+
+
+def token_digest(tokens):
+    """
+    SHA-256 of a page's tokens as the token store keeps them (confidence
+    rounded to an integer), so a snapshot hashes the same after a round trip.
+    """
+    data = {
+        'conf': np.clip(np.round(tokens['conf'].to_numpy(dtype=np.float64)), 0, 255).astype(int).tolist(),
+        'text': [str(text) for text in tokens['text']],
+    }
+    for col in BOX_COLUMNS:
+        data[col] = tokens[col].to_numpy(dtype=np.int64).tolist()
+    encoded = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def snapshot_path(corrections_dir, digest):
+    return os.path.join(corrections_dir, SNAPSHOT_DIR, f"{digest}{STORE_SUFFIX}")
+
+
+def snapshot_tokens(corrections_dir, tokens):
+    """
+    Copies a reviewed page's tokens into the corrections folder.
+
+    Snapshots are append-only and named by content hash: identical tokens
+    are stored once, and a snapshot is never overwritten. Unlike the
+    pipeline's token folder (cleared by normal runs, rewritten when a
+    report is processed again), they last as long as the log.
+
+    Returns:
+        str: The tokens' digest (see token_digest)
+    """
+    digest = token_digest(tokens)
+    path = snapshot_path(corrections_dir, digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_report_tokens(path, [(1, tokens)])
+    return digest
+
+
+def load_snapshot(corrections_dir, digest):
+    """
+    Tokens of a snapshot, or None if it is missing or its contents no
+    longer match the digest.
+    """
+    path = snapshot_path(corrections_dir, digest)
+    if not os.path.exists(path):
+        return None
+    with TokenStore(path) as store:
+        tokens = store.page(1)
+    return tokens if token_digest(tokens) == digest else None
+
+
+@contextmanager
+def _locked(path, exclusive):
+    """
+    Holds the log's lock: threads in this process, and other processes
+    through flock on a sidecar lock file (appends share it, compaction
+    takes it exclusively).
+    """
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path + ".lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# ============================================================================
+# WRITING
+# ============================================================================
+
+def append_correction(corrections_dir, report_name, corrected, tokens, saved_at=None):
+    """
+    Appends one reviewer save to the corrections log.
+
+    The page's tokens are snapshotted into the corrections folder first
+    (see snapshot_tokens) and the entry records their digest, so the
+    training example survives the pipeline's token folder being cleared
+    or the report being processed again.
+
+    Args:
+        corrections_dir (str): Directory holding the log
+        report_name (str): Reviewed file, e.g. 'report_page_01_extracted.json'
+        corrected (dict): {'fields': {...}, 'test_results': [...]} as saved
+        tokens (DataFrame): Tokens of the page (see token_store.load_page_tokens)
+        saved_at (float): Unix time (default: now)
+    """
+    entry = {
+        "report": report_name,
+        "page_stem": page_stem_of(report_name),
+        "token_count": len(tokens),
+        "tokens_sha256": snapshot_tokens(corrections_dir, tokens),
+        "saved_at": saved_at or time.time(),
+        "corrected_labels": corrected,
+    }
+    line = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+    path = log_path(corrections_dir)
+    with _locked(path, exclusive=False):
+        # One O_APPEND write per entry: lines never interleave
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+# ============================================================================
+# READING / COMPACTION
+# ============================================================================
+
+def iter_log(path):
+    """Yields the entries of a log in order, skipping a torn last line."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                print(f"  [Warning] Skipping unreadable line {line_number} of {path}")
+
+
+def latest_corrections(path):
+    """The most recent entry per report, in order of first appearance."""
+    latest = {}
+    for entry in iter_log(path):
+        latest[entry['report']] = entry
+    return latest
+
+
+def compact_log(corrections_dir):
+    """
+    Rewrites the log keeping only the latest save of each report.
+
+    Appends are blocked for the duration (other processes included, via
+    flock), and the compacted log replaces the old one atomically.
+
+    Returns:
+        tuple: (entries before, entries after)
+    """
+    path = log_path(corrections_dir)
+    with _locked(path, exclusive=True):
+        before = sum(1 for _ in iter_log(path))
+        latest = latest_corrections(path)
+        entries = sorted(latest.values(), key=lambda e: e['saved_at'])
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(tmp_path, path)
+    return before, len(entries)
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def iter_legacy_corrections(corrections_dir):
+    """Yields the per-report training files written before the log existed."""
+    for file_name in sorted(os.listdir(corrections_dir)):
+        if file_name.startswith(LEGACY_PREFIX) and file_name.endswith('.json'):
+            with open(os.path.join(corrections_dir, file_name), 'r') as f:
+                yield json.load(f)
+
+
+def entry_tokens(entry, corrections_dir, tokens_dir):
+    """
+    The tokens a log entry was reviewed against, or None if they cannot be
+    recovered exactly.
+
+    Entries with a snapshot digest read only their snapshot. Entries logged
+    before snapshots existed fall back to the pipeline's token store, and
+    are refused unless the page still has the token count it was reviewed with.
+    """
+    if entry.get('tokens_sha256'):
+        return load_snapshot(corrections_dir, entry['tokens_sha256'])
+    tokens = load_page_tokens(tokens_dir, entry['page_stem'])
+    if tokens is None or entry.get('token_count') != len(tokens):
+        return None
+    return tokens
+
+
+def export_training_set(corrections_dir, tokens_dir, output_path):
+    """
+    Materializes the full training set: one JSON line per reviewed report with
+    its original tokens (see entry_tokens) and the latest labels.
+
+    Lines have the layout of the old per-report training files:
+    {"source_file", "original_tokens", "corrected_labels"}. Legacy files for
+    reports not in the log are carried over as they are.
+
+    Returns:
+        tuple: (examples written, reports skipped because their tokens are
+                missing or do not match the review)
+    """
+    latest = latest_corrections(log_path(corrections_dir))
+    written = skipped = 0
+
+    with open(output_path, 'w', encoding='utf-8') as out:
+        def write(example):
+            out.write(json.dumps(example, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+        for report_name, entry in latest.items():
+            tokens = entry_tokens(entry, corrections_dir, tokens_dir)
+            if tokens is None:
+                print(f"  [Warning] Tokens reviewed for {entry['page_stem']} are missing or "
+                      f"changed, skipping {report_name}")
+                skipped += 1
+                continue
+            columns = list(tokens.columns)
+            records = [dict(zip(columns, row)) for row in zip(*(tokens[c].tolist() for c in columns))]
+            write({"source_file": report_name, "original_tokens": records,
+                   "corrected_labels": entry['corrected_labels']})
+            written += 1
+
+        for example in iter_legacy_corrections(corrections_dir):
+            if example.get('source_file') not in latest:
+                write(example)
+                written += 1
+
+    return written, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the reviewer corrections log.")
+    parser.add_argument("--corrections-dir", default="output_corrections")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("compact", help="Drop superseded re-saves from the log")
+    export = subparsers.add_parser("export", help="Write the full training set as JSON Lines")
+    export.add_argument("output", help="Output .jsonl path")
+    export.add_argument("--tokens-dir", default="output_ocr_tokens",
+                        help="Token folder for entries logged before token snapshots")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        before, after = compact_log(args.corrections_dir)
+        print(f"Compacted {log_path(args.corrections_dir)}: {before} -> {after} entries")
+    else:
+        written, skipped = export_training_set(args.corrections_dir, args.tokens_dir, args.output)
+        print(f"Exported {written} training example(s) to {args.output}"
+              + (f" ({skipped} skipped, tokens missing or changed)" if skipped else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Ingest Daemon: Watches the input folder and feeds new reports to the pipeline
+# =============================================================================
+
+import os
+import json
+import time
+import queue
+import select
+import signal
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+import metrics
+from module_one import page_output_name, SUPPORTED_IMAGE_EXTENSIONS
+from module_three import merge_report_pages
+from pipeline import run_staged_reports
+
+# Seconds a file's size and mtime must stay unchanged before it is processed
+DEFAULT_SETTLE = 1.0
+DEFAULT_POLL_INTERVAL = 1.0
+# A PDF without its trailing %%EOF marker is still being written; give up
+# waiting for it after this long (it is then processed, and fails if truncated)
+MAX_PDF_WAIT = 120.0
+# Processed files, one JSON line per outcome (kept out of the *.json review listing)
+STATE_FILE = "ingest_state.jsonl"
+
+SUPPORTED_EXTENSIONS = ['.pdf'] + SUPPORTED_IMAGE_EXTENSIONS
+# Temporary names used by editors, browsers and copy tools while writing
+PARTIAL_SUFFIXES = ('.tmp', '.part', '.crdownload', '.partial', '~')
+
+_STOP = object()
+
+
+def is_candidate(file_name):
+    """Whether a file in the input folder looks like a finished report to process."""
+    if file_name.startswith('.') or file_name.lower().endswith(PARTIAL_SUFFIXES):
+        return False
+    return os.path.splitext(file_name)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+def file_signature(path):
+    """(size, mtime in ns) of a regular file, or None if it is gone."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isfile(path):
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def pdf_complete(path):
+    """Whether a PDF ends with its %%EOF marker (PDF writers put it last)."""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(max(0, os.path.getsize(path) - 1024))
+            return b'%%EOF' in f.read()
+    except OSError:
+        return False
+
+
+# ============================================================================
+# WATCHERS
+# ============================================================================
+
+class InotifyWatcher:
+    """
+    Linux inotify on one directory (via libc, no extra dependency).
+
+    wait() returns the names of entries created, written, closed or moved
+    into the directory since the last call.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available on this platform")
+        self.directory = directory
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, f"Cannot watch {directory}")
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        names = set()
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            _, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                return set(os.listdir(self.directory))  # events were lost: look at everything
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """
+    Fallback watcher comparing directory snapshots every interval seconds
+    (other platforms, or network shares where inotify sees no remote writes).
+    """
+
+    def __init__(self, directory, interval=DEFAULT_POLL_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._snapshot = {}
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        snapshot = {}
+        for name in os.listdir(self.directory):
+            signature = file_signature(os.path.join(self.directory, name))
+            if signature is not None:
+                snapshot[name] = signature
+        changed = {name for name, signature in snapshot.items()
+                   if self._snapshot.get(name) != signature}
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(directory, poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True):
+    """An InotifyWatcher where possible, else a PollingWatcher."""
+    if use_inotify:
+        try:
+            return InotifyWatcher(directory)
+        except OSError as e:
+            print(f"  [Warning] {e}; polling every {poll_interval}s instead")
+    return PollingWatcher(directory, poll_interval)
+
+
+# ============================================================================
+# STATE
+# ============================================================================
+
+class IngestState:
+    """
+    Append-only log of processed files (name, size and mtime, outcome), so a
+    restarted daemon skips what it already did. A file is processed again
+    only once it changes; failed files too, so a bad file is not retried in
+    a loop.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._latest = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._latest[entry['name']] = tuple(entry['signature'])
+                    except (ValueError, KeyError, TypeError):
+                        continue  # a line cut short by a crash
+
+    def is_processed(self, name, signature):
+        with self._lock:
+            return self._latest.get(name) == signature
+
+    def record(self, name, signature, status, **extra):
+        entry = {'name': name, 'signature': list(signature), 'status': status,
+                 'time': round(time.time(), 3), **extra}
+        with self._lock, open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            self._latest[name] = tuple(signature)
+
+
+# ============================================================================
+# DAEMON
+# ============================================================================
+
+class IngestDaemon:
+    """
+    Long-running ingest: reports dropped into input_folder are picked up,
+    run through the staged pipeline and written to extraction_dir, where
+    the review API lists them (through the shared report index).
+
+    A file is queued once its size and mtime have been stable for settle
+    seconds (and, for a PDF, once it ends with %%EOF), so half-copied files
+    are not read. A file that changes again later is processed again.
+    Stop with SIGINT/SIGTERM (or stop()): pages already in the pipeline are
+    finished, files not yet started are picked up on the next run.
+
+    Args:
+        input_folder: Directory to watch (not recursive)
+        extraction_dir, cleaned_dir, tokens_dir, stage_workers, queue_size,
+        options: See pipeline.run_pipeline_staged
+        settle: Seconds a file must stay unchanged before it is processed
+        poll_interval: Seconds between scans when inotify is unavailable
+        use_inotify: False to always poll
+    """
+
+    def __init__(self, input_folder, extraction_dir, cleaned_dir=None, tokens_dir=None,
+                 stage_workers=None, queue_size=4, options=None, settle=DEFAULT_SETTLE,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True):
+        self.input_folder = input_folder
+        self.extraction_dir = extraction_dir
+        self.cleaned_dir = cleaned_dir
+        self.tokens_dir = tokens_dir
+        self.stage_workers = stage_workers
+        self.queue_size = queue_size
+        self.options = options
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        os.makedirs(input_folder, exist_ok=True)
+        os.makedirs(extraction_dir, exist_ok=True)
+        self.state = IngestState(os.path.join(extraction_dir, STATE_FILE))
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = {}    # name -> [signature, first seen, unchanged since]
+        self._submitted = {}  # name -> (signature, first seen)
+        self.ingested = 0
+        self.failed = 0
+
+    def stop(self):
+        """Stops watching; the pipeline drains and run() returns."""
+        self._stop.set()
+        self._queue.put(_STOP)
+
+    def run(self):
+        """Watches and processes until stopped."""
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: self.stop())
+
+        watcher = open_watcher(self.input_folder, self.poll_interval, self.use_inotify)
+        print(f"Watching {self.input_folder}/ ({type(watcher).__name__}, settle {self.settle}s); "
+              f"results go to {self.extraction_dir}/. Ctrl+C to stop.")
+        thread = threading.Thread(target=self._watch, args=(watcher,), daemon=True, name="watcher")
+        thread.start()
+        try:
+            run_staged_reports(self._reports(), self.extraction_dir, self.cleaned_dir,
+                               self.tokens_dir, self.stage_workers, self.queue_size,
+                               self.options, on_report_done=self._report_done)
+        finally:
+            self._stop.set()
+            thread.join()
+            watcher.close()
+        print(f"\nIngest stopped: {self.ingested} report(s) processed, {self.failed} failed.")
+
+    # ------------------------------------------------------------------------
+    # Watcher thread
+    # ------------------------------------------------------------------------
+
+    def _watch(self, watcher):
+        self._observe(os.listdir(self.input_folder))  # files dropped while stopped
+        while not self._stop.is_set():
+            try:
+                timeout = min(0.2, self.settle) if self._pending else 1.0
+                self._observe(watcher.wait(timeout))
+                self._submit_settled()
+            except OSError as e:
+                print(f"  [Error] Watching {self.input_folder}: {e}")
+                self._stop.wait(self.poll_interval)
+
+    def _observe(self, names):
+        now = time.monotonic()
+        for name in names:
+            if not is_candidate(name):
+                continue
+            signature = file_signature(os.path.join(self.input_folder, name))
+            entry = self._pending.get(name)
+            if signature is None:
+                self._pending.pop(name, None)
+            elif entry is not None:
+                if entry[0] != signature:
+                    entry[0], entry[2] = signature, now
+            elif not self._is_known(name, signature):
+                self._pending[name] = [signature, now, now]
+
+    def _is_known(self, name, signature):
+        with self._lock:
+            submitted = self._submitted.get(name)
+        return (submitted is not None and submitted[0] == signature) or \
+            self.state.is_processed(name, signature)
+
+    def _submit_settled(self):
+        now = time.monotonic()
+        for name, entry in list(self._pending.items()):
+            path = os.path.join(self.input_folder, name)
+            signature = file_signature(path)
+            if signature is None:
+                del self._pending[name]
+                continue
+            if signature != entry[0]:
+                entry[0], entry[2] = signature, now
+                continue
+            if now - entry[2] < self.settle:
+                continue
+            if name.lower().endswith('.pdf') and not pdf_complete(path) and now - entry[1] < MAX_PDF_WAIT:
+                continue
+            del self._pending[name]
+            with self._lock:
+                self._submitted[name] = (signature, entry[1])
+            self._queue.put(path)
+
+    # ------------------------------------------------------------------------
+    # Pipeline side
+    # ------------------------------------------------------------------------
+
+    def _reports(self):
+        """Input of the staged pipeline: blocks until a file settles or stop()."""
+        while True:
+            path = self._queue.get()
+            if path is _STOP or self._stop.is_set():
+                return
+            yield path
+
+    def _report_done(self, input_path, pages):
+        name = os.path.basename(input_path)
+        base_name = os.path.splitext(name)[0]
+        with self._lock:
+            signature, first_seen = self._submitted[name]
+
+        if pages:
+            merge_report_pages(self.extraction_dir,
+                               [page_output_name(base_name, page_number) for page_number, _ in pages])
+        self.state.record(name, signature, 'done' if pages else 'failed', pages=len(pages))
+        metrics.count('reports_ingested' if pages else 'reports_failed')
+
+        latency = time.monotonic() - first_seen
+        with self._lock:
+            if pages:
+                self.ingested += 1
+            else:
+                self.failed += 1
+        if pages:
+            print(f"  ⏱ {name}: reviewable {latency:.1f}s after it appeared")
+        else:
+            print(f"  ✗ {name}: no page could be processed")
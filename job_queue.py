@@ -0,0 +1,472 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Job Queue: Uploaded reports processed in the background for the API
+# =============================================================================
+
+import os
+import time
+import uuid
+import shutil
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # optional dependency, only needed for uploads
+    MultipartParser = parse_options_header = None
+
+import metrics
+import pipeline
+from module_one import count_pages, SUPPORTED_IMAGE_EXTENSIONS
+from module_three import merge_report_pages
+from ocr_backend import get_default_backend_name
+
+SUPPORTED_EXTENSIONS = ['.pdf'] + SUPPORTED_IMAGE_EXTENSIONS
+
+# Leave a core for the API's event loop and I/O threads
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MAX_UPLOAD_FILE_BYTES = 200 * 1024 ** 2
+# Threads that save the tokens and merge the pages of finished reports
+FINISH_THREADS = 2
+# Finished jobs kept for status queries before the oldest are forgotten
+MAX_FINISHED_JOBS = 1000
+
+
+# ============================================================================
+# UPLOADS
+# ============================================================================
+
+class UploadWriter:
+    """
+    Streams a multipart/form-data body straight into files.
+
+    feed() only parses (no disk access, safe on the event loop) and queues
+    the writes; flush() performs them and is meant for an I/O thread. Only
+    the current chunk is held in memory, however large the files are.
+
+    Args:
+        content_type (str): The request's Content-Type header
+        destination: Called (from flush) with each uploaded file name;
+                     returns the path to write it to, or None to skip it
+        max_file_bytes (int): Larger files fail the upload (too_large is set)
+    """
+
+    def __init__(self, content_type, destination, max_file_bytes=MAX_UPLOAD_FILE_BYTES):
+        if MultipartParser is None:
+            raise ValueError("Uploads need the python-multipart package")
+        kind, params = parse_options_header(content_type or '')
+        if kind != b'multipart/form-data' or not params.get(b'boundary'):
+            raise ValueError("Expected a multipart/form-data body")
+        self.destination = destination
+        self.max_file_bytes = max_file_bytes
+        self.files = []      # paths written
+        self.skipped = []    # file names destination() refused
+        self.too_large = False
+        self._pending = []   # ('open', name) / ('write', bytes) / ('close', None)
+        self._file = None
+        self._part = {}
+        self._parser = MultipartParser(params[b'boundary'], {
+            'on_part_begin': self._part_begin,
+            'on_header_field': self._header_field,
+            'on_header_value': self._header_value,
+            'on_header_end': self._header_end,
+            'on_headers_finished': self._headers_finished,
+            'on_part_data': self._part_data,
+            'on_part_end': self._part_end,
+        })
+
+    @property
+    def pending(self):
+        return bool(self._pending)
+
+    def feed(self, chunk):
+        self._parser.write(chunk)
+
+    def finish(self):
+        self._parser.finalize()
+
+    def flush(self):
+        """Performs the queued file operations (blocking)."""
+        pending, self._pending = self._pending, []
+        for action, value in pending:
+            if action == 'open':
+                path = self.destination(value)
+                if path is None:
+                    self.skipped.append(value)
+                else:
+                    self._file = open(path, 'wb')
+                    self.files.append(path)
+            elif self._file is not None:
+                if action == 'write':
+                    self._file.write(value)
+                else:
+                    self._file.close()
+                    self._file = None
+
+    def close(self):
+        """Closes a file left open by an interrupted upload."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # --- parser callbacks ---
+
+    def _part_begin(self):
+        self._part = {'headers': {}, 'field': b'', 'value': b'', 'file': False, 'size': 0}
+
+    def _header_field(self, data, start, end):
+        self._part['field'] += data[start:end]
+
+    def _header_value(self, data, start, end):
+        self._part['value'] += data[start:end]
+
+    def _header_end(self):
+        part = self._part
+        part['headers'][part['field'].lower()] = part['value']
+        part['field'] = part['value'] = b''
+
+    def _headers_finished(self):
+        _, params = parse_options_header(self._part['headers'].get(b'content-disposition', b''))
+        file_name = params.get(b'filename')
+        if file_name is not None:  # plain form fields are ignored
+            self._part['file'] = True
+            self._pending.append(('open', file_name.decode('utf-8', 'replace')))
+
+    def _part_data(self, data, start, end):
+        part = self._part
+        if not part['file']:
+            return
+        part['size'] += end - start
+        if part['size'] > self.max_file_bytes:
+            self.too_large = True
+            raise ValueError(f"File larger than {self.max_file_bytes // 1024 ** 2} MB")
+        self._pending.append(('write', bytes(data[start:end])))
+
+    def _part_end(self):
+        if self._part['file']:
+            self._pending.append(('close', None))
+
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+class JobReport:
+    """Progress of one uploaded report (file) of a job."""
+
+    def __init__(self, path, error=None):
+        self.path = path
+        self.file = os.path.basename(path)
+        self.pages = 0
+        self.pages_done = 0
+        self.pages_failed = 0
+        self.results = []           # JSON names written to the extraction folder
+        self.errors = [error] if error else []
+        self.status = 'failed' if error else 'queued'
+        self.tokens = []            # (page_number, tokens) until the report is done
+        self.failed_pages = []
+
+    def as_dict(self):
+        return {'file': self.file, 'status': self.status, 'pages': self.pages,
+                'pages_done': self.pages_done, 'pages_failed': self.pages_failed,
+                'results': sorted(self.results), 'errors': list(self.errors)}
+
+
+class Job:
+    """
+    A batch of uploaded reports. version increases on every change, so
+    watchers (the API's event stream) can poll it cheaply.
+    """
+
+    def __init__(self, job_id, upload_dir):
+        self.id = job_id
+        self.upload_dir = upload_dir
+        self.created_at = time.time()
+        self.finished_at = None
+        self.reports = []
+        self.version = 0
+        self._names = set()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def upload_path(self, file_name):
+        """
+        Where an uploaded file is stored (None if it is not a supported
+        report). Client paths are stripped and repeated names numbered as
+        "scan-2.pdf": output names only lose a trailing _page_NN (see
+        module_three.merged_result_name), so the copies keep separate results.
+        """
+        file_name = os.path.basename(file_name.replace('\\', '/')).strip()
+        base_name, ext = os.path.splitext(file_name)
+        if not base_name or file_name.startswith('.') or ext.lower() not in SUPPORTED_EXTENSIONS:
+            return None
+        n = 1
+        while file_name in self._names:
+            n += 1
+            file_name = f"{base_name}-{n}{ext}"
+        self._names.add(file_name)
+        os.makedirs(self.upload_dir, exist_ok=True)
+        return os.path.join(self.upload_dir, file_name)
+
+    def as_dict(self, reports=True):
+        with self._lock:
+            pages = sum(r.pages for r in self.reports)
+            done = sum(r.pages_done + r.pages_failed for r in self.reports)
+            finished_reports = [r for r in self.reports if r.status in ('done', 'failed')]
+            if self.finished:
+                status = 'done' if any(r.status == 'done' for r in self.reports) else 'failed'
+            else:
+                status = 'running' if done else 'queued'
+            data = {
+                'job_id': self.id,
+                'status': status,
+                'created_at': round(self.created_at, 3),
+                'finished_at': round(self.finished_at, 3) if self.finished_at else None,
+                'reports_total': len(self.reports),
+                'reports_done': sum(1 for r in finished_reports if r.status == 'done'),
+                'reports_failed': sum(1 for r in finished_reports if r.status == 'failed'),
+                'pages_total': pages,
+                'pages_done': sum(r.pages_done for r in self.reports),
+                'pages_failed': sum(r.pages_failed for r in self.reports),
+                'version': self.version,
+            }
+            if reports:
+                data['reports'] = [r.as_dict() for r in self.reports]
+            return data
+
+
+class JobManager:
+    """
+    Runs uploaded reports through preprocess -> OCR -> extract on a pool of
+    worker processes, one task per page (pipeline.process_page_task, as in
+    run_pipeline_parallel), and tracks the progress of every job.
+
+    The work runs in separate processes, so OCR never competes with the
+    API's event loop and I/O threads for the GIL. Results go to the same
+    folders and report index as the other modes (a report uploaded again
+    under the same name replaces its earlier results), so finished reports
+    show up in the review listing. Reports of different jobs that share a
+    name write the same outputs, so they run one after the other. Jobs are
+    kept in memory only; a job's uploaded files are deleted when it is
+    forgotten.
+
+    Args:
+        upload_dir: Uploaded files are kept in <upload_dir>/<job id>/
+        extraction_dir: Directory for extraction JSON files
+        tokens_dir: Optional directory for token files (needed for review saves)
+        workers: Worker processes
+        options: Processing options (see pipeline.DEFAULT_OPTIONS)
+    """
+
+    def __init__(self, upload_dir, extraction_dir, tokens_dir=None, workers=DEFAULT_WORKERS,
+                 options=None):
+        self.upload_dir = upload_dir
+        self.extraction_dir = extraction_dir
+        self.tokens_dir = tokens_dir
+        self.workers = workers
+        self.options = options
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._closed = False
+        # Report name -> reports of later jobs waiting for the running one
+        self._running_names = {}
+        # Finishing a report is file I/O; it must not hold up the executor's
+        # result thread, which delivers every other page's result. Kept
+        # running across shutdown() so late page callbacks can still finish.
+        self._finisher = ThreadPoolExecutor(max_workers=FINISH_THREADS,
+                                            thread_name_prefix='job-finish')
+
+    def create(self):
+        """A new, empty job (files are added by an UploadWriter, then submit())."""
+        job_id = uuid.uuid4().hex
+        job = Job(job_id, os.path.join(self.upload_dir, job_id))
+        with self._lock:
+            self._jobs[job_id] = job
+            finished = [j.id for j in self._jobs.values() if j.finished]
+            forgotten = [self._jobs.pop(old_id)
+                         for old_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]]
+        # Called from the event loop: delete the files on a finisher thread
+        for old_job in forgotten:
+            self._finisher.submit(shutil.rmtree, old_job.upload_dir, ignore_errors=True)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def discard(self, job):
+        """Forgets a job whose upload failed and deletes its files (blocking)."""
+        with self._lock:
+            self._jobs.pop(job.id, None)
+        shutil.rmtree(job.upload_dir, ignore_errors=True)
+
+    def submit(self, job, paths, skipped=()):
+        """
+        Queues every page of the uploaded files (blocking: counts pages). A
+        report whose name is still being processed for another job waits
+        for it to finish.
+
+        Args:
+            job: Job from create()
+            paths: Uploaded report files
+            skipped: Uploaded file names that were not stored (unsupported)
+        """
+        for directory in (self.extraction_dir, self.tokens_dir):
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        reports = [JobReport(name, "Unsupported file type") for name in skipped]
+        for path in paths:
+            report = JobReport(path)
+            try:
+                report.pages = count_pages(path)
+                if report.pages == 0:
+                    raise ValueError("No pages found")
+            except Exception as e:
+                report.status = 'failed'
+                report.errors.append(f"{type(e).__name__}: {e}")
+            reports.append(report)
+
+        with job._lock:
+            job.reports = reports
+            job.version += 1
+        queued = [r for r in reports if r.status == 'queued']
+        if not queued:
+            self._finish_job(job)
+            return
+
+        print(f"  Job {job.id}: {len(queued)} report(s), "
+              f"{sum(r.pages for r in queued)} page(s) queued")
+        for report in queued:
+            name = os.path.splitext(report.file)[0]
+            with self._lock:
+                waiting = self._running_names.get(name)
+                if waiting is None:
+                    self._running_names[name] = deque()
+                else:
+                    waiting.append((job, report))
+            if waiting is None:
+                self._start_report(job, report)
+
+    def shutdown(self):
+        """Stops the workers; queued pages are dropped (failed)."""
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start_report(self, job, report):
+        for page_number in range(1, report.pages + 1):
+            self._submit_page(job, report, page_number)
+
+    def _next_report(self, report):
+        """Starts the next waiting report with the same name, if any."""
+        name = os.path.splitext(report.file)[0]
+        with self._lock:
+            waiting = self._running_names[name]
+            if not waiting:
+                del self._running_names[name]
+                return
+            job, report = waiting.popleft()
+        self._start_report(job, report)
+
+    def _submit_page(self, job, report, page_number):
+        args = (pipeline.process_page_task, report.path, page_number, None,
+                self.extraction_dir, bool(self.tokens_dir), self.options)
+        if self._closed:
+            future = Future()
+            future.set_exception(RuntimeError("Job manager shut down"))
+            self._page_done(job, report, page_number, future)
+            return
+        try:
+            future = self._get_executor().submit(*args)
+        except BrokenProcessPool:
+            # A worker died earlier (its pages were failed); start a new pool
+            self._get_executor(replace=True)
+            future = self._get_executor().submit(*args)
+        future.add_done_callback(partial(self._page_done, job, report, page_number))
+
+    def _get_executor(self, replace=False):
+        with self._lock:
+            if replace and self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._executor is None:
+                # Spawned, not forked: the API process runs threads whose
+                # locks a fork could copy in a held state
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=pipeline._init_worker, initargs=(get_default_backend_name(),))
+            return self._executor
+
+    def _page_done(self, job, report, page_number, future):
+        """Runs on the executor's result thread as each page finishes (keep it short)."""
+        try:
+            status = future.result()
+        except Exception as e:
+            # The worker process itself died (e.g. killed for memory), or shutdown
+            status = {'page': page_number, 'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        if 'metrics' in status:
+            metrics.record_page(status.pop('metrics'))
+
+        with job._lock:
+            if status.get('ok'):
+                report.pages_done += 1
+                report.results.append(f"{status['stem']}_extracted.json")
+                if 'page_data' in status:
+                    report.tokens.append((page_number, status['page_data']['tokens']))
+            else:
+                report.pages_failed += 1
+                report.failed_pages.append(page_number)
+                report.errors.append(f"page {page_number}: {status['error']}")
+            report_done = report.pages_done + report.pages_failed == report.pages
+            job.version += 1
+        if report_done:
+            self._finisher.submit(self._finish_report, job, report)
+
+    def _finish_report(self, job, report):
+        """Saves the report's tokens and merges its pages (on a finisher thread)."""
+        with job._lock:
+            pages = sorted(report.tokens, key=lambda page: page[0])
+            stems = [name[:-len('_extracted.json')] for name in report.results]
+            failed_pages = list(report.failed_pages)
+        results, errors = [], []
+        try:
+            pipeline.save_tokens(report.path, pages, self.tokens_dir, self.options, failed_pages)
+            merged_name = merge_report_pages(self.extraction_dir, stems)
+            if merged_name:
+                results.append(merged_name)
+        except Exception as e:
+            print(f"  [Error] Job {job.id}: finishing {report.file}: {e}")
+            errors.append(f"{type(e).__name__}: {e}")
+
+        with job._lock:
+            report.results += results
+            report.errors += errors
+            report.tokens = []
+            report.status = 'done' if report.pages_done else 'failed'
+            job.version += 1
+            all_done = all(r.status in ('done', 'failed') for r in job.reports)
+        self._next_report(report)
+        if all_done:
+            self._finish_job(job)
+
+    def _finish_job(self, job):
+        with job._lock:
+            if job.finished:
+                return  # the last two reports finished at once
+            job.finished_at = time.time()
+            job.version += 1
+            reports_done = sum(1 for r in job.reports if r.status == 'done')
+        print(f"  Job {job.id} finished: {reports_done}/{len(job.reports)} report(s) processed "
+              f"in {job.finished_at - job.created_at:.1f}s")
@@ -0,0 +1,97 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Layout Analysis: Text-region detection between preprocessing and OCR
+# =============================================================================
+
+import cv2
+import numpy as np
+
+# Morphology runs on a copy downscaled by this factor (fast on 300-DPI pages)
+LAYOUT_SCALE = 4
+
+
+def detect_text_regions(image, close_width=60, close_height=40, min_area=400,
+                        ignore_bottom=0.0):
+    """
+    Finds the blocks of text on a preprocessed page.
+
+    Ink is smeared horizontally (joining words into lines and table cells
+    into rows) and slightly vertically (joining lines into blocks); each
+    connected blob becomes one region. Blank margins, gaps between sections
+    and isolated specks are left out. Blobs are not convex, so their boxes
+    can overlap (an L-shaped header-plus-column blob encloses the next
+    column); overlapping boxes are merged so no text is OCR'd twice.
+
+    Args:
+        image: Binarized page (dark text on white), e.g. from module_one.preprocess_page
+        close_width: Horizontal gap (full-resolution px) bridged inside a block
+        close_height: Vertical gap (full-resolution px) bridged inside a block
+        min_area: Smallest region kept, in full-resolution px
+        ignore_bottom: Fraction of the page height at the bottom (footer,
+                       disclaimers, signatures) that is never OCR'd
+
+    Returns:
+        list: Non-overlapping (x, y, w, h) boxes in page coordinates, top-to-bottom
+    """
+    h, w = image.shape[:2]
+    small = cv2.resize(255 - image, (max(1, w // LAYOUT_SCALE), max(1, h // LAYOUT_SCALE)),
+                       interpolation=cv2.INTER_AREA)
+    ink = (small > 0).astype(np.uint8)
+
+    kernel = cv2.getStructuringElement(
+        cv2.MORPH_RECT,
+        (max(1, close_width // LAYOUT_SCALE), max(1, close_height // LAYOUT_SCALE)),
+    )
+    blocks = cv2.dilate(ink, kernel)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(blocks, connectivity=8)
+    limit = h * (1.0 - ignore_bottom)
+    sx, sy = w / small.shape[1], h / small.shape[0]
+
+    regions = []
+    for x, y, bw, bh, _ in stats[1:]:
+        x0, y0 = int(x * sx), int(y * sy)
+        x1, y1 = min(w, int(np.ceil((x + bw) * sx))), min(h, int(np.ceil((y + bh) * sy)))
+        if (x1 - x0) * (y1 - y0) < min_area or y0 >= limit:
+            continue
+        regions.append((x0, y0, x1 - x0, min(y1, int(limit)) - y0))
+
+    return merge_overlapping_regions(regions)
+
+
+def merge_overlapping_regions(regions):
+    """
+    Replaces every group of overlapping or nested boxes by their bounding box.
+
+    Args:
+        regions: (x, y, w, h) boxes
+
+    Returns:
+        list: Non-overlapping (x, y, w, h) boxes, top-to-bottom
+    """
+    boxes = [[x, y, x + w, y + h] for x, y, w, h in regions]
+    merged = True
+    while merged:
+        # A union can reach boxes it did not overlap before: repeat until stable
+        merged = False
+        kept = []
+        for box in boxes:
+            for other in kept:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    other[:] = [min(box[0], other[0]), min(box[1], other[1]),
+                                max(box[2], other[2]), max(box[3], other[3])]
+                    merged = True
+                    break
+            else:
+                kept.append(box)
+        boxes = kept
+
+    return sorted(((x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in boxes),
+                  key=lambda r: (r[1], r[0]))
+
+
+def region_coverage(regions, image_shape):
+    """Fraction of the page's pixels covered by the regions."""
+    page = image_shape[0] * image_shape[1]
+    return sum(w * h for _, _, w, h in regions) / page if page else 0.0
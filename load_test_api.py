@@ -0,0 +1,185 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Load Test: Concurrent reviewers against the HITL review API (Module 4)
+# =============================================================================
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+import httpx
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, REPO_DIR)
+
+from token_store import save_report_tokens, page_output_name
+
+WORDS = ['Hemoglobin', '13.5', 'g/dL', '12.0-16.0', 'Patient', 'Name:', 'WBC',
+         '7,200', 'cells/cumm', 'Platelet', 'Count', 'Date:', '12/03/2024', 'Dr.']
+
+
+# ============================================================================
+# FIXTURES (in-process mode)
+# ============================================================================
+
+def create_workspace(reports, tokens_per_page):
+    """
+    Builds a throwaway working directory with what the API reads:
+    extraction JSONs, one token store per report and the static UI.
+    """
+    workspace = tempfile.mkdtemp(prefix="hitl_load_")
+    extraction_dir = os.path.join(workspace, "output_extracted_data")
+    tokens_dir = os.path.join(workspace, "output_ocr_tokens")
+    os.makedirs(extraction_dir)
+    os.makedirs(tokens_dir)
+    os.symlink(os.path.join(REPO_DIR, "static"), os.path.join(workspace, "static"))
+
+    rng = random.Random(0)
+    for i in range(reports):
+        base_name = f"report_{i:03d}"
+        tokens = pd.DataFrame({
+            'conf': [rng.randint(40, 96) for _ in range(tokens_per_page)],
+            'text': [rng.choice(WORDS) for _ in range(tokens_per_page)],
+            'left': [100 + 250 * (k % 8) for k in range(tokens_per_page)],
+            'top': [150 + 40 * (k // 8) for k in range(tokens_per_page)],
+            'width': [120] * tokens_per_page,
+            'height': [28] * tokens_per_page,
+        })
+        save_report_tokens(tokens_dir, base_name, [(1, tokens)])
+
+        stem = page_output_name(base_name, 1)
+        report = {
+            "fields": {"Name": "Test Patient", "Age": "42", "Gender": "F"},
+            "test_results": [{"test_name": "Hemoglobin", "value": "13.5", "unit": "g/dL",
+                              "reference_range": "12.0-16.0"}] * 25,
+        }
+        with open(os.path.join(extraction_dir, f"{stem}_extracted.json"), 'w') as f:
+            json.dump(report, f, indent=2)
+    return workspace
+
+
+# ============================================================================
+# SERVER LOOP (in-process mode)
+# ============================================================================
+
+class ServerThreadTransport(httpx.AsyncBaseTransport):
+    """
+    Runs the ASGI app on its own event loop in a background thread.
+    
+    httpx.ASGITransport alone would execute each handler inside the calling
+    client coroutine, hiding any blocking on the server loop. Here requests
+    queue on a separate server loop like they would under uvicorn, so one
+    blocked handler delays everyone else's requests.
+    """
+    
+    def __init__(self, app):
+        self._transport = httpx.ASGITransport(app=app)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+    
+    async def _serve(self, method, url, headers, content):
+        request = httpx.Request(method, url, headers=headers, content=content)
+        response = await self._transport.handle_async_request(request)
+        body = b''.join([chunk async for chunk in response.aiter_raw()])  # still encoded (gzip)
+        return response.status_code, response.headers, body
+    
+    async def handle_async_request(self, request):
+        content = await request.aread()
+        future = asyncio.run_coroutine_threadsafe(
+            self._serve(request.method, request.url, request.headers, content), self._loop)
+        status_code, headers, body = await asyncio.wrap_future(future)
+        return httpx.Response(status_code, headers=headers, content=body, request=request)
+    
+    async def aclose(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+# ============================================================================
+# LOAD GENERATION
+# ============================================================================
+
+async def reviewer(client, sessions, latencies, rng):
+    """One reviewer: open the UI, list reports, open one and save it, repeatedly."""
+
+    async def timed(label, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        latencies[label].append(time.perf_counter() - start)
+        response.raise_for_status()
+        return response
+
+    for _ in range(sessions):
+        await timed("GET /", "GET", "/")
+        reports = (await timed("GET /api/reports", "GET", "/api/reports")).json()["reports"]
+        report_name = rng.choice(reports)
+        report = (await timed("GET /api/report", "GET", f"/api/report/{report_name}")).json()
+        await timed("POST /api/save", "POST", f"/api/save/{report_name}", json=report)
+
+
+def print_latencies(latencies, elapsed):
+    """Request count and latency percentiles (ms) per endpoint."""
+    print(f"\n{'endpoint':<18} {'requests':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    everything = []
+    for label, values in latencies.items():
+        everything.extend(values)
+        p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+        print(f"{label:<18} {len(values):>8} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {max(values) * 1000:>8.1f}")
+    p50, p95, p99 = np.percentile(everything, [50, 95, 99]) * 1000
+    print(f"{'all':<18} {len(everything):>8} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {max(everything) * 1000:>8.1f}")
+    print(f"\nThroughput: {len(everything) / elapsed:.0f} requests/s over {elapsed:.1f}s")
+
+
+async def run_load(client, reviewers, sessions):
+    latencies = defaultdict(list)
+    start = time.perf_counter()
+    await asyncio.gather(*(reviewer(client, sessions, latencies, random.Random(i))
+                           for i in range(reviewers)))
+    print_latencies(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the HITL review API.")
+    parser.add_argument("--reviewers", type=int, default=50, help="Concurrent reviewers")
+    parser.add_argument("--sessions", type=int, default=5, help="Review sessions per reviewer")
+    parser.add_argument("--reports", type=int, default=20, help="Synthetic reports (in-process mode)")
+    parser.add_argument("--tokens", type=int, default=3000, help="Tokens per page (in-process mode)")
+    parser.add_argument("--url", default=None,
+                        help="Test a running server (e.g. http://127.0.0.1:8000) instead of "
+                             "an in-process app on synthetic data")
+    args = parser.parse_args()
+
+    print(f"{args.reviewers} reviewers x {args.sessions} sessions "
+          f"(GET /, list, open, save)")
+
+    if args.url:
+        limits = httpx.Limits(max_connections=args.reviewers)
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60)
+    else:
+        workspace = create_workspace(args.reports, args.tokens)
+        print(f"In-process app on {args.reports} synthetic reports "
+              f"({args.tokens} tokens each) in {workspace}")
+        os.chdir(workspace)
+        import api
+        client = httpx.AsyncClient(transport=ServerThreadTransport(api.app),
+                                   base_url="http://review", timeout=60)
+
+    async def run():
+        async with client:
+            await run_load(client, args.reviewers, args.sessions)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
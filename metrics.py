@@ -0,0 +1,304 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Metrics: Stage timers, counters and per-page records for the pipeline
+# =============================================================================
+
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Stages timed across the modules, in pipeline order
+STAGES = ['text_layer', 'rasterize', 'page_wait', 'orientation', 'osd', 'deskew', 'threshold',
+          'layout', 'ocr', 'line_grouping', 'extraction', 'merge', 'write']
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes():
+    """Current resident set size of this process (0 if unknown)."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far (0 if unknown)."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+class Registry:
+    """
+    Process-wide totals: per-stage call count / total / max seconds,
+    named counters and HTTP request timings. Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.counters = {}
+            self.requests = {}
+            self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe_request(self, method, route, status, seconds):
+        with self._lock:
+            entry = self.requests.setdefault((method, route, status), [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def snapshot(self):
+        """JSON-friendly copy of the totals."""
+        with self._lock:
+            return {
+                'stages': {name: {'calls': calls, 'total_s': round(total, 6), 'max_s': round(peak, 6)}
+                           for name, (calls, total, peak) in self.stages.items()},
+                'counters': dict(self.counters),
+                'uptime_s': round(time.time() - self.started, 3),
+                'peak_rss_mb': round(peak_rss_bytes() / 1024 ** 2, 1),
+            }
+
+
+registry = Registry()
+
+
+# ============================================================================
+# PAGE RECORDS
+# ============================================================================
+
+class PageRecord:
+    """
+    Stage timings, counters and peak memory of one page.
+
+    Memory is sampled at every stage boundary while the page is active;
+    stages running on other threads (e.g. PDF pages rendered ahead) are
+    counted in the registry but not attributed to the page.
+    """
+
+    def __init__(self, report, page):
+        self.report = report
+        self.page = page
+        self.stages = {}
+        self.counters = {}
+        self.peak_rss = rss_bytes()
+        self.started = time.perf_counter()
+        self.wall = None
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self.peak_rss = max(self.peak_rss, rss_bytes())
+
+    def increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def finish(self):
+        self.wall = time.perf_counter() - self.started
+        self.peak_rss = max(self.peak_rss, rss_bytes())
+
+    def as_dict(self):
+        return {
+            'type': 'page',
+            'report': self.report,
+            'page': self.page,
+            'wall_s': round(self.wall or 0.0, 6),
+            'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            'counters': dict(self.counters),
+            'peak_rss_mb': round(self.peak_rss / 1024 ** 2, 1),
+        }
+
+
+_local = threading.local()
+
+
+def current_page():
+    return getattr(_local, 'page', None)
+
+
+@contextmanager
+def page_scope(report, page):
+    """
+    Attributes the stages and counters of the enclosed work (on this
+    thread) to one page. Pass the record to record_page() afterwards.
+    """
+    record = PageRecord(report, page)
+    try:
+        with resume_page(record):
+            yield record
+    finally:
+        record.finish()
+
+
+@contextmanager
+def resume_page(record):
+    """
+    Attributes the enclosed work (on this thread) to an existing page
+    record, e.g. a page handed from thread to thread by the staged
+    pipeline. The record is not finished on exit.
+    """
+    previous = current_page()
+    _local.page = record
+    try:
+        yield record
+    finally:
+        _local.page = previous
+
+
+@contextmanager
+def stage(name):
+    """Times a pipeline stage; nested calls of the same stage are counted once."""
+    active = getattr(_local, 'stages', None)
+    if active is None:
+        active = _local.stages = set()
+    if name in active:
+        yield
+        return
+
+    active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        active.discard(name)
+        page = current_page()
+        if page is not None:
+            page.add(name, seconds)  # folded into the registry by record_page()
+        else:
+            registry.observe(name, seconds)
+
+
+def count(name, amount=1):
+    """Adds to a counter (of the current page, if any; see record_page)."""
+    page = current_page()
+    if page is not None:
+        page.increment(name, amount)
+    else:
+        registry.increment(name, amount)
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+_sink_path = None
+_sink_lock = threading.Lock()
+
+
+def configure(jsonl_path=None):
+    """Sets the JSON Lines file page and run records are appended to (None: off)."""
+    global _sink_path
+    _sink_path = jsonl_path
+
+
+def emit(record):
+    """Appends one record to the JSON Lines file, if configured."""
+    if _sink_path is None:
+        return
+    line = json.dumps(record, separators=(',', ':')) + '\n'
+    with _sink_lock, open(_sink_path, 'a') as f:
+        f.write(line)
+
+
+def record_page(record):
+    """
+    Folds a finished page (PageRecord, or its as_dict() sent back by a
+    worker process) into the registry and emits it.
+    """
+    data = record.as_dict() if isinstance(record, PageRecord) else record
+    for name, seconds in data['stages'].items():
+        registry.observe(name, seconds)
+    for name, amount in data['counters'].items():
+        registry.increment(name, amount)
+    registry.increment('pages')
+    emit(data)
+
+
+def emit_run_summary(**extra):
+    """Emits the registry totals as a 'run' record."""
+    emit({'type': 'run', 'time': time.time(), **extra, **registry.snapshot()})
+
+
+def print_stage_summary():
+    """Table of where the time went, slowest stage first."""
+    snapshot = registry.snapshot()
+    if not snapshot['stages']:
+        return
+    total = sum(s['total_s'] for name, s in snapshot['stages'].items() if name != 'page_wait')
+    print("\n" + "-"*70)
+    print("Stage timings")
+    print("-"*70)
+    print(f"  {'stage':<14} {'calls':>7} {'total s':>9} {'share':>7} {'mean ms':>9} {'max ms':>9}")
+    for name, s in sorted(snapshot['stages'].items(), key=lambda item: -item[1]['total_s']):
+        share = f"{100 * s['total_s'] / total:.1f}%" if total and name != 'page_wait' else '-'
+        print(f"  {name:<14} {s['calls']:>7} {s['total_s']:>9.2f} {share:>7} "
+              f"{1000 * s['total_s'] / s['calls']:>9.1f} {1000 * s['max_s']:>9.1f}")
+    if snapshot['counters']:
+        print("  " + ", ".join(f"{name}: {value}" for name, value in sorted(snapshot['counters'].items())))
+    print(f"  Peak memory: {snapshot['peak_rss_mb']} MB")
+
+
+def render_prometheus():
+    """The registry in the Prometheus text exposition format."""
+    snapshot = registry.snapshot()
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    stages = snapshot['stages']
+    family("lab_stage_seconds_total", "counter", "Time spent in each pipeline stage.",
+           [({'stage': n}, s['total_s']) for n, s in stages.items()])
+    family("lab_stage_calls_total", "counter", "Calls of each pipeline stage.",
+           [({'stage': n}, s['calls']) for n, s in stages.items()])
+    family("lab_stage_seconds_max", "gauge", "Slowest single call of each pipeline stage.",
+           [({'stage': n}, s['max_s']) for n, s in stages.items()])
+    for name, value in sorted(snapshot['counters'].items()):
+        family(f"lab_{name}_total", "counter", f"Pipeline counter '{name}'.", [({}, value)])
+
+    with registry._lock:
+        requests = dict(registry.requests)
+    family("lab_http_requests_total", "counter", "HTTP requests handled.",
+           [({'method': m, 'route': r, 'status': s}, v[0]) for (m, r, s), v in requests.items()])
+    family("lab_http_request_seconds_total", "counter", "Time spent handling HTTP requests.",
+           [({'method': m, 'route': r, 'status': s}, round(v[1], 6)) for (m, r, s), v in requests.items()])
+
+    family("process_resident_memory_bytes", "gauge", "Resident memory size in bytes.",
+           [({}, rss_bytes())])
+    family("lab_uptime_seconds", "gauge", "Seconds since the metrics were reset.",
+           [({}, snapshot['uptime_s'])])
+    return "\n".join(lines) + "\n"
@@ -7,38 +7,259 @@
 import os
 import cv2
 import numpy as np
-import pytesseract
-from pdf2image import convert_from_path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pdf2image import convert_from_path, pdfinfo_from_path
 
-def fix_page_orientation(image):
-    """Corrects page orientation and minor skew."""
+from ocr_backend import get_backend
+from metrics import stage
+
+SUPPORTED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png']
+
+# Bump whenever preprocessing output changes; part of the result cache key
+PREPROCESSING_VERSION = 1
+
+# Orientation strategies:
+#   osd       - always run Tesseract OSD (most robust, one extra Tesseract call)
+#   heuristic - projection-profile check on a downscaled copy; OSD only if unsure
+#   ocr       - no OSD here; module_two.ocr_page_checked() OCRs the page as-is
+#               and runs OSD only when the OCR result looks wrong
+ORIENTATION_STRATEGIES = ['osd', 'heuristic', 'ocr']
+
+# Skew estimation modes (accuracy/speed trade-off):
+#   exact      - minAreaRect over every dark pixel of the full-resolution page
+#   fast       - the same estimate on a copy downscaled to SKEW_SAMPLE_SIDE
+#   projection - angle that best aligns text lines with pixel rows, searched
+#                over a bounded sample of ink points from the downscaled copy
+# The correction itself is always applied once, at full resolution.
+SKEW_MODES = ['exact', 'fast', 'projection']
+SKEW_SAMPLE_SIDE = 1000
+
+# PDF rendering resolution. Token coordinates are always reported at
+# DEFAULT_DPI (module_three's pixel tolerances assume it); with dpi='auto'
+# each page is rendered at the lowest ADAPTIVE_DPI_CANDIDATES entry whose
+# median glyph height, estimated from a PROBE_DPI render, reaches
+# TARGET_TEXT_HEIGHT pixels.
+DEFAULT_DPI = 300
+ADAPTIVE_DPI_CANDIDATES = [150, 200, 250, 300]
+PROBE_DPI = 100
+TARGET_TEXT_HEIGHT = 28
+
+def rotate_upright(image, rotation):
+    """Applies an OSD-style rotation (0/90/180/270) to make the page upright."""
+    if rotation == 180:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    elif rotation == 90:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    elif rotation == 270:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    return image
+
+def estimate_orientation(image, max_side=1200, min_lines=3, min_asymmetry=0.02):
+    """
+    Cheap orientation guess from projection profiles of a downscaled copy.
+    
+    Horizontal text lines modulate the row profile much more than the
+    column profile. Within each text line, ascenders/capitals are more
+    common than descenders, so ink sits low in the line band when upright
+    and high when the page is upside down.
+    
+    Returns:
+        tuple: (rotation, confident) - rotation is 0 or 180 when confident,
+               None when the page should go to OSD
+    """
+    h, w = image.shape[:2]
+    scale = min(1.0, max_side / max(h, w))
+    small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else image
+    _, ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    
+    rows = ink.sum(axis=1).astype(float)
+    cols = ink.sum(axis=0).astype(float)
+    if rows.sum() == 0:
+        return None, False
+    
+    row_modulation = rows.std() / rows.mean()
+    col_modulation = cols.std() / cols.mean()
+    if row_modulation < 1.3 * col_modulation:
+        return None, False  # vertical or unclear text direction
+    
+    # Text line bands from the row profile
+    on = (rows > 0.05 * rows.max()).astype(int)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], on, [0]))))
+    offsets, weights = [], []
+    for y0, y1 in zip(edges[::2], edges[1::2]):
+        if y1 - y0 < 4:
+            continue
+        band = rows[y0:y1]
+        centroid = (band * np.arange(y0, y1)).sum() / band.sum()
+        offsets.append((centroid - (y0 + y1 - 1) / 2) / (y1 - y0))
+        weights.append(band.sum())
+    
+    if len(offsets) < min_lines:
+        return None, False
+    
+    asymmetry = np.average(offsets, weights=weights)
+    if abs(asymmetry) < min_asymmetry:
+        return None, False
+    return (0 if asymmetry > 0 else 180), True
+
+def _downscale(image, max_side):
+    """Area-averaged copy whose longer side is at most max_side (no copy if already small)."""
+    h, w = image.shape[:2]
+    scale = min(1.0, max_side / max(h, w))
+    if scale < 1:
+        return cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return image
+
+def _min_area_rect_angle(image):
+    """
+    Skew correction from the minimum-area rectangle around the dark pixels.
+    
+    cv2.findNonZero returns int32 (x, y) points in the same row-major order as
+    np.where; flipping them to (row, col) keeps the original estimate while
+    using a quarter of the memory of np.column_stack(np.where(...)).
+    
+    Returns:
+        Correction angle in degrees, or None if the page has no content
+    """
+    points = cv2.findNonZero((image < 128).view(np.uint8))
+    if points is None:
+        return None
+    coords = np.ascontiguousarray(points.reshape(-1, 2)[:, ::-1])
+    
+    angle = cv2.minAreaRect(coords)[-1]
+    
+    if angle < -45:
+        return -(90 + angle)
+    return -angle
+
+def estimate_skew_projection(image, max_side=SKEW_SAMPLE_SIDE, max_points=20000,
+                             max_angle=10.0, step=0.1):
+    """
+    Skew correction that maximizes the sharpness of the row profile.
+    
+    Ink points of a downscaled copy (at most max_points, sampled
+    deterministically) are projected onto the vertical axis for a coarse
+    grid of angles and then a fine grid around the best one; text lines
+    give the most peaked histogram when they are horizontal.
+    
+    Args:
+        image: Grayscale page
+        max_side: Longer side of the downscaled copy
+        max_points: Upper bound on ink points used
+        max_angle: Largest skew considered, in degrees
+        step: Angular resolution of the result, in degrees
+    
+    Returns:
+        Correction angle in degrees, or None if the page has no content
+    """
+    small = _downscale(image, max_side)
+    _, ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    points = cv2.findNonZero(ink)
+    if points is None:
+        return None
+    points = points.reshape(-1, 2).astype(np.float64)
+    if len(points) > max_points:
+        rng = np.random.default_rng(0)
+        points = points[rng.choice(len(points), max_points, replace=False)]
+    x = points[:, 0] - small.shape[1] / 2
+    y = points[:, 1] - small.shape[0] / 2
+    
+    def best_angle(angles):
+        theta = np.deg2rad(angles)[:, None]
+        # Row of each point after rotating the page by each candidate angle
+        rows = np.floor(y * np.cos(theta) - x * np.sin(theta)).astype(np.int64)
+        rows -= rows.min()
+        n_bins = rows.max() + 1
+        flat = (rows + np.arange(len(angles))[:, None] * n_bins).ravel()
+        counts = np.bincount(flat, minlength=len(angles) * n_bins).reshape(len(angles), n_bins)
+        return angles[np.argmax((counts.astype(np.float64) ** 2).sum(axis=1))]
+    
+    coarse_step = max(step, 0.5)
+    angle = best_angle(np.arange(-max_angle, max_angle + coarse_step / 2, coarse_step))
+    fine = np.arange(angle - coarse_step, angle + coarse_step + step / 2, step)
+    return float(round(best_angle(fine), 6))
+
+def estimate_skew(image, mode='exact', max_side=SKEW_SAMPLE_SIDE):
+    """
+    Skew correction angle for a grayscale page.
+    
+    Args:
+        image: Grayscale page
+        mode: One of SKEW_MODES
+        max_side: Longer side of the downscaled copy used by 'fast' and 'projection'
+    
+    Returns:
+        Correction angle in degrees, or None if the page has no content
+    """
+    if mode == 'exact':
+        return _min_area_rect_angle(image)
+    elif mode == 'fast':
+        return _min_area_rect_angle(_downscale(image, max_side))
+    elif mode == 'projection':
+        return estimate_skew_projection(image, max_side=max_side)
+    raise ValueError(f"Unknown skew mode: {mode}")
+
+def _osd_rotation(image):
+    """Rotation from Tesseract OSD, or 0 (with a warning) if OSD fails."""
     try:
-        osd_data = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
-        rotation = osd_data['rotate']
-        if rotation != 0:
-            if rotation == 180:
-                image = cv2.rotate(image, cv2.ROTATE_180)
-            elif rotation == 90:
-                image = cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
-            elif rotation == 270:
-                image = cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
-            print(f"    - Applied {rotation}° rotation based on OSD")
+        with stage('osd'):
+            return get_backend().detect_rotation(image)
     except Exception as e:
         print(f"  [Warning] OSD failed: {e}. Proceeding with skew correction only.")
+        return 0
+
+def fix_page_orientation(image, strategy='osd', info=None, skew='exact'):
+    """
+    Corrects page orientation and minor skew.
+    
+    Args:
+        image: Grayscale page
+        strategy: One of ORIENTATION_STRATEGIES
+        info: Optional dict receiving per-page metrics ('orientation_path',
+              'rotation', 'skew_angle')
+        skew: One of SKEW_MODES
+    """
+    if strategy not in ORIENTATION_STRATEGIES:
+        raise ValueError(f"Unknown orientation strategy: {strategy}")
+    
+    rotation = 0
+    if strategy == 'osd':
+        path = 'osd'
+        rotation = _osd_rotation(image)
+    elif strategy == 'heuristic':
+        with stage('orientation'):
+            rotation, confident = estimate_orientation(image)
+        if confident:
+            path = 'heuristic'
+        else:
+            path = 'heuristic->osd'
+            rotation = _osd_rotation(image)
+    else:
+        path = 'deferred-to-ocr'
+    
+    if rotation != 0:
+        image = rotate_upright(image, rotation)
+        print(f"    - Applied {rotation}° rotation based on {'OSD' if path.endswith('osd') else 'heuristic'}")
+    
+    if info is not None:
+        info['orientation_path'] = path
+        info['rotation'] = rotation
 
     # Skew correction on the original (non-inverted) image
-    coords = np.column_stack(np.where(image < 128))  # Find dark pixels
+    with stage('deskew'):
+        return _deskew(image, skew, info)
+
+def _deskew(image, skew, info):
+    """Estimates the skew of an upright page and rotates it straight if significant."""
+    angle = estimate_skew(image, mode=skew)
     
-    if len(coords) == 0:
+    if angle is None:
         print("    - No content detected for skew correction")
         return image
     
-    angle = cv2.minAreaRect(coords)[-1]
-    
-    if angle < -45:
-        angle = -(90 + angle)
-    else:
-        angle = -angle
+    if info is not None:
+        info['skew_angle'] = round(angle, 2)
     
     # Only apply correction if angle is significant (> 0.5 degrees)
     if abs(angle) > 0.5:
@@ -52,55 +273,256 @@ def fix_page_orientation(image):
     
     return image
 
-def process_file_for_ocr(input_path, output_dir):
-    """Main function to handle a single file and prepare it for OCR."""
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+def preprocess_page(img, orientation='osd', info=None, skew='exact'):
+    """Grayscale, orientation/skew fix, denoise and binarize a single BGR (or grayscale) page."""
+    # Convert to grayscale (pages rendered with grayscale=True already are)
+    gray_img = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    
+    # Fix orientation and skew
+    oriented_img = fix_page_orientation(gray_img, strategy=orientation, info=info, skew=skew)
+    
+    with stage('threshold'):
+        # Denoise
+        denoised_img = cv2.medianBlur(oriented_img, 3)
+        
+        # Apply adaptive thresholding for better results on varied lighting
+        _, final_img = cv2.threshold(denoised_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return final_img
 
+def page_output_name(base_name, page_number):
+    """Deterministic file stem for a page, shared by every module's outputs."""
+    return f"{base_name}_page_{page_number:02d}"
+
+def count_pages(input_path):
+    """Returns the number of pages in a supported input file (0 if unsupported)."""
     file_ext = os.path.splitext(input_path)[1].lower()
-    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    if file_ext == '.pdf':
+        return int(pdfinfo_from_path(input_path)['Pages'])
+    if file_ext in SUPPORTED_IMAGE_EXTENSIONS:
+        return 1
+    return 0
+
+def load_page(input_path, page_number, dpi=300, grayscale=False):
+    """
+    Loads a single 1-based page of a PDF or image file.
+    
+    Returns a BGR array, or a single-channel array with grayscale=True
+    (poppler then renders gray directly, a third of the pixels to move).
+    """
+    with stage('rasterize'):
+        return _load_page(input_path, page_number, dpi, grayscale)
+
+def _load_page(input_path, page_number, dpi, grayscale):
+    file_ext = os.path.splitext(input_path)[1].lower()
+    if file_ext == '.pdf':
+        pil_images = convert_from_path(input_path, dpi=dpi, first_page=page_number, last_page=page_number,
+                                       grayscale=grayscale)
+        if not pil_images:
+            raise ValueError(f"Page {page_number} not found in {input_path}")
+        if grayscale:
+            return np.array(pil_images[0].convert('L'))
+        return cv2.cvtColor(np.array(pil_images[0]), cv2.COLOR_RGB2BGR)
+    img = cv2.imread(input_path, cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError(f"Failed to load image: {input_path}")
+    return img
+
+def estimate_text_height(gray, min_components=20):
+    """
+    Median glyph height in pixels, from connected components of a page.
+    
+    Components that are too small (specks), too tall (logos, borders) or
+    too wide for their height (rules, underlines) are ignored.
+    
+    Returns:
+        Median height, or None if the page has too few glyph-like components
+    """
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    glyphs = (heights >= 3) & (heights <= gray.shape[0] * 0.05) & (widths <= 3 * heights)
+    if glyphs.sum() < min_components:
+        return None
+    return float(np.median(heights[glyphs]))
+
+def choose_dpi(probe_gray, probe_dpi=PROBE_DPI, target_height=TARGET_TEXT_HEIGHT,
+               candidates=ADAPTIVE_DPI_CANDIDATES):
+    """Lowest candidate DPI at which the probe's text reaches target_height pixels."""
+    text_height = estimate_text_height(probe_gray)
+    if text_height is None:
+        return max(candidates)
+    for dpi in sorted(candidates):
+        if text_height * dpi / probe_dpi >= target_height:
+            return dpi
+    return max(candidates)
+
+def render_page(input_path, page_number, dpi=DEFAULT_DPI, grayscale=False):
+    """
+    Loads a page like load_page, resolving dpi='auto' for PDFs.
+    
+    Returns:
+        tuple: (image, dpi used) - dpi is None for image files
+    """
+    if os.path.splitext(input_path)[1].lower() != '.pdf':
+        return load_page(input_path, page_number, grayscale=grayscale), None
+    if dpi == 'auto':
+        probe = load_page(input_path, page_number, dpi=PROBE_DPI, grayscale=True)
+        dpi = choose_dpi(probe)
+    return load_page(input_path, page_number, dpi=dpi, grayscale=grayscale), dpi
+
+class PageRenderError(Exception):
+    """
+    A page of an opened document that could not be rendered. The page
+    iterators yield it in place of the page's array, so callers can record
+    the page as failed and carry on with the rest of the document.
+    """
+
+    def __init__(self, page_number, error):
+        super().__init__(f"Failed to render page {page_number}: {error}")
+        self.page_number = page_number
+
+def iter_pdf_pages(input_path, dpi=300, first_page=1, last_page=None, grayscale=False,
+                   thread_count=1, page_numbers=None, with_dpi=False):
+    """
+    Rasterize a PDF one page at a time.
+    
+    Up to thread_count pages are rendered ahead in background threads
+    (poppler runs as a subprocess, so rendering overlaps with processing of
+    the current page). Memory is bounded by thread_count + 1 pages no matter
+    how long the document is.
     
-    images = []
+    Args:
+        input_path: Path to a PDF file
+        dpi: Rendering resolution, or 'auto' to choose it per page (see choose_dpi)
+        first_page: First 1-based page to render
+        last_page: Last page to render (default: end of document)
+        grayscale: Render single-channel pages instead of BGR
+        thread_count: Number of pages rendered concurrently ahead of the consumer
+        page_numbers: Explicit ascending pages to render (overrides first/last_page)
+        with_dpi: Also yield the resolution each page was rendered at
+    
+    Yields:
+        tuple: (page_number, NumPy array), or (page_number, NumPy array, dpi);
+               a PageRenderError (and dpi None) replaces the array of a page
+               that failed to render
+    """
+    if page_numbers is None:
+        if last_page is None:
+            last_page = count_pages(input_path)
+        page_numbers = range(first_page, last_page + 1)
+    
+    thread_count = max(1, thread_count)
+    executor = ThreadPoolExecutor(max_workers=thread_count)
+    pending = deque()
+    page_numbers = iter(page_numbers)
+
+    def render_ahead(count):
+        for page_number in page_numbers:
+            pending.append((page_number, executor.submit(render_page, input_path, page_number, dpi, grayscale)))
+            if len(pending) >= count:
+                break
+
+    try:
+        render_ahead(thread_count)
+        while pending:
+            page_number, future = pending.popleft()
+            try:
+                img, page_dpi = future.result()
+            except Exception as e:
+                img, page_dpi = PageRenderError(page_number, e), None
+            # Keep thread_count pages rendering while the consumer works on this one
+            render_ahead(thread_count)
+            yield (page_number, img, page_dpi) if with_dpi else (page_number, img)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def iter_raw_pages(input_path, dpi=300, first_page=1, last_page=None, grayscale=False,
+                   thread_count=1, page_numbers=None, with_dpi=False):
+    """
+    Generator yielding the pages of a file as arrays, before preprocessing.
+
+    PDFs are streamed page by page (see iter_pdf_pages), so pages are never
+    all held in memory at once.
+
+    Args:
+        input_path: Path to a PDF or image file
+        dpi: PDF rendering resolution, or 'auto' to choose it per page
+        first_page: First 1-based page to yield
+        last_page: Last page to yield (default: end of document)
+        grayscale: Yield single-channel pages instead of BGR
+        thread_count: PDF pages rendered ahead concurrently
+        page_numbers: Explicit ascending pages to yield (overrides first/last_page)
+        with_dpi: Also yield the PDF rendering resolution (None for images)
+
+    Yields:
+        tuple: (page_number, NumPy array) or (page_number, NumPy array, dpi), 1-based.
+               A page that fails to render yields a PageRenderError in place of
+               its array; a document that cannot be opened at all is reported
+               and yields nothing.
+    """
+    file_ext = os.path.splitext(input_path)[1].lower()
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
 
     if file_ext == '.pdf':
         print(f"-> Converting PDF: {base_name}.pdf")
+        pages = iter_pdf_pages(input_path, dpi=dpi, first_page=first_page, last_page=last_page,
+                               grayscale=grayscale, thread_count=thread_count,
+                               page_numbers=page_numbers, with_dpi=with_dpi)
         try:
-            pil_images = convert_from_path(input_path, dpi=300)
-            for pil_img in pil_images:
-                img = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-                images.append(img)
+            for page in pages:
+                if isinstance(page[1], PageRenderError):
+                    print(f"  [Error] {page[1]}")
+                else:
+                    print(f"  - Processing page {page[0]}...")
+                yield page
         except Exception as e:
             print(f"  [Error] Failed to convert PDF: {e}")
-            return
+        finally:
+            pages.close()
             
-    elif file_ext in ['.jpg', '.jpeg', '.png']:
+    elif file_ext in SUPPORTED_IMAGE_EXTENSIONS:
         print(f"-> Loading image: {os.path.basename(input_path)}")
-        img = cv2.imread(input_path)
-        if img is None:
+        if (first_page > 1 if page_numbers is None else 1 not in page_numbers):
+            return
+        try:
+            img = load_page(input_path, 1, grayscale=grayscale)
+        except ValueError:
             print(f"  [Error] Failed to load image: {input_path}")
             return
-        images.append(img)
+        print("  - Processing page 1...")
+        yield (1, img, None) if with_dpi else (1, img)
     else:
         print(f"  [Error] Unsupported file type: {file_ext}. Skipping.")
         return
 
-    for i, img in enumerate(images):
-        print(f"  - Processing page {i + 1}...")
-        
-        # Convert to grayscale
-        gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Fix orientation and skew
-        oriented_img = fix_page_orientation(gray_img)
-        
-        # Denoise
-        denoised_img = cv2.medianBlur(oriented_img, 3)
-        
-        # Apply adaptive thresholding for better results on varied lighting
-        _, final_img = cv2.threshold(denoised_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
+def iter_pages(input_path, orientation='osd', thread_count=1):
+    """
+    Generator yielding preprocessed pages of a file as in-memory arrays.
+
+    Args:
+        input_path: Path to a PDF or image file
+        orientation: One of ORIENTATION_STRATEGIES
+        thread_count: PDF pages rendered ahead concurrently
+
+    Yields:
+        tuple: (page_number, binarized grayscale NumPy array), 1-based
+    """
+    for page_number, img in iter_raw_pages(input_path, thread_count=thread_count):
+        if isinstance(img, PageRenderError):
+            continue  # reported by iter_raw_pages
+        yield page_number, preprocess_page(img, orientation=orientation)
+
+def process_file_for_ocr(input_path, output_dir, thread_count=1):
+    """Main function to handle a single file and prepare it for OCR."""
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+
+    for page_number, final_img in iter_pages(input_path, thread_count=thread_count):
         # Save the processed image
-        output_filename = f"{base_name}_page_{i+1:02d}.png"
+        output_filename = f"{page_output_name(base_name, page_number)}.png"
         output_path = os.path.join(output_dir, output_filename)
         cv2.imwrite(output_path, final_img)
         print(f"    Saved to: {output_path}")
@@ -7,165 +7,343 @@
 import os
 import re
 import json
+import numpy as np
 import pandas as pd
 
+from analyte_catalog import load_catalog, DEFAULT_CATALOG_PATH
+from token_store import iter_token_pages, STORE_SUFFIX, CSV_SUFFIX
+from report_index import record_extraction
+from metrics import stage, count
+
 # ============================================================================
 # CONFIGURATION: Medical Test Patterns and Reference Data
 # ============================================================================
 
-# Multi-word test name patterns (order matters - most specific first)
-MEDICAL_TEST_PATTERNS = {
-    'RBC Count': ['rbc', 'count'],
-    'WBC Count': ['wbc', 'count'],
-    'Platelet Count': ['platelet', 'count'],
-    'Total Cholesterol': ['total', 'cholesterol'],
-    'HDL Cholesterol': ['hdl', 'cholesterol'],
-    'LDL Cholesterol': ['ldl', 'cholesterol'],
-    'Total Bilirubin': ['total', 'bilirubin'],
-    'Alkaline Phosphatase': ['alkaline', 'phosphatase'],
-    'Total Protein': ['total', 'protein'],
-    'Glucose Fasting': ['glucose', 'fasting'],
-    'SGOT AST': ['sgot', 'ast'],
-    'SGPT ALT': ['sgpt', 'alt'],
-}
+# Bump whenever extraction rules change; part of the result cache key
+EXTRACTION_VERSION = 2
 
-# Single-word test names
-SINGLE_WORD_TESTS = {
-    'hemoglobin', 'hematocrit', 'triglycerides', 'creatinine', 
-    'urea', 'albumin', 'glucose'
+# Demographic field patterns (one capturing group each, matched case-insensitively)
+FIELD_PATTERNS = {
+    'Hospital': r'([A-Z][A-Za-z\s&]+(?:Hospital|Centre|Center|Clinic))',
+    'Name': r'(?:Patient\s+)?Name\s*[:\-]\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+){1,3})(?=\s+Patient\s+ID|\s+Age|\s*$)',
+    'Patient ID': r'(?:Patient\s+)?ID\s*[:\-]\s*([A-Z]{2,}\d{4,})(?=\s|$)',
+    'Age': r'Age\s*[:\-]\s*(\d{1,3})\s*(?:years?|yrs?)?(?=\s|$)',
+    'Gender': r'(?:Gender|Sex)\s*[:\-]\s*(Male|Female|M|F)(?=\s|$)',
+    'Date': r'Date\s*[:\-]\s*(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})(?=\s|$)',
+    'Doctor': r'Doctor\s*[:\-]?\s*(Dr\.?\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2})(?=\s|$)',
 }
 
-# Expected units for validation and auto-correction
-EXPECTED_UNITS = {
-    'Hemoglobin': 'g/dL',
-    'RBC Count': 'million/μL',
-    'WBC Count': 'thousand/μL',
-    'Platelet Count': 'thousand/μL',
-    'Hematocrit': '%',
-    'Glucose': 'mg/dL',
-    'Glucose Fasting': 'mg/dL',
-    'Total Cholesterol': 'mg/dL',
-    'HDL Cholesterol': 'mg/dL',
-    'LDL Cholesterol': 'mg/dL',
-    'Triglycerides': 'mg/dL',
-    'Creatinine': 'mg/dL',
-    'Urea': 'mg/dL',
-    'Total Bilirubin': 'mg/dL',
-    'SGOT AST': 'U/L',
-    'SGPT ALT': 'U/L',
-    'Alkaline Phosphatase': 'U/L',
-    'Total Protein': 'g/dL',
-    'Albumin': 'g/dL',
+# Literal keywords each field pattern requires (lowercase); lines without
+# any of them skip that field's regex
+FIELD_KEYWORDS = {
+    'Hospital': ['hospital', 'centre', 'center', 'clinic'],
+    'Name': ['name'],
+    'Patient ID': ['id'],
+    'Age': ['age'],
+    'Gender': ['gender', 'sex'],
+    'Date': ['date'],
+    'Doctor': ['doctor'],
 }
 
-# Expected value ranges (for validation)
-EXPECTED_VALUE_RANGES = {
-    'Hemoglobin': (5, 20),
-    'RBC Count': (2.0, 8.0),
-    'WBC Count': (2.0, 20.0),
-    'Platelet Count': (50, 600),
-    'Hematocrit': (20, 60),
-    'Glucose Fasting': (40, 300),
-    'Total Cholesterol': (100, 400),
-    'HDL Cholesterol': (20, 100),
-    'LDL Cholesterol': (50, 250),
-    'Triglycerides': (30, 500),
-    'Creatinine': (0.3, 3.0),
-    'Urea': (10, 80),
-    'Total Bilirubin': (0.1, 5.0),
-    'SGOT AST': (5, 200),
-    'SGPT ALT': (5, 200),
-    'Alkaline Phosphatase': (20, 300),
-    'Total Protein': (4.0, 10.0),
-    'Albumin': (2.0, 6.0),
+# Field sets per hospital template (extend with register_field_template)
+FIELD_TEMPLATES = {
+    'default': {'patterns': FIELD_PATTERNS, 'keywords': FIELD_KEYWORDS},
 }
 
+# Analyte catalog (test names, aliases, units, ranges, decimal-fix rules)
+CATALOG = load_catalog(DEFAULT_CATALOG_PATH)
+
 
 # ============================================================================
 # CORE FUNCTIONS: Token Processing
 # ============================================================================
 
-def group_tokens_into_lines(df, y_tolerance=20):
+class TokenLines:
+    """
+    Compact, array-backed representation of tokens grouped into lines.
+    
+    Tokens are stored column-wise in reading order (line by line, left to
+    right); line i spans rows offsets[i]:offsets[i + 1]. Per-line text and
+    average confidence are computed once here instead of in every extractor.
+    
+    Attributes:
+        frame: DataFrame of all tokens in reading order
+        offsets: int array of line boundaries, length len(self) + 1
+        texts: List of token strings in reading order
+        avg_conf: List of per-line average confidences
+    """
+    
+    def __init__(self, frame, offsets):
+        self.frame = frame.reset_index(drop=True)
+        self.offsets = offsets
+        self.texts = self.frame['text'].tolist()
+        
+        # Plain Python sums keep averages bit-identical to the dict-based code
+        conf = self.frame['conf'].tolist()
+        self.avg_conf = [sum(conf[a:b]) / (b - a) for a, b in zip(offsets[:-1], offsets[1:])]
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def line_size(self, i):
+        """Number of tokens in line i."""
+        return int(self.offsets[i + 1] - self.offsets[i])
+    
+    def line_tokens(self, i):
+        """Token strings of line i, left to right."""
+        return self.texts[self.offsets[i]:self.offsets[i + 1]]
+    
+    def line_text(self, i):
+        """Space-joined text of line i."""
+        return ' '.join(self.line_tokens(i))
+    
+    def to_dicts(self):
+        """Legacy structure: list of lines, each a list of token dictionaries."""
+        records = self.frame.to_dict('records')
+        return [records[a:b] for a, b in zip(self.offsets[:-1], self.offsets[1:])]
+
+
+def as_token_lines(lines):
+    """Accept either TokenLines or the legacy list-of-dict lines."""
+    if isinstance(lines, TokenLines):
+        return lines
+    
+    records = [token for line in lines for token in line]
+    sizes = [len(line) for line in lines]
+    offsets = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+    frame = pd.DataFrame(records) if records else pd.DataFrame(columns=['conf', 'text'])
+    return TokenLines(frame, offsets)
+
+
+def _line_start_indices(tops, y_tolerance):
+    """
+    Indices where a new line starts, for tops sorted in ascending order.
+    
+    Equivalent to scanning tokens while tracking a running average line y
+    (y = (y + top) / 2) and breaking when |top - y| > y_tolerance:
+    
+    - The running y never exceeds the previous top, so a gap larger than
+      the tolerance between consecutive tops always breaks a line.
+    - The running y never drops below the segment's first top, so a
+      segment spanning at most the tolerance never breaks.
+    
+    Only the rare segments spanning more than the tolerance without such a
+    gap need the exact sequential scan.
+    """
+    n = len(tops)
+    gap_breaks = np.flatnonzero(np.diff(tops) > y_tolerance) + 1
+    seg_starts = np.concatenate(([0], gap_breaks))
+    seg_ends = np.concatenate((gap_breaks, [n]))
+    
+    wide = (tops[seg_ends - 1] - tops[seg_starts]) > y_tolerance
+    extra_breaks = []
+    for a, b in zip(seg_starts[wide], seg_ends[wide]):
+        current_y = tops[a]
+        for k in range(a + 1, b):
+            if abs(tops[k] - current_y) <= y_tolerance:
+                current_y = (current_y + tops[k]) / 2
+            else:
+                extra_breaks.append(k)
+                current_y = tops[k]
+    
+    if extra_breaks:
+        return np.sort(np.concatenate((seg_starts, extra_breaks)))
+    return seg_starts
+
+
+def group_tokens_into_token_lines(df, y_tolerance=20):
     """
     Group tokens into lines based on vertical proximity (y-coordinate).
     
+    NumPy implementation: line ids come from vectorized gap detection on
+    the sorted `top` array, then tokens are ordered by (line id, left).
+    
     Args:
         df: DataFrame with columns [text, left, top, width, height, conf]
         y_tolerance: Maximum vertical distance to group tokens in same line
     
     Returns:
-        List of lines, where each line is a list of token dictionaries
+        TokenLines
     """
-    lines = []
     df_sorted = df.sort_values(['top', 'left']).reset_index(drop=True)
+    n = len(df_sorted)
+    
+    if n == 0:
+        return TokenLines(df_sorted, np.zeros(1, dtype=np.int64))
     
-    current_line = []
-    current_y = None
+    tops = df_sorted['top'].to_numpy(dtype=float)
+    starts = _line_start_indices(tops, y_tolerance)
     
-    for _, row in df_sorted.iterrows():
-        if current_y is None or abs(row['top'] - current_y) <= y_tolerance:
-            current_line.append(row.to_dict())
-            # Update running average of y-coordinate
-            current_y = row['top'] if current_y is None else (current_y + row['top']) / 2
-        else:
-            # Start new line
-            if current_line:
-                lines.append(sorted(current_line, key=lambda x: x['left']))
-            current_line = [row.to_dict()]
-            current_y = row['top']
+    # Cumulative line id per token, then a stable sort by (line id, left)
+    is_start = np.zeros(n, dtype=np.int64)
+    is_start[starts] = 1
+    line_ids = np.cumsum(is_start) - 1
+    order = np.lexsort((df_sorted['left'].to_numpy(), line_ids))
+    
+    offsets = np.append(starts, n).astype(np.int64)
+    return TokenLines(df_sorted.iloc[order], offsets)
+
+
+def group_tokens_into_lines(df, y_tolerance=20):
+    """
+    Group tokens into lines based on vertical proximity (y-coordinate).
     
-    # Add final line
-    if current_line:
-        lines.append(sorted(current_line, key=lambda x: x['left']))
+    Args:
+        df: DataFrame with columns [text, left, top, width, height, conf]
+        y_tolerance: Maximum vertical distance to group tokens in same line
     
-    return lines
+    Returns:
+        List of lines, where each line is a list of token dictionaries
+    """
+    return group_tokens_into_token_lines(df, y_tolerance).to_dicts()
 
 
 # ============================================================================
 # FIELD EXTRACTION: Patient Demographics
 # ============================================================================
 
-def extract_fields(lines):
+class FieldExtractor:
+    """
+    Compiled extractor for a set of demographic field patterns.
+    
+    Every pattern is compiled once. Each line is first scanned a single time
+    with one alternation of the literal keywords the patterns require (one
+    named group per keyword); only fields whose keyword occurs on the line
+    are then matched with their full regex. Most lines (e.g. test rows)
+    contain no keyword and cost a single scan. Extraction stops as soon as
+    every field has been found. Fields without keywords are always tried.
+    """
+    
+    def __init__(self, patterns, keywords=None, min_conf=70):
+        self.field_names = list(patterns)
+        self.min_conf = min_conf
+        self._regexes = {}
+        for field, pattern in patterns.items():
+            regex = re.compile(pattern, re.IGNORECASE)
+            if regex.groups != 1:
+                raise ValueError(f"Field pattern for '{field}' must have exactly one capturing group")
+            self._regexes[field] = regex
+        
+        keywords = keywords or {}
+        self._always = {f for f in self.field_names if not keywords.get(f)}
+        
+        entries = {(kw.lower(), f) for f in self.field_names for kw in keywords.get(f, [])}
+        # Longest keywords first; a keyword also triggers fields whose
+        # keyword is its prefix, since both start at the same position
+        unique_keywords = sorted({kw for kw, _ in entries}, key=lambda kw: (-len(kw), kw))
+        self._keyword_fields = {
+            f"k{j}": {f for kw2, f in entries if kw.startswith(kw2)}
+            for j, kw in enumerate(unique_keywords)
+        }
+        self._keyword_scanner = None
+        if unique_keywords:
+            # Zero-width lookahead reports every occurrence, even overlapping ones
+            self._keyword_scanner = re.compile('(?=' + '|'.join(
+                f"(?P<k{j}>{re.escape(kw)})" for j, kw in enumerate(unique_keywords)) + ')')
+    
+    def _candidate_fields(self, text):
+        """Fields whose required keywords occur in the line text."""
+        candidates = set(self._always)
+        if self._keyword_scanner is not None:
+            for match in self._keyword_scanner.finditer(text.lower()):
+                candidates |= self._keyword_fields[match.lastgroup]
+        return candidates
+    
+    def extract(self, lines):
+        """
+        Extract fields from token lines.
+        
+        Args:
+            lines: TokenLines (or legacy list of token lines)
+        
+        Returns:
+            Dictionary of extracted fields with confidence scores
+        """
+        lines = as_token_lines(lines)
+        fields = {}
+        
+        for i in range(len(lines)):
+            avg_conf = lines.avg_conf[i]
+            
+            # Skip low confidence lines
+            if avg_conf < self.min_conf:
+                continue
+            
+            text = lines.line_text(i)
+            candidates = self._candidate_fields(text)
+            if not candidates:
+                continue
+            
+            for field in self.field_names:
+                # Don't overwrite already found fields
+                if field in candidates and field not in fields:
+                    match = self._regexes[field].search(text)
+                    if match:
+                        fields[field] = {
+                            'value': match.group(1).strip(),
+                            'confidence': round(avg_conf, 2)
+                        }
+            
+            if len(fields) == len(self.field_names):
+                break
+        
+        return fields
+
+
+_FIELD_EXTRACTORS = {}
+
+
+def register_field_template(name, patterns, keywords=None, base='default'):
+    """
+    Register a field set for a hospital template.
+    
+    Args:
+        name: Template name passed to extract_fields()/extract()
+        patterns: {field: regex with one capturing group}; overrides or
+                  extends the fields of `base`
+        keywords: Optional {field: [literal keywords the regex requires]}
+        base: Template to start from, or None for an empty field set
+    """
+    template = {'patterns': {}, 'keywords': {}}
+    if base:
+        template['patterns'].update(FIELD_TEMPLATES[base]['patterns'])
+        template['keywords'].update(FIELD_TEMPLATES[base]['keywords'])
+    template['patterns'].update(patterns)
+    for field in patterns:
+        # A replaced pattern may not require the base keywords any more
+        template['keywords'].pop(field, None)
+    template['keywords'].update(keywords or {})
+    
+    FIELD_TEMPLATES[name] = template
+    _FIELD_EXTRACTORS.pop(name, None)
+
+
+def get_field_extractor(template='default'):
+    """Compiled FieldExtractor for a template, built once and reused."""
+    extractor = _FIELD_EXTRACTORS.get(template)
+    if extractor is None:
+        config = FIELD_TEMPLATES[template]
+        extractor = FieldExtractor(config['patterns'], config['keywords'])
+        _FIELD_EXTRACTORS[template] = extractor
+    return extractor
+
+
+# Compile the default field set once at import
+get_field_extractor('default')
+
+
+def extract_fields(lines, template='default'):
     """
     Extract patient demographic fields using regex patterns.
     
     Args:
-        lines: List of token lines from group_tokens_into_lines()
+        lines: TokenLines (or legacy list of token lines)
+        template: Name of the field template to use (see FIELD_TEMPLATES)
     
     Returns:
         Dictionary of extracted fields with confidence scores
     """
-    fields = {}
-    
-    patterns = {
-        'Hospital': r'([A-Z][A-Za-z\s&]+(?:Hospital|Centre|Center|Clinic))',
-        'Name': r'(?:Patient\s+)?Name\s*[:\-]\s*([A-Z][a-z]+(?:\s+[A-Z][a-z]+){1,3})(?=\s+Patient\s+ID|\s+Age|\s*$)',
-        'Patient ID': r'(?:Patient\s+)?ID\s*[:\-]\s*([A-Z]{2,}\d{4,})(?=\s|$)',
-        'Age': r'Age\s*[:\-]\s*(\d{1,3})\s*(?:years?|yrs?)?(?=\s|$)',
-        'Gender': r'(?:Gender|Sex)\s*[:\-]\s*(Male|Female|M|F)(?=\s|$)',
-        'Date': r'Date\s*[:\-]\s*(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})(?=\s|$)',
-        'Doctor': r'Doctor\s*[:\-]?\s*(Dr\.?\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2})(?=\s|$)',
-    }
-    
-    for line in lines:
-        avg_conf = sum(t['conf'] for t in line) / len(line) if line else 0
-        
-        # Skip low confidence lines
-        if avg_conf < 70:
-            continue
-        
-        text = ' '.join(t['text'] for t in line)
-        
-        for field, pattern in patterns.items():
-            if field not in fields:  # Don't overwrite already found fields
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    fields[field] = {
-                        'value': match.group(1).strip(),
-                        'confidence': round(avg_conf, 2)
-                    }
-    
-    return fields
+    return get_field_extractor(template).extract(lines)
 
 
 # ============================================================================
@@ -184,26 +362,7 @@ def match_test_name(tokens_lower, start_idx=0):
     Returns:
         tuple: (test_name, tokens_consumed) or (None, 0) if no match
     """
-    # Try multi-word patterns first (more specific)
-    for full_name, keywords in MEDICAL_TEST_PATTERNS.items():
-        if start_idx + len(keywords) <= len(tokens_lower):
-            match = True
-            for i, keyword in enumerate(keywords):
-                if keyword not in tokens_lower[start_idx + i]:
-                    match = False
-                    break
-            
-            if match:
-                return full_name, len(keywords)
-    
-    # Try single-word tests
-    if start_idx < len(tokens_lower):
-        token = tokens_lower[start_idx]
-        for test_name in SINGLE_WORD_TESTS:
-            if test_name in token:
-                return test_name.capitalize(), 1
-    
-    return None, 0
+    return CATALOG.match_test_name(tokens_lower, start_idx)
 
 
 def extract_reference_range(tokens, start_idx):
@@ -255,8 +414,8 @@ def validate_and_fix_test_result(test_result):
     Validate and auto-correct common OCR errors in test results.
     
     Common issues fixed:
-    - Missing units (auto-fill from EXPECTED_UNITS)
-    - Decimal point errors (RBC: 45 → 4.5)
+    - Missing units (auto-fill from the catalog unit)
+    - Decimal point errors (catalog decimal_fix rules, e.g. RBC: 45 → 4.5)
     - Unit format normalization (uL → μL)
     
     Args:
@@ -268,10 +427,11 @@ def validate_and_fix_test_result(test_result):
     test_name = test_result['test_name']
     value = test_result['value']
     unit = test_result.get('unit', '')
+    analyte = CATALOG.get(test_name)
     
     # Fix 1: Add missing units
-    if not unit and test_name in EXPECTED_UNITS:
-        test_result['unit'] = EXPECTED_UNITS[test_name]
+    if not unit and analyte is not None and analyte.unit:
+        test_result['unit'] = analyte.unit
         test_result['auto_correction'] = 'Added missing unit'
         unit = test_result['unit']
     
@@ -288,23 +448,16 @@ def validate_and_fix_test_result(test_result):
     try:
         numeric_value = float(value)
         
-        # RBC Count: Often OCR reads "4.5" as "45"
-        if test_name == 'RBC Count':
-            if 40 <= numeric_value <= 60:
-                corrected = numeric_value / 10
-                test_result['value'] = str(corrected)
-                test_result['auto_correction'] = f'Decimal correction: {value} → {corrected}'
-        
-        # WBC Count: Similar decimal issue
-        elif test_name == 'WBC Count':
-            if 40 <= numeric_value <= 120:
-                corrected = numeric_value / 10
-                test_result['value'] = str(corrected)
-                test_result['auto_correction'] = f'Decimal correction: {value} → {corrected}'
+        # Missing decimal point, e.g. OCR reads RBC "4.5" as "45"
+        fix = analyte.decimal_fix if analyte is not None else None
+        if fix and fix.min <= numeric_value <= fix.max:
+            corrected = numeric_value / fix.divisor
+            test_result['value'] = str(corrected)
+            test_result['auto_correction'] = f'Decimal correction: {value} → {corrected}'
         
         # Range validation (flag suspicious values)
-        if test_name in EXPECTED_VALUE_RANGES:
-            min_val, max_val = EXPECTED_VALUE_RANGES[test_name]
+        if analyte is not None and analyte.range is not None:
+            min_val, max_val = analyte.range
             current_val = float(test_result['value'])  # Use potentially corrected value
             
             if current_val < min_val or current_val > max_val:
@@ -329,25 +482,26 @@ def extract_tests(lines):
     5. Validate and auto-correct
     
     Args:
-        lines: List of token lines
+        lines: TokenLines (or legacy list of token lines)
     
     Returns:
         List of test result dictionaries
     """
+    lines = as_token_lines(lines)
     tests = []
     seen = set()
     
     unit_pattern = r'^(mg/dl|g/dl|mmol/l|%|u/l|iu/l|million/[uμ]l|thousand/[uμ]l|cells/[uμ]l)$'
     
-    for line in lines:
-        if len(line) < 2:
+    for line_idx in range(len(lines)):
+        if lines.line_size(line_idx) < 2:
             continue
         
-        avg_conf = sum(t['conf'] for t in line) / len(line)
+        avg_conf = lines.avg_conf[line_idx]
         if avg_conf < 65:
             continue
         
-        tokens = [t['text'] for t in line]
+        tokens = lines.line_tokens(line_idx)
         tokens_lower = [t.lower() for t in tokens]
         
         # Skip header rows
@@ -414,6 +568,45 @@ def extract_tests(lines):
 # FILE PROCESSING
 # ============================================================================
 
+def extract(tokens, debug=False, template='default'):
+    """
+    Run line grouping and field/test extraction on in-memory tokens.
+    
+    Args:
+        tokens: DataFrame with columns [conf, text, left, top, width, height],
+                e.g. straight from module_two.ocr_page()
+        debug: If True, print detailed processing info
+        template: Field template for extract_fields()
+    
+    Returns:
+        Dictionary with 'fields' and 'test_results'
+    """
+    # Filter low confidence tokens
+    df = tokens[tokens['conf'] > 30].copy()
+    
+    if df.empty:
+        return {'fields': {}, 'test_results': []}
+    
+    # Group tokens into lines
+    with stage('line_grouping'):
+        lines = group_tokens_into_token_lines(df)
+    
+    if debug:
+        print(f"\n  DEBUG: Found {len(lines)} lines")
+        for i in range(min(len(lines), 10)):
+            print(f"  Line {i}: (conf={lines.avg_conf[i]:.1f}) {lines.line_text(i)}")
+    
+    # Extract data
+    with stage('extraction'):
+        result = {
+            'fields': extract_fields(lines, template),
+            'test_results': extract_tests(lines)
+        }
+    count('flagged_tests', sum(1 for t in result['test_results'] if 'flag' in t))
+    count('auto_corrections', sum(1 for t in result['test_results'] if 'auto_correction' in t))
+    return result
+
+
 def process_token_file(csv_path, debug=False):
     """
     Process a single OCR token CSV file.
@@ -426,35 +619,41 @@ def process_token_file(csv_path, debug=False):
         Dictionary with 'fields' and 'test_results'
     """
     try:
-        df = pd.read_csv(csv_path)
-        
-        # Filter low confidence tokens
-        df = df[df['conf'] > 30].copy()
-        
-        if df.empty:
-            return {'fields': {}, 'test_results': []}
-        
-        # Group tokens into lines
-        lines = group_tokens_into_lines(df)
-        
-        if debug:
-            print(f"\n  DEBUG: Found {len(lines)} lines")
-            for i, line in enumerate(lines[:10]):
-                text = ' '.join(t['text'] for t in line)
-                avg_conf = sum(t['conf'] for t in line) / len(line)
-                print(f"  Line {i}: (conf={avg_conf:.1f}) {text}")
-        
-        # Extract data
-        return {
-            'fields': extract_fields(lines),
-            'test_results': extract_tests(lines)
-        }
+        return extract(pd.read_csv(csv_path), debug=debug)
         
     except Exception as e:
         print(f"  [Error processing {csv_path}] {e}")
         return {'fields': {}, 'test_results': []}
 
 
+def write_result_json(json_path, result):
+    """
+    Writes an extraction result atomically (temporary file, then rename), so
+    the review API and folder watchers never read a half-written file.
+    """
+    tmp_path = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_path, json_path)
+
+
+def report_base_name(page_stem):
+    """The report name of a page stem ('lab_2024_page_01' -> 'lab_2024')."""
+    return re.sub(r'_page_\d+$', '', page_stem)
+
+
+def merged_result_name(page_stem):
+    """
+    Name of the merged JSON of the report a page belongs to, e.g.
+    'lab_2024_page_01' -> 'lab_2024_page_merged.json'. Both the folder-wide
+    and the per-report merge name their output with this, so a report is
+    only ever merged into one file.
+    """
+    # Only the page suffix is removed: digits in the report's own name
+    # (lab_2024, scan_2) keep different reports apart
+    return f"{report_base_name(page_stem)}_page_merged.json"
+
+
 def merge_multi_page_results(extraction_dir):
     """
     Merge extraction results from multiple pages of the same report.
@@ -463,6 +662,11 @@ def merge_multi_page_results(extraction_dir):
     Args:
         extraction_dir: Directory containing extraction JSON files
     """
+    with stage('merge'):
+        _merge_multi_page_results(extraction_dir)
+
+
+def _merge_multi_page_results(extraction_dir):
     json_files = sorted([f for f in os.listdir(extraction_dir) 
                         if f.endswith('_extracted.json') and '_merged' not in f])
     
@@ -472,41 +676,67 @@ def merge_multi_page_results(extraction_dir):
     # Group files by base report name
     report_groups = {}
     for json_file in json_files:
-        # Remove page numbers from filename
-        base_name = re.sub(r'_page\d+|_\d+', '', 
-                          json_file.replace('_extracted.json', ''))
-        if base_name not in report_groups:
-            report_groups[base_name] = []
-        report_groups[base_name].append(json_file)
+        merged_name = merged_result_name(json_file.replace('_extracted.json', ''))
+        if merged_name not in report_groups:
+            report_groups[merged_name] = []
+        report_groups[merged_name].append(json_file)
     
     # Merge multi-page reports
-    for base_name, files in report_groups.items():
+    for merged_name, files in report_groups.items():
         if len(files) > 1:
-            merged_result = {'fields': {}, 'test_results': []}
-            seen_tests = set()
-            
-            for json_file in sorted(files):
-                json_path = os.path.join(extraction_dir, json_file)
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
-                
-                # Use demographic fields from first page with data
-                if not merged_result['fields'] and data['fields']:
-                    merged_result['fields'] = data['fields']
-                
-                # Merge test results (avoid duplicates)
-                for test in data['test_results']:
-                    test_key = test['test_name'].lower().replace(' ', '')
-                    if test_key not in seen_tests:
-                        seen_tests.add(test_key)
-                        merged_result['test_results'].append(test)
-            
-            # Save merged result
-            merged_path = os.path.join(extraction_dir, f"{base_name}_merged.json")
-            with open(merged_path, 'w') as f:
-                json.dump(merged_result, f, indent=2)
-            
-            print(f"  ✓ Merged {len(files)} pages → {base_name}_merged.json")
+            _write_merged_result(extraction_dir, merged_name, files)
+
+
+def merge_report_pages(extraction_dir, page_stems):
+    """
+    Merge the page results of one report into its merged_result_name() file.
+
+    Unlike merge_multi_page_results this touches only the given report,
+    so it can run after every report without rescanning the folder.
+
+    Args:
+        extraction_dir: Directory containing extraction JSON files
+        page_stems: Stems of the report's pages, e.g. 'report_page_01'
+
+    Returns:
+        str: Name of the merged JSON, or None if fewer than two pages have results
+    """
+    files = [f"{stem}_extracted.json" for stem in page_stems]
+    files = [f for f in files if os.path.exists(os.path.join(extraction_dir, f))]
+    if len(files) <= 1:
+        return None
+    merged_name = merged_result_name(page_stems[0])
+    with stage('merge'):
+        _write_merged_result(extraction_dir, merged_name, files)
+    return merged_name
+
+
+def _write_merged_result(extraction_dir, merged_name, files):
+    merged_result = {'fields': {}, 'test_results': []}
+    seen_tests = set()
+    
+    for json_file in sorted(files):
+        json_path = os.path.join(extraction_dir, json_file)
+        with open(json_path, 'r') as f:
+            data = json.load(f)
+        
+        # Use demographic fields from first page with data
+        if not merged_result['fields'] and data['fields']:
+            merged_result['fields'] = data['fields']
+        
+        # Merge test results (avoid duplicates)
+        for test in data['test_results']:
+            test_key = test['test_name'].lower().replace(' ', '')
+            if test_key not in seen_tests:
+                seen_tests.add(test_key)
+                merged_result['test_results'].append(test)
+    
+    # Save merged result
+    merged_path = os.path.join(extraction_dir, merged_name)
+    write_result_json(merged_path, merged_result)
+    record_extraction(extraction_dir, merged_name, merged_result)
+    
+    print(f"  ✓ Merged {len(files)} pages → {merged_name}")
 
 
 # ============================================================================
@@ -515,10 +745,11 @@ def merge_multi_page_results(extraction_dir):
 
 def run_extraction_on_folder(tokens_dir, output_dir, debug=False):
     """
-    Run extraction pipeline on all token CSV files in a directory.
+    Run extraction pipeline on every page in a token directory.
     
     Args:
-        tokens_dir: Directory containing *_tokens.csv files
+        tokens_dir: Directory containing *_tokens.bin stores and/or
+                    legacy *_tokens.csv files
         output_dir: Directory to save extraction JSON files
         debug: Enable debug output
     """
@@ -529,28 +760,32 @@ def run_extraction_on_folder(tokens_dir, output_dir, debug=False):
     print("MODULE 3: RULE-BASED EXTRACTION")
     print("="*70)
     
-    csv_files = sorted([f for f in os.listdir(tokens_dir) 
-                       if f.endswith('_tokens.csv')])
+    token_files = sorted([f for f in os.listdir(tokens_dir) 
+                         if f.endswith(STORE_SUFFIX) or f.endswith(CSV_SUFFIX)])
     
-    if not csv_files:
-        print("  ⚠ No token CSV files found.")
+    if not token_files:
+        print("  ⚠ No token files found.")
         return
     
-    print(f"\nProcessing {len(csv_files)} file(s)...\n")
+    print(f"\nProcessing {len(token_files)} file(s)...\n")
     
-    # Process each file
-    for csv_file in csv_files:
-        csv_path = os.path.join(tokens_dir, csv_file)
-        print(f"  Processing: {csv_file}")
+    # Process each page
+    for stem, tokens in iter_token_pages(tokens_dir):
+        print(f"  Processing: {stem}")
         
-        result = process_token_file(csv_path, debug=debug)
+        try:
+            result = extract(tokens, debug=debug)
+        except Exception as e:
+            print(f"  [Error processing {stem}] {e}")
+            result = {'fields': {}, 'test_results': []}
         
         # Save extraction result
-        json_file = csv_file.replace('_tokens.csv', '_extracted.json')
+        json_file = f"{stem}_extracted.json"
         json_path = os.path.join(output_dir, json_file)
         
-        with open(json_path, 'w') as f:
-            json.dump(result, f, indent=2)
+        with stage('write'):
+            write_result_json(json_path, result)
+            record_extraction(output_dir, json_file, result)
         
         # Print summary
         fields_count = len(result['fields'])
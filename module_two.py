@@ -5,9 +5,319 @@
 # =============================================================================
 
 import os
-import pytesseract
+import cv2
+import numpy as np
 import pandas as pd
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+
+from ocr_backend import get_backend
+from metrics import stage, count
+from module_one import rotate_upright
+from layout_analysis import detect_text_regions, merge_overlapping_regions, region_coverage
+from token_store import save_report_tokens, PAGE_STEM_PATTERN, TOKEN_COLUMNS, BOX_COLUMNS
+
+# Bump whenever OCR settings or token cleaning change; part of the result cache key
+OCR_VERSION = 1
+
+NUMERIC_COLUMNS = ['conf'] + BOX_COLUMNS
+
+# ============================================================================
+# TOKEN CLEANING (NumPy arrays; DataFrames are built on demand)
+# ============================================================================
+
+def _numeric_column(values):
+    """Column as a numeric array; unparseable entries become NaN (like pd.to_numeric)."""
+    array = np.asarray(values)
+    if array.dtype.kind in 'iuf':
+        return array
+    return pd.to_numeric(np.asarray(values, dtype=object), errors='coerce')
+
+
+def _raw_column(values):
+    """Column without coercing mixed lists to strings, so '!= -1' compares values."""
+    array = np.asarray(values)
+    if array.dtype.kind in 'iuf':
+        return array
+    return np.asarray(values, dtype=object)
+
+
+def _has_text(text):
+    """Non-blank strings; other non-missing values are kept, None/NaN are not."""
+    if text.__class__ is str:
+        return bool(text.strip())
+    return not pd.isna(text)
+
+
+class OcrTokenBatch:
+    """
+    Cleaned tokens of several pages, stored as flat NumPy columns.
+    
+    Page i owns rows offsets[i]:offsets[i + 1] of every column. Nothing is
+    converted to pandas until a page's DataFrame is asked for.
+    
+    Attributes:
+        offsets (ndarray): Row offset of each page (len(pages) + 1)
+        columns (dict): TOKEN_COLUMNS name -> array (text is an object array)
+    """
+    
+    def __init__(self, offsets, columns):
+        self.offsets = offsets
+        self.columns = columns
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def token_count(self, index):
+        return int(self.offsets[index + 1] - self.offsets[index])
+    
+    def page_arrays(self, index):
+        """Columns of one page as array views."""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return {col: values[start:end] for col, values in self.columns.items()}
+    
+    def frame(self, index):
+        """Tokens of one page as a DataFrame [conf, text, left, top, width, height]."""
+        return pd.DataFrame(self.page_arrays(index), columns=TOKEN_COLUMNS)
+    
+    def frames(self):
+        return [self.frame(i) for i in range(len(self))]
+
+
+def clean_ocr_batch(ocr_data_dicts):
+    """
+    Cleans the raw Tesseract output of many pages in one pass.
+    
+    Every page's columns are copied into arrays preallocated for the whole
+    batch, then a single boolean mask drops structural rows (conf == -1),
+    blank texts and unparseable numbers, the same rules as the original
+    pandas cleaning. Page boundaries are recomputed from the mask.
+    
+    Args:
+        ocr_data_dicts (list): image_to_data(..., Output.DICT) results
+        
+    Returns:
+        OcrTokenBatch: Cleaned tokens, one page per input dict
+    """
+    counts = [len(data.get('text', ())) for data in ocr_data_dicts]
+    total = sum(counts)
+    bounds = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+    
+    numeric = {col: [_numeric_column(data[col]) for data in ocr_data_dicts if len(data.get('text', ()))]
+               for col in NUMERIC_COLUMNS}
+    columns = {}
+    for col in NUMERIC_COLUMNS:
+        dtype = np.result_type(*numeric[col]) if numeric[col] else np.int64
+        columns[col] = np.empty(total, dtype=dtype)
+    columns['text'] = np.empty(total, dtype=object)
+    keep = np.empty(total, dtype=bool)
+    
+    page = 0
+    for data, count, start in zip(ocr_data_dicts, counts, bounds[:-1]):
+        if not count:
+            continue
+        end = start + count
+        for col in NUMERIC_COLUMNS:
+            columns[col][start:end] = numeric[col][page]
+        columns['text'][start:end] = data['text']
+        keep[start:end] = _raw_column(data['conf']) != -1
+        page += 1
+    
+    # One mask over the whole batch: real words with visible text and valid numbers
+    keep &= np.fromiter(map(_has_text, columns['text']), dtype=bool, count=total)
+    for col in NUMERIC_COLUMNS:
+        if columns[col].dtype.kind == 'f':
+            keep &= ~np.isnan(columns[col])
+    
+    kept_before = np.concatenate(([0], np.cumsum(keep, dtype=np.int64)))
+    offsets = kept_before[bounds]
+    return OcrTokenBatch(offsets, {col: columns[col][keep] for col in TOKEN_COLUMNS})
+
+
+def clean_ocr_data(ocr_data_dict):
+    """
+    Converts raw Tesseract image_to_data output into a clean token DataFrame.
+    
+    Args:
+        ocr_data_dict (dict): Output of pytesseract.image_to_data(..., Output.DICT)
+                              or an OCR backend in the same layout.
+        
+    Returns:
+        pandas.DataFrame: Columns [conf, text, left, top, width, height].
+    """
+    return clean_ocr_batch([ocr_data_dict]).frame(0)
+
+
+def ocr_page(image):
+    """
+    Performs OCR on an in-memory page without touching the disk.
+    
+    Uses the process-wide OCR backend (see ocr_backend.get_backend), which
+    keeps Tesseract engines loaded across pages when tesserocr is available.
+    
+    Args:
+        image: Preprocessed page as a NumPy array (e.g. from
+               module_one.iter_pages) or a PIL image.
+        
+    Returns:
+        pandas.DataFrame: Token-level data, see clean_ocr_data().
+        
+    Raises:
+        Exception: Any Tesseract failure is propagated to the caller.
+    """
+    with stage('ocr'):
+        return _recognize(image)
+
+
+def _recognize(image):
+    ocr_data_dict = get_backend().image_to_data(image)
+    return clean_ocr_data(ocr_data_dict)
+
+
+def ocr_pages(images, max_workers=1):
+    """
+    Performs OCR on many in-memory pages and cleans their tokens together.
+    
+    Recognition runs on a thread pool (pytesseract runs one process per
+    call and tesserocr releases the GIL); the raw results are then cleaned
+    in a single batch, see clean_ocr_batch().
+    
+    Args:
+        images (list): Preprocessed pages (NumPy arrays or PIL images)
+        max_workers (int): Pages recognized concurrently
+        
+    Returns:
+        OcrTokenBatch: Tokens of every page; call .frame(i) for a DataFrame
+        
+    Raises:
+        Exception: Any Tesseract failure is propagated to the caller.
+    """
+    backend = get_backend()
+    with stage('ocr'), ThreadPoolExecutor(max_workers=max_workers) as executor:
+        raw = list(executor.map(backend.image_to_data, images))
+        return clean_ocr_batch(raw)
+
+
+def ocr_page_regions(image, regions=None, max_workers=4, pad=10, max_coverage=0.8, info=None):
+    """
+    OCR only the text regions of a page and map tokens back to page space.
+    
+    Each region is cropped, given a white border (Tesseract segments better
+    with a margin) and OCR'd on a thread pool; pytesseract runs one process
+    per call and tesserocr releases the GIL, so regions are recognized in
+    parallel. If the regions cover most of the page, one full-page call is
+    cheaper and is used instead.
+    
+    Args:
+        image: Preprocessed page (NumPy array)
+        regions: (x, y, w, h) boxes, default detect_text_regions(image);
+                 overlapping boxes are merged so no text is OCR'd twice
+        max_workers: Regions OCR'd concurrently
+        pad: White border added around each crop, in pixels
+        max_coverage: Above this page coverage the full page is OCR'd
+        info: Optional dict receiving 'ocr_regions' and 'ocr_pixel_share'
+    
+    Returns:
+        pandas.DataFrame: Token-level data in page coordinates, see clean_ocr_data().
+    """
+    if regions is None:
+        with stage('layout'):
+            regions = detect_text_regions(image)
+    else:
+        regions = merge_overlapping_regions(regions)
+    coverage = region_coverage(regions, image.shape)
+    
+    if coverage > max_coverage:
+        tokens = ocr_page(image)
+        if info is not None:
+            info['ocr_regions'] = 1
+            info['ocr_pixel_share'] = 1.0
+        return tokens
+    
+    def ocr_region(region):
+        x, y, w, h = region
+        crop = cv2.copyMakeBorder(image[y:y + h, x:x + w], pad, pad, pad, pad,
+                                  cv2.BORDER_CONSTANT, value=255)
+        tokens = _recognize(crop)
+        tokens['left'] += x - pad
+        tokens['top'] += y - pad
+        return tokens
+    
+    with stage('ocr'), ThreadPoolExecutor(max_workers=max_workers) as executor:
+        parts = list(executor.map(ocr_region, regions))
+    
+    if info is not None:
+        info['ocr_regions'] = len(regions)
+        info['ocr_pixel_share'] = round(coverage, 3)
+    if not parts:
+        return pd.DataFrame(columns=TOKEN_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def ocr_result_is_poor(tokens, min_tokens=5, min_mean_conf=60):
+    """True if an OCR result has too few tokens or a low mean confidence."""
+    return len(tokens) < min_tokens or tokens['conf'].mean() < min_mean_conf
+
+
+def scale_tokens(tokens, factor):
+    """
+    Rescales token boxes, e.g. from a lower-DPI render to DEFAULT_DPI pixels.
+    
+    Args:
+        tokens (DataFrame): Token data, see clean_ocr_data()
+        factor (float): Multiplier applied to left/top/width/height
+        
+    Returns:
+        pandas.DataFrame: A rescaled copy (the input is returned if factor is 1)
+    """
+    if factor == 1:
+        return tokens
+    scaled = tokens.copy()
+    for col in ['left', 'top', 'width', 'height']:
+        scaled[col] = (scaled[col] * factor).round().astype(int)
+    return scaled
+
+
+def ocr_page_checked(image, min_tokens=5, min_mean_conf=60, info=None, ocr=ocr_page):
+    """
+    OCR a page assuming it is upright, checking orientation from the result.
+    
+    Used with the 'ocr' orientation strategy: most pages are upright, so a
+    good OCR result (enough tokens, high mean confidence) is accepted as-is
+    and no OSD pass is run. Only a poor result triggers OSD and, if the page
+    turns out to be rotated, a second OCR pass on the rotated page.
+    
+    Args:
+        image: Preprocessed page (NumPy array)
+        min_tokens: Minimum token count for an acceptable result
+        min_mean_conf: Minimum mean token confidence for an acceptable result
+        info: Optional dict receiving 'orientation_path' and 'rotation'
+        ocr: Function turning a page into tokens (e.g. ocr_page_regions)
+    
+    Returns:
+        tuple: (tokens DataFrame, page image after any rotation)
+    """
+    tokens = ocr(image)
+    path = 'ocr'
+    rotation = 0
+    
+    if ocr_result_is_poor(tokens, min_tokens, min_mean_conf):
+        path = 'ocr->osd'
+        try:
+            with stage('osd'):
+                rotation = get_backend().detect_rotation(image)
+        except Exception as e:
+            print(f"  [Warning] OSD failed: {e}. Keeping unrotated OCR result.")
+        if rotation:
+            image = rotate_upright(image, rotation)
+            tokens = ocr(image)
+            print(f"    - Applied {rotation}° rotation based on OSD after low-confidence OCR")
+    
+    if info is not None:
+        info['orientation_path'] = path
+        info['rotation'] = rotation
+    return tokens, image
+
 
 def perform_ocr_on_image(image_path):
     """
@@ -26,46 +336,50 @@ def perform_ocr_on_image(image_path):
                           Returns None if OCR fails.
     """
     try:
-        # Use Tesseract to get a dictionary of detailed OCR data.
-        ocr_data_dict = pytesseract.image_to_data(Image.open(image_path), 
-                                                  output_type=pytesseract.Output.DICT)
-        
-        # Convert the dictionary to a pandas DataFrame for easy manipulation.
-        df = pd.DataFrame(ocr_data_dict)
-        
-        # --- Data Cleaning and Preparation ---
-        
-        # 1. Remove rows with placeholder confidence values (-1), which represent
-        #    structural information (like page or block numbers) rather than words.
-        tokens_df = df[df.conf != -1].copy()
-        
-        # 2. Convert relevant columns to the correct numeric types.
-        for col in ['left', 'top', 'width', 'height', 'conf']:
-            tokens_df[col] = pd.to_numeric(tokens_df[col], errors='coerce')
-            
-        # 3. Filter out tokens that are just empty spaces or have no visible text.
-        tokens_df = tokens_df[tokens_df['text'].str.strip().astype(bool)]
-        
-        # 4. Remove any rows with NaN values in critical columns
-        tokens_df = tokens_df.dropna(subset=['conf', 'text', 'left', 'top', 'width', 'height'])
-        
-        # 5. Select and reorder the essential columns for our project.
-        final_df = tokens_df[['conf', 'text', 'left', 'top', 'width', 'height']].copy()
-        
-        # 6. Reset index for cleaner output
-        final_df.reset_index(drop=True, inplace=True)
-        
-        return final_df
+        return ocr_page(Image.open(image_path))
 
     except Exception as e:
         print(f"  [Error] OCR process failed for {os.path.basename(image_path)}: {e}")
         return None
 
 
-def run_ocr_on_folder(cleaned_images_dir, ocr_output_dir):
+def perform_ocr_on_images(image_paths, max_workers=1):
+    """
+    Batch form of perform_ocr_on_image for many cleaned image files.
+    
+    A page whose OCR fails is reported and yields None without affecting
+    the rest of the batch; the successful pages are cleaned in one pass.
+    
+    Args:
+        image_paths (list): Paths to preprocessed image files
+        max_workers (int): Pages recognized concurrently
+        
+    Returns:
+        list: One token DataFrame (or None if OCR failed) per path, in order
+    """
+    backend = get_backend()
+    
+    def recognize(image_path):
+        try:
+            with Image.open(image_path) as image:
+                return backend.image_to_data(image)
+        except Exception as e:
+            print(f"  [Error] OCR process failed for {os.path.basename(image_path)}: {e}")
+            return None
+    
+    with stage('ocr'), ThreadPoolExecutor(max_workers=max_workers) as executor:
+        raw = list(executor.map(recognize, image_paths))
+        batch = clean_ocr_batch([data for data in raw if data is not None])
+    frames = iter(batch.frames())
+    return [None if data is None else next(frames) for data in raw]
+
+
+def run_ocr_on_folder(cleaned_images_dir, ocr_output_dir, token_format='bin', max_workers=1):
     """
     Iterates through a folder of cleaned images, performs OCR on each, and
-    saves the resulting token data as a CSV file for each page.
+    saves the resulting token data: one columnar token store per report
+    (token_format='bin'), or a CSV file for each page (token_format='csv').
+    The pages of a report are OCR'd as one batch (see perform_ocr_on_images).
     """
     if not os.path.exists(ocr_output_dir):
         os.makedirs(ocr_output_dir)
@@ -82,22 +396,34 @@ def run_ocr_on_folder(cleaned_images_dir, ocr_output_dir):
         return
     
     print(f"Found {len(image_files)} image(s) to process.\n")
-        
+    
+    # Group page images (<report>_page_NN) by report; other images are
+    # treated as single-page reports
+    reports = {}
     for image_name in image_files:
-        image_path = os.path.join(cleaned_images_dir, image_name)
-        print(f"  - Processing: {image_name}")
+        stem = os.path.splitext(image_name)[0]
+        match = PAGE_STEM_PATTERN.match(stem)
+        base_name, page_number = (match.group(1), int(match.group(2))) if match else (stem, 1)
+        reports.setdefault(base_name, []).append((page_number, image_name))
         
-        token_data = perform_ocr_on_image(image_path)
+    for base_name, pages in reports.items():
+        report_tokens = []
+        print(f"  - Processing {len(pages)} page(s) of: {base_name}")
+        count('pages', len(pages))
+        image_paths = [os.path.join(cleaned_images_dir, image_name) for _, image_name in pages]
+        batch = perform_ocr_on_images(image_paths, max_workers=max_workers)
         
-        if token_data is not None and not token_data.empty:
-            # Define the output path for the CSV file.
-            base_name = os.path.splitext(image_name)[0]
-            output_csv_path = os.path.join(ocr_output_dir, f"{base_name}_tokens.csv")
-            
-            # Save the DataFrame to a CSV file.
-            token_data.to_csv(output_csv_path, index=False)
-            print(f"    -> Saved {len(token_data)} tokens to: {output_csv_path}")
-        else:
-            print(f"    -> No tokens extracted from {image_name}")
+        for (page_number, image_name), token_data in zip(pages, batch):
+            print(f"  - Processed: {image_name}")
+            if token_data is not None and not token_data.empty:
+                report_tokens.append((page_number, token_data))
+                count('tokens', len(token_data))
+                print(f"    -> Extracted {len(token_data)} tokens")
+            else:
+                print(f"    -> No tokens extracted from {image_name}")
+        
+        if report_tokens:
+            save_report_tokens(ocr_output_dir, base_name, report_tokens, token_format)
+            print(f"    -> Saved tokens of {len(report_tokens)} page(s) for: {base_name}")
             
     print("\n-> Finished OCR processing.")
\ No newline at end of file
@@ -0,0 +1,194 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# OCR Backend: Persistent Tesseract engines with a pytesseract fallback
+# =============================================================================
+
+import queue
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except ImportError:  # optional dependency
+    tesserocr = None
+
+BACKEND_NAMES = ['auto', 'tesserocr', 'pytesseract']
+
+
+def _to_pil(image):
+    """Accept NumPy arrays (as produced by module_one) or PIL images."""
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image)
+    return image
+
+
+# ============================================================================
+# PYTESSERACT (one tesseract subprocess per call)
+# ============================================================================
+
+class PytesseractBackend:
+    """The original path: every call spawns a tesseract process."""
+
+    name = 'pytesseract'
+
+    def image_to_data(self, image):
+        """Word-level OCR data in pytesseract's Output.DICT layout."""
+        return pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+
+    def detect_rotation(self, image):
+        """Clockwise rotation (0/90/180/270) that makes the page upright."""
+        osd_data = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+        return osd_data['rotate']
+
+
+# ============================================================================
+# TESSEROCR (long-lived in-process engines)
+# ============================================================================
+
+class TesserocrBackend:
+    """
+    Keeps initialized Tesseract engines alive and reuses them across pages.
+
+    Language data is loaded once per engine instead of once per page, and no
+    subprocess or temp file is involved. Engines are not thread-safe, so each
+    call borrows one from a pool; up to max_engines are created on demand
+    (tesserocr releases the GIL while recognizing, so threads run in parallel).
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, lang='eng', max_engines=4):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        self.lang = lang
+        self.max_engines = max_engines
+        self._pools = {}
+        self._created = {}
+        self._available = threading.Condition()
+
+        # Fail fast (e.g. missing traineddata) so 'auto' can fall back
+        try:
+            api = self._new_engine(tesserocr.PSM.AUTO)
+        except Exception as e:
+            raise RuntimeError(f"tesserocr failed to initialize: {e}")
+        self._pools[tesserocr.PSM.AUTO] = queue.LifoQueue()
+        self._pools[tesserocr.PSM.AUTO].put(api)
+        self._created[tesserocr.PSM.AUTO] = 1
+
+    def _new_engine(self, psm):
+        return tesserocr.PyTessBaseAPI(lang=self.lang, psm=psm)
+
+    @contextmanager
+    def _engine(self, psm):
+        with self._available:
+            pool = self._pools.setdefault(psm, queue.LifoQueue())
+            # Borrow an idle engine, claim a slot for a new one, or wait for either
+            while pool.empty() and self._created.get(psm, 0) >= self.max_engines:
+                self._available.wait()
+            create = pool.empty()
+            if create:
+                self._created[psm] = self._created.get(psm, 0) + 1
+            else:
+                api = pool.get_nowait()
+
+        if create:
+            try:
+                api = self._new_engine(psm)
+            except Exception:
+                # Give the slot back (and wake a waiter to claim it), or failed
+                # creations would leave callers waiting for engines that never come
+                with self._available:
+                    self._created[psm] -= 1
+                    self._available.notify()
+                raise
+        try:
+            yield api
+        finally:
+            api.Clear()
+            with self._available:
+                pool.put(api)
+                self._available.notify()
+
+    def image_to_data(self, image):
+        """Word-level OCR data in pytesseract's Output.DICT layout."""
+        data = {'conf': [], 'text': [], 'left': [], 'top': [], 'width': [], 'height': []}
+        level = tesserocr.RIL.WORD
+
+        with self._engine(tesserocr.PSM.AUTO) as api:
+            api.SetImage(_to_pil(image))
+            api.Recognize()
+            iterator = api.GetIterator()
+            if iterator is None:
+                return data
+            for word in tesserocr.iterate_level(iterator, level):
+                text = word.GetUTF8Text(level)
+                box = word.BoundingBox(level)
+                if text is None or box is None:
+                    continue
+                x1, y1, x2, y2 = box
+                data['conf'].append(word.Confidence(level))
+                data['text'].append(text)
+                data['left'].append(x1)
+                data['top'].append(y1)
+                data['width'].append(x2 - x1)
+                data['height'].append(y2 - y1)
+
+        return data
+
+    def detect_rotation(self, image):
+        """Clockwise rotation (0/90/180/270) that makes the page upright."""
+        with self._engine(tesserocr.PSM.OSD_ONLY) as api:
+            api.SetImage(_to_pil(image))
+            osd = api.DetectOrientationScript()
+        if not osd:
+            raise RuntimeError("OSD returned no result")
+        # Tesseract reports the page orientation; the fix is the inverse rotation
+        return (360 - osd['orient_deg']) % 360
+
+
+# ============================================================================
+# SELECTION
+# ============================================================================
+
+_default_backend_name = 'auto'
+_backend = None
+
+
+def set_default_backend(name):
+    """Select the backend used by get_backend() ('auto', 'tesserocr' or 'pytesseract')."""
+    global _default_backend_name, _backend
+    if name not in BACKEND_NAMES:
+        raise ValueError(f"Unknown OCR backend: {name}")
+    _default_backend_name = name
+    _backend = None
+
+
+def get_default_backend_name():
+    """Name passed to set_default_backend() (used to configure worker processes)."""
+    return _default_backend_name
+
+
+def get_backend():
+    """
+    Process-wide OCR backend, created on first use.
+
+    'auto' prefers persistent tesserocr engines and falls back to pytesseract
+    when tesserocr is missing or cannot initialize.
+    """
+    global _backend
+    if _backend is None:
+        if _default_backend_name == 'pytesseract':
+            _backend = PytesseractBackend()
+        elif _default_backend_name == 'tesserocr':
+            _backend = TesserocrBackend()
+        else:
+            try:
+                _backend = TesserocrBackend()
+            except RuntimeError:
+                _backend = PytesseractBackend()
+    return _backend
@@ -0,0 +1,1018 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Pipeline: Streaming and parallel per-page execution of Modules 1-3
+# =============================================================================
+
+import os
+import time
+import threading
+import cv2
+from collections import Counter, defaultdict
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from module_one import (count_pages, load_page, render_page, preprocess_page, page_output_name,
+                        iter_raw_pages, PageRenderError, SUPPORTED_IMAGE_EXTENSIONS, DEFAULT_DPI)
+from module_two import ocr_page, ocr_page_checked, ocr_page_regions, ocr_result_is_poor, scale_tokens
+from module_three import (extract, merge_multi_page_results, merged_result_name, report_base_name,
+                          write_result_json)
+from ocr_backend import set_default_backend, get_default_backend_name, get_backend
+from text_layer import read_text_layer, has_usable_text_layer
+from token_store import save_report_tokens, report_store_path, CSV_SUFFIX
+from report_index import record_extraction, forget_extractions
+from stage_scheduler import PipelineStage, StagedScheduler
+import metrics
+
+# Per-run processing options shared by every execution mode
+DEFAULT_OPTIONS = {
+    'orientation': 'osd',  # one of module_one.ORIENTATION_STRATEGIES
+    'skew': 'exact',       # one of module_one.SKEW_MODES
+    'grayscale': False,    # have poppler render PDF pages as grayscale
+    'render_threads': 1,   # PDF pages rendered ahead while the current one is processed
+    'text_layer': True,    # use embedded PDF words instead of OCR where the page has them
+    'dpi': DEFAULT_DPI,    # PDF rendering resolution, or 'auto' to pick it per page
+    'roi': False,          # OCR only detected text regions instead of the whole page
+    'token_format': 'bin', # token artifacts: one columnar store per report, or per-page CSV
+}
+
+# Options that do not change extraction results (left out of cache keys)
+RESULT_NEUTRAL_OPTIONS = {'render_threads', 'token_format'}
+
+
+def resolve_options(options=None):
+    """Fill in missing processing options with their defaults."""
+    return {**DEFAULT_OPTIONS, **(options or {})}
+
+
+def cache_options(options=None):
+    """The resolved options that can change a report's results."""
+    return {k: v for k, v in resolve_options(options).items() if k not in RESULT_NEUTRAL_OPTIONS}
+
+
+def process_page_image(img, options=None, info=None):
+    """
+    Preprocess and OCR one raw BGR page according to the run options.
+
+    With the 'ocr' orientation strategy no OSD pass is made up front;
+    orientation is judged from the OCR result instead (see ocr_page_checked).
+    With 'roi' only the detected text regions are OCR'd (see ocr_page_regions).
+
+    Args:
+        img: Raw BGR page
+        options: Processing options (see DEFAULT_OPTIONS)
+        info: Optional dict receiving per-page metrics ('orientation_path', 'rotation',
+              'skew_angle', 'ocr_regions', 'ocr_pixel_share')
+
+    Returns:
+        tuple: (final page image, tokens DataFrame)
+    """
+    options = resolve_options(options)
+    final_img = preprocess_page(img, orientation=options['orientation'], info=info,
+                                skew=options['skew'])
+    return ocr_preprocessed_page(final_img, options, info)
+
+
+def ocr_preprocessed_page(final_img, options=None, info=None):
+    """
+    The OCR half of process_page_image, for a page already preprocessed.
+
+    Returns:
+        tuple: (final page image, tokens DataFrame); with the 'ocr' orientation
+               strategy the image comes back rotated if OCR found it upside down
+    """
+    options = resolve_options(options)
+    ocr = partial(ocr_page_regions, info=info) if options['roi'] else ocr_page
+    if options['orientation'] == 'ocr':
+        tokens, final_img = ocr_page_checked(final_img, info=info, ocr=ocr)
+    else:
+        tokens = ocr(final_img)
+    return final_img, tokens
+
+
+def read_native_tokens(input_path, options=None, page_number=None):
+    """
+    Tokens from the embedded text layer of a born-digital PDF.
+
+    Args:
+        input_path: Path to a PDF or image file
+        options: Processing options (see DEFAULT_OPTIONS)
+        page_number: Single page to read (default: all pages)
+
+    Returns:
+        tuple: (usable, page_count) where usable maps page_number -> tokens
+               DataFrame for every page whose text layer can replace OCR,
+               and page_count is the number of pages read (0 if the text
+               layer is disabled, unavailable or the file is not a PDF)
+    """
+    options = resolve_options(options)
+    if not options['text_layer'] or os.path.splitext(input_path)[1].lower() != '.pdf':
+        return {}, 0
+    if page_number is None:
+        text_pages = read_text_layer(input_path)
+    else:
+        text_pages = read_text_layer(input_path, first_page=page_number, last_page=page_number)
+    usable = {n: tokens for n, tokens in text_pages.items() if has_usable_text_layer(tokens)}
+    return usable, len(text_pages)
+
+
+def iter_page_inputs(input_path, options=None):
+    """
+    Yield every page of a report as either a raw image or native tokens.
+
+    Pages with a usable text layer are never rasterized; the remaining
+    (scanned) pages are rendered as usual. A scanned page that fails to
+    render carries a PageRenderError in place of its raw image.
+
+    Yields:
+        tuple: (page_number, raw image or None, render DPI or None, native tokens or None)
+    """
+    options = resolve_options(options)
+    native, page_count = read_native_tokens(input_path, options)
+    render = dict(dpi=options['dpi'], grayscale=options['grayscale'],
+                  thread_count=options['render_threads'], with_dpi=True)
+
+    if not native:
+        for page_number, img, dpi in iter_raw_pages(input_path, **render):
+            yield page_number, img, dpi, None
+        return
+
+    print(f"-> Using embedded text layer: {os.path.basename(input_path)} "
+          f"({len(native)}/{page_count} page(s))")
+    scanned = [n for n in range(1, page_count + 1) if n not in native]
+    raw_pages = iter_raw_pages(input_path, page_numbers=scanned, **render) if scanned else None
+    try:
+        for page_number in range(1, page_count + 1):
+            if page_number in native:
+                yield page_number, None, None, native[page_number]
+                continue
+            raw = next(raw_pages, None)
+            if raw is None:
+                return  # the PDF could not be opened; the error has been reported
+            yield raw + (None,)
+    finally:
+        if raw_pages is not None:
+            raw_pages.close()
+
+
+def ocr_rendered_page(input_path, page_number, img, dpi, options=None, info=None):
+    """
+    Preprocess and OCR a rendered page, escalating low-DPI renders if needed.
+
+    A page rendered below DEFAULT_DPI (dpi='auto') whose OCR result comes
+    back poor is rendered again at DEFAULT_DPI and re-OCR'd. Token boxes are
+    always returned in DEFAULT_DPI pixels.
+
+    Args:
+        input_path: Path to the PDF or image file the page came from
+        page_number: 1-based page number
+        img: Raw page as rendered
+        dpi: Resolution img was rendered at (None for image files)
+        options: Processing options (see DEFAULT_OPTIONS)
+        info: Optional dict receiving per-page metrics (adds 'dpi' and
+              'dpi_escalated' to those of process_page_image)
+
+    Returns:
+        tuple: (final page image, tokens DataFrame)
+    """
+    options = resolve_options(options)
+    info = {} if info is None else info
+    final_img, tokens = process_page_image(img, options, info)
+    return escalate_dpi(input_path, page_number, final_img, tokens, dpi, options, info)
+
+
+def escalate_dpi(input_path, page_number, final_img, tokens, dpi, options=None, info=None):
+    """
+    The second half of ocr_rendered_page: re-render and re-OCR a poor
+    low-DPI page at DEFAULT_DPI, then scale tokens to DEFAULT_DPI pixels.
+    """
+    options = resolve_options(options)
+    info = {} if info is None else info
+    if dpi is not None and dpi < DEFAULT_DPI and ocr_result_is_poor(tokens):
+        img = load_page(input_path, page_number, dpi=DEFAULT_DPI, grayscale=options['grayscale'])
+        retry_img, retry_tokens = process_page_image(img, options, info)
+        info['dpi_escalated'] = True
+        if retry_tokens['conf'].mean() >= tokens['conf'].mean() or tokens.empty:
+            final_img, tokens, dpi = retry_img, retry_tokens, DEFAULT_DPI
+
+    if dpi is not None:
+        info['dpi'] = dpi
+        tokens = scale_tokens(tokens, DEFAULT_DPI / dpi)
+    return final_img, tokens
+
+
+# ============================================================================
+# STREAMING IN-MEMORY PIPELINE
+# ============================================================================
+
+def count_page(tokens, info):
+    """Page-level counters for the metrics (see metrics.count)."""
+    metrics.count('tokens', len(tokens))
+    metrics.count(f"{info['token_source'].replace('-', '_')}_pages")
+    if info.get('dpi_escalated'):
+        metrics.count('dpi_escalations')
+
+
+def save_page_image(stem, image, cleaned_dir=None):
+    """Optionally persist a preprocessed page (nothing is written if cleaned_dir is None)."""
+    if cleaned_dir and image is not None:
+        with metrics.stage('write'):
+            cv2.imwrite(os.path.join(cleaned_dir, f"{stem}.png"), image)
+
+
+def save_tokens(input_path, pages, tokens_dir=None, options=None, failed_pages=()):
+    """
+    Optionally persist the tokens of a report's pages.
+
+    Args:
+        input_path: Report the pages belong to (names the output)
+        pages: (page_number, tokens DataFrame) pairs
+        tokens_dir: Token directory (nothing is written if None)
+        options: Processing options; 'token_format' picks the format
+        failed_pages: Page numbers that produced no tokens (recorded in the store)
+    """
+    if tokens_dir and pages:
+        base_name = os.path.splitext(os.path.basename(input_path))[0]
+        if failed_pages:
+            print(f"  [Warning] Tokens of {base_name} saved without failed page(s) "
+                  f"{', '.join(str(n) for n in sorted(failed_pages))}")
+        with metrics.stage('write'):
+            save_report_tokens(tokens_dir, base_name, pages, resolve_options(options)['token_format'],
+                               failed_pages)
+
+
+def save_extraction(stem, result, extraction_dir):
+    """Write a page's extraction result as <stem>_extracted.json and index it."""
+    json_path = os.path.join(extraction_dir, f"{stem}_extracted.json")
+    with metrics.stage('write'):
+        write_result_json(json_path, result)
+        record_extraction(extraction_dir, os.path.basename(json_path), result)
+    return json_path
+
+
+def remove_report_outputs(base_name, extraction_dir, cleaned_dir=None, tokens_dir=None):
+    """
+    Delete everything an earlier run wrote for a report: its page and
+    merged JSONs (and their index rows), page images and token store.
+
+    Args:
+        base_name: Report name (input file name without extension)
+        extraction_dir: Directory for extraction JSON files
+        cleaned_dir: Optional directory for preprocessed page images
+        tokens_dir: Optional directory for token files
+
+    Returns:
+        int: Number of files deleted
+    """
+    def is_page(stem):
+        return stem != base_name and report_base_name(stem) == base_name
+
+    removed_json = [f for f in os.listdir(extraction_dir)
+                    if f.endswith('_extracted.json') and is_page(f[:-len('_extracted.json')])]
+    merged_name = merged_result_name(page_output_name(base_name, 1))
+    if os.path.exists(os.path.join(extraction_dir, merged_name)):
+        removed_json.append(merged_name)
+    paths = [os.path.join(extraction_dir, f) for f in removed_json]
+    if cleaned_dir and os.path.isdir(cleaned_dir):
+        paths += [os.path.join(cleaned_dir, f) for f in os.listdir(cleaned_dir)
+                  if f.endswith('.png') and is_page(f[:-len('.png')])]
+    if tokens_dir and os.path.isdir(tokens_dir):
+        paths += [os.path.join(tokens_dir, f) for f in os.listdir(tokens_dir)
+                  if f.endswith(CSV_SUFFIX) and is_page(f[:-len(CSV_SUFFIX)])]
+        paths.append(report_store_path(tokens_dir, base_name))
+
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    forget_extractions(extraction_dir, removed_json)
+    return removed
+
+
+def iter_report_results(input_path, cleaned_dir=None, tokens_dir=None, options=None):
+    """
+    Stream a report through preprocessing -> OCR -> extract in memory.
+
+    Pages of born-digital PDFs skip preprocessing and OCR entirely when
+    their embedded text layer is usable (see iter_page_inputs).
+
+    Pages are passed between stages as NumPy arrays and token DataFrames;
+    page images and tokens are only written when their directory is given
+    (tokens once per report, after its last page, or when the consumer
+    stops early or a page raises; failed pages are recorded in the store).
+
+    Args:
+        input_path: Path to a PDF or image file
+        cleaned_dir: Optional directory for preprocessed page images
+        tokens_dir: Optional directory for token files
+        options: Processing options (see DEFAULT_OPTIONS)
+
+    Yields:
+        dict: {'page', 'stem', 'tokens' (DataFrame), 'result', 'info' (per-page metrics)},
+              or {'page', 'stem', 'error'} for a page that failed to render
+    """
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    options = resolve_options(options)
+    report_tokens, failed_pages = [], []
+    page_number = None  # the page being processed, if any
+
+    pages = iter_page_inputs(input_path, options)
+    try:
+        while True:
+            # Time spent blocked on rendering (pages are rasterized ahead on other threads)
+            waited = time.perf_counter()
+            page_input = next(pages, None)
+            if page_input is None:
+                break
+            waited = time.perf_counter() - waited
+
+            page_number, img, dpi, tokens = page_input
+            stem = page_output_name(base_name, page_number)
+            if isinstance(img, PageRenderError):
+                failed_pages.append(page_number)
+                page = {'page': page_number, 'stem': stem, 'error': str(img)}
+                page_number = None
+                yield page
+                continue
+            info = {}
+            with metrics.page_scope(base_name, page_number) as record:
+                record.add('page_wait', waited)
+                if tokens is None:
+                    image, tokens = ocr_rendered_page(input_path, page_number, img, dpi, options, info)
+                    info['token_source'] = 'ocr'
+                else:
+                    image = None
+                    info['token_source'] = 'text-layer'
+                save_page_image(stem, image, cleaned_dir)
+                result = extract(tokens)
+                count_page(tokens, info)
+            metrics.record_page(record)
+            report_tokens.append((page_number, tokens))
+            page = {'page': page_number, 'stem': stem, 'tokens': tokens,
+                    'result': result, 'info': info}
+            page_number = None
+            yield page
+    finally:
+        if page_number is not None:
+            failed_pages.append(page_number)  # raised while being processed
+        pages.close()
+        save_tokens(input_path, report_tokens, tokens_dir, options, failed_pages)
+
+
+def run_pipeline_streaming(input_folder, extraction_dir, cleaned_dir=None, tokens_dir=None,
+                           options=None):
+    """
+    Sequentially stream every report through the in-memory pipeline.
+
+    Args:
+        input_folder: Directory containing input reports
+        extraction_dir: Directory for extraction JSON files
+        cleaned_dir: Optional directory for preprocessed page images
+        tokens_dir: Optional directory for token files
+        options: Processing options (see DEFAULT_OPTIONS)
+    """
+    for directory in (cleaned_dir, tokens_dir, extraction_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    page_infos = []
+    for file_name in sorted(os.listdir(input_folder)):
+        input_path = os.path.join(input_folder, file_name)
+        try:
+            for page in iter_report_results(input_path, cleaned_dir, tokens_dir, options):
+                if 'error' not in page:
+                    save_extraction(page['stem'], page['result'], extraction_dir)
+                    page_infos.append(page['info'])
+                print_page_result(page)
+        except Exception as e:
+            print(f"  [Error] {file_name}: {e}")
+
+    print_page_paths(page_infos)
+
+    print("\n" + "-"*70)
+    print("Merging multi-page results...")
+    print("-"*70)
+    merge_multi_page_results(extraction_dir)
+
+
+# ============================================================================
+# TASK PLANNING
+# ============================================================================
+
+def list_page_tasks(input_folder, file_names=None):
+    """
+    Expand every report in the input folder into one task per page.
+
+    Args:
+        input_folder: Directory containing input PDFs/images
+        file_names: Optional subset of file names to expand (default: all)
+
+    Returns:
+        tuple: (tasks, errors) where tasks is a sorted list of
+               (input_path, page_number) and errors lists files that
+               could not be inspected
+    """
+    tasks = []
+    errors = []
+
+    if file_names is None:
+        file_names = os.listdir(input_folder)
+
+    for file_name in sorted(file_names):
+        input_path = os.path.join(input_folder, file_name)
+        try:
+            num_pages = count_pages(input_path)
+        except Exception as e:
+            errors.append({'file': file_name, 'page': None, 'error': str(e)})
+            continue
+
+        if num_pages == 0:
+            print(f"  [Warning] Unsupported file type: {file_name}. Skipping.")
+            continue
+
+        for page_number in range(1, num_pages + 1):
+            tasks.append((input_path, page_number))
+
+    return tasks, errors
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+def _init_worker(ocr_backend_name='auto'):
+    """
+    Keep each worker single-threaded so N processes use N cores, not N^2,
+    and load its OCR engine once for every page the worker will process.
+    """
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    cv2.setNumThreads(1)
+    set_default_backend(ocr_backend_name)
+    get_backend()
+
+
+def process_page_task(input_path, page_number, cleaned_dir, extraction_dir,
+                      keep_outputs=False, options=None):
+    """
+    Run preprocess -> OCR -> extract for a single page.
+
+    Output file names match the sequential pipeline, so results are
+    identical regardless of worker count or completion order. Stages hand
+    data over in memory; cleaned_dir may be None to skip the page image.
+    With keep_outputs the tokens and result are returned to the parent
+    under 'page_data' (used to fill the cache and write per-report tokens).
+
+    Returns:
+        Dictionary describing the outcome of the task
+    """
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    stem = page_output_name(base_name, page_number)
+    status = {'file': os.path.basename(input_path), 'page': page_number, 'stem': stem}
+
+    try:
+        with metrics.page_scope(base_name, page_number) as record:
+            # Modules 1-2: embedded text layer, or preprocessing and OCR
+            info = {}
+            native, _ = read_native_tokens(input_path, options, page_number=page_number)
+            if page_number in native:
+                final_img, tokens = None, native[page_number]
+                info['token_source'] = 'text-layer'
+            else:
+                resolved = resolve_options(options)
+                img, dpi = render_page(input_path, page_number, dpi=resolved['dpi'],
+                                       grayscale=resolved['grayscale'])
+                final_img, tokens = ocr_rendered_page(input_path, page_number, img, dpi, options, info)
+                info['token_source'] = 'ocr'
+            status.update(info)
+            save_page_image(stem, final_img, cleaned_dir)
+
+            # Module 3: extraction
+            result = extract(tokens)
+            save_extraction(stem, result, extraction_dir)
+            count_page(tokens, info)
+        # Folded into the parent's metrics (see _run_page_tasks)
+        status['metrics'] = record.as_dict()
+
+        status.update(ok=True, tokens=len(tokens),
+                      fields=len(result['fields']), tests=len(result['test_results']))
+        if keep_outputs:
+            status['page_data'] = {'page': page_number, 'tokens': tokens, 'result': result}
+    except Exception as e:
+        status.update(ok=False, error=f"{type(e).__name__}: {e}")
+
+    return status
+
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def run_pipeline_parallel(input_folder, cleaned_dir, tokens_dir, extraction_dir, workers,
+                          options=None):
+    """
+    Fan out per-page work over a process pool.
+
+    A failure on one page is recorded in the summary and does not affect
+    any other page or report.
+
+    Args:
+        input_folder: Directory containing input reports
+        cleaned_dir: Directory for preprocessed page images (None to skip)
+        tokens_dir: Directory for OCR token files (None to skip)
+        extraction_dir: Directory for extraction JSON files
+        workers: Number of worker processes
+        options: Processing options (see DEFAULT_OPTIONS)
+
+    Returns:
+        List of per-task status dictionaries, sorted by file and page
+    """
+    for directory in (cleaned_dir, tokens_dir, extraction_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    tasks, results = list_page_tasks(input_folder)
+    print(f"Found {len(tasks)} page(s) to process with {workers} worker(s).\n")
+
+    results.extend(_run_page_tasks(tasks, cleaned_dir, tokens_dir, extraction_dir, workers,
+                                   options=options))
+    results.sort(key=lambda s: (s['file'], s['page'] or 0))
+
+    print("\n" + "-"*70)
+    print("Merging multi-page results...")
+    print("-"*70)
+    merge_multi_page_results(extraction_dir)
+
+    print_summary(results)
+    return results
+
+
+def _run_page_tasks(tasks, cleaned_dir, tokens_dir, extraction_dir, workers, keep_outputs=False,
+                    options=None):
+    """
+    Execute page tasks on a process pool and collect their statuses.
+
+    Workers send their tokens back when tokens_dir is set; each report's
+    tokens are written by the parent as soon as its last page finishes,
+    with its failed pages recorded in the store.
+    """
+    results = []
+    pages_left = Counter(input_path for input_path, _ in tasks)
+    report_tokens = defaultdict(list)
+    report_failed = defaultdict(list)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(get_default_backend_name(),)) as executor:
+        futures = {
+            executor.submit(process_page_task, input_path, page_number,
+                            cleaned_dir, extraction_dir,
+                            keep_outputs or bool(tokens_dir), options): (input_path, page_number)
+            for input_path, page_number in tasks
+        }
+        for future in as_completed(futures):
+            input_path, page_number = futures[future]
+            try:
+                status = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. killed for memory)
+                status = {'file': os.path.basename(input_path), 'page': page_number,
+                          'ok': False, 'error': f"{type(e).__name__}: {e}"}
+            results.append(status)
+            if 'metrics' in status:
+                metrics.record_page(status.pop('metrics'))
+
+            if 'page_data' in status:
+                report_tokens[input_path].append((page_number, status['page_data']['tokens']))
+                if not keep_outputs:
+                    del status['page_data']
+            if not status.get('ok'):
+                report_failed[input_path].append(page_number)
+            pages_left[input_path] -= 1
+            if pages_left[input_path] == 0:
+                save_tokens(input_path, report_tokens.pop(input_path, []), tokens_dir, options,
+                            report_failed.pop(input_path, []))
+
+            if status.get('ok'):
+                print(f"  ✓ {status['stem']}: {status['tokens']} tokens, "
+                      f"{status['fields']} fields, {status['tests']} tests")
+            else:
+                print(f"  ✗ {status['file']} page {status['page']}: {status['error']}")
+
+    return results
+
+
+def print_summary(results, title="PARALLEL RUN SUMMARY"):
+    """Print a final summary of a parallel (or staged) run."""
+    succeeded = [s for s in results if s.get('ok')]
+    failed = [s for s in results if not s.get('ok')]
+
+    print("\n" + "="*70)
+    print(title)
+    print("="*70)
+    print(f"  Pages succeeded: {len(succeeded)}")
+    print(f"  Pages failed:    {len(failed)}")
+    print(f"  Tokens:          {sum(s['tokens'] for s in succeeded)}")
+    print(f"  Tests extracted: {sum(s['tests'] for s in succeeded)}")
+
+    print_page_paths(succeeded)
+
+    for status in failed:
+        page = f" page {status['page']}" if status['page'] else ""
+        print(f"  ✗ {status['file']}{page}: {status['error']}")
+
+
+def print_page_result(page):
+    """One progress line for a page dict produced by iter_report_results."""
+    if 'error' in page:
+        print(f"    ✗ {page['stem']}: {page['error']}")
+        return
+    result = page['result']
+    print(f"    ✓ {page['stem']}: {len(page['tokens'])} tokens, {len(result['fields'])} fields, "
+          f"{len(result['test_results'])} tests")
+
+
+def print_page_paths(page_infos):
+    """Report how many pages took each token source, orientation path and render DPI."""
+    for label, key in (("Token source:", 'token_source'), ("Orientation:", 'orientation_path'),
+                       ("Render DPI:", 'dpi'), ("DPI escalated:", 'dpi_escalated')):
+        paths = Counter(info[key] for info in page_infos if info.get(key))
+        if paths:
+            breakdown = ", ".join(f"{path}={count}" for path, count in sorted(paths.items()))
+            print(f"  {label:<16} {breakdown}")
+
+    shares = [info['ocr_pixel_share'] for info in page_infos if 'ocr_pixel_share' in info]
+    if shares:
+        print(f"  OCR pixel share: {sum(shares) / len(shares):.0%} of page area (region OCR)")
+
+
+# ============================================================================
+# STAGED EXECUTION
+# ============================================================================
+
+# Threads per stage of run_pipeline_staged (see stage_scheduler)
+STAGE_NAMES = ['rasterize', 'preprocess', 'ocr', 'extract', 'write']
+DEFAULT_STAGE_WORKERS = {'rasterize': 1, 'preprocess': 1, 'ocr': 2, 'extract': 1, 'write': 1}
+
+
+class ReportProgress:
+    """
+    Tracks the pages of each report through the staged pipeline, so the
+    report's tokens are written once, after its last page (pages finish
+    out of order, and the page count is only known once rasterizing ends).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._expected = {}
+        self._done = Counter()
+        self._tokens = defaultdict(list)
+        self._failed = defaultdict(list)
+
+    def page_done(self, input_path, page_number, tokens=None):
+        """Records a finished (or failed: tokens=None) page; see _complete."""
+        with self._lock:
+            self._done[input_path] += 1
+            if tokens is not None:
+                self._tokens[input_path].append((page_number, tokens))
+            else:
+                self._failed[input_path].append(page_number)
+            return self._complete(input_path)
+
+    def close(self, input_path, page_count):
+        """Records that rasterizing a report produced page_count pages; see _complete."""
+        with self._lock:
+            self._expected[input_path] = page_count
+            return self._complete(input_path)
+
+    def _complete(self, input_path):
+        """
+        (the report's (page_number, tokens) pairs, its failed page numbers)
+        once every page is done, else None.
+        """
+        expected = self._expected.get(input_path)
+        if expected is None or self._done[input_path] < expected:
+            return None
+        del self._expected[input_path], self._done[input_path]
+        return (sorted(self._tokens.pop(input_path, []), key=lambda page: page[0]),
+                self._failed.pop(input_path, []))
+
+
+def list_input_files(input_folder):
+    """Supported report files of a folder, sorted."""
+    return [os.path.join(input_folder, file_name) for file_name in sorted(os.listdir(input_folder))
+            if os.path.isfile(os.path.join(input_folder, file_name))
+            and os.path.splitext(file_name)[1].lower() in ['.pdf'] + SUPPORTED_IMAGE_EXTENSIONS]
+
+
+def run_pipeline_staged(input_folder, extraction_dir, cleaned_dir=None, tokens_dir=None,
+                        stage_workers=None, queue_size=4, options=None):
+    """
+    Run every report through rasterize -> preprocess -> OCR -> extract -> write
+    with all five stages working at once.
+
+    Each stage has its own thread pool, and stages are connected by bounded
+    queues (see stage_scheduler.StagedScheduler), so OCR no longer waits for
+    a whole folder to be rasterized, and each page's JSON is written as soon
+    as that page is extracted. Memory stays bounded by the queue sizes: a
+    slow stage blocks the stages feeding it instead of letting pages pile up.
+
+    Results match the other modes (same output names and contents).
+
+    Args:
+        input_folder: Directory containing input reports
+        extraction_dir: Directory for extraction JSON files
+        cleaned_dir: Optional directory for preprocessed page images
+        tokens_dir: Optional directory for token files (written per report)
+        stage_workers: {stage name: threads}, merged over DEFAULT_STAGE_WORKERS
+        queue_size: Pages allowed to wait in front of each stage
+        options: Processing options (see DEFAULT_OPTIONS)
+
+    Returns:
+        List of per-page status dictionaries, sorted by file and page
+    """
+    input_paths = list_input_files(input_folder)
+    print(f"Found {len(input_paths)} report(s).")
+    results = run_staged_reports(input_paths, extraction_dir, cleaned_dir, tokens_dir,
+                                 stage_workers, queue_size, options)
+
+    print("\n" + "-"*70)
+    print("Merging multi-page results...")
+    print("-"*70)
+    merge_multi_page_results(extraction_dir)
+
+    print_summary(results, title="STAGED RUN SUMMARY")
+    return results
+
+
+def run_staged_reports(input_paths, extraction_dir, cleaned_dir=None, tokens_dir=None,
+                       stage_workers=None, queue_size=4, options=None, on_report_done=None):
+    """
+    Run reports through the staged pipeline (see run_pipeline_staged).
+
+    input_paths may be any iterable, including a generator that blocks
+    waiting for new files (see ingest_daemon): reports are picked up as
+    they are yielded, and the call returns once it is exhausted and every
+    stage has drained.
+
+    Args:
+        input_paths: Iterable of report paths
+        extraction_dir, cleaned_dir, tokens_dir, stage_workers, queue_size,
+        options: See run_pipeline_staged
+        on_report_done: Optional callback(input_path, pages), called from a
+                        stage thread once every page of a report is written;
+                        pages are the (page_number, tokens) pairs of the
+                        pages that succeeded (empty if none did)
+
+    Returns:
+        List of per-page status dictionaries, sorted by file and page
+    """
+    for directory in (cleaned_dir, tokens_dir, extraction_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    options = resolve_options(options)
+    workers = {**DEFAULT_STAGE_WORKERS, **(stage_workers or {})}
+    progress = ReportProgress()
+    failures = []
+    failures_lock = threading.Lock()
+    started = time.perf_counter()
+    first_result = []
+    reports = []
+
+    def finish_report(input_path, done):
+        if done is None:
+            return
+        pages, failed_pages = done
+        save_tokens(input_path, pages, tokens_dir, options, failed_pages)
+        if on_report_done is not None:
+            on_report_done(input_path, pages)
+
+    def rasterize(input_path):
+        reports.append(input_path)
+        base_name = os.path.splitext(os.path.basename(input_path))[0]
+        page_count = 0
+        pages = iter_page_inputs(input_path, options)
+        try:
+            while True:
+                waited = time.perf_counter()
+                page_input = next(pages, None)
+                if page_input is None:
+                    break
+                page_number, img, dpi, tokens = page_input
+                record = metrics.PageRecord(base_name, page_number)
+                record.add('page_wait', time.perf_counter() - waited)
+                page_count += 1
+                yield {'input_path': input_path, 'page': page_number,
+                       'stem': page_output_name(base_name, page_number), 'img': img,
+                       'dpi': dpi, 'tokens': tokens, 'info': {}, 'record': record}
+        finally:
+            pages.close()
+            finish_report(input_path, progress.close(input_path, page_count))
+
+    def preprocess(page):
+        if isinstance(page['img'], PageRenderError):
+            raise page['img']  # recorded as a failed page by on_error
+        if page['tokens'] is None:
+            with metrics.resume_page(page['record']):
+                page['image'] = preprocess_page(page.pop('img'), orientation=options['orientation'],
+                                                info=page['info'], skew=options['skew'])
+        return page
+
+    def ocr(page):
+        info = page['info']
+        if page['tokens'] is None:
+            with metrics.resume_page(page['record']):
+                image, tokens = ocr_preprocessed_page(page.pop('image'), options, info)
+                page['image'], page['tokens'] = escalate_dpi(page['input_path'], page['page'], image,
+                                                             tokens, page['dpi'], options, info)
+            info['token_source'] = 'ocr'
+        else:
+            info['token_source'] = 'text-layer'
+        return page
+
+    def extract_page(page):
+        with metrics.resume_page(page['record']):
+            page['result'] = extract(page['tokens'])
+        return page
+
+    def write(page):
+        record, tokens, result = page['record'], page['tokens'], page['result']
+        with metrics.resume_page(record):
+            save_page_image(page['stem'], page.pop('image', None), cleaned_dir)
+            save_extraction(page['stem'], result, extraction_dir)
+            count_page(tokens, page['info'])
+        record.finish()
+        metrics.record_page(record)
+        if not first_result:
+            first_result.append(time.perf_counter() - started)
+        finish_report(page['input_path'], progress.page_done(page['input_path'], page['page'], tokens))
+
+        print(f"  ✓ {page['stem']}: {len(tokens)} tokens, {len(result['fields'])} fields, "
+              f"{len(result['test_results'])} tests")
+        return {'file': os.path.basename(page['input_path']), 'page': page['page'],
+                'stem': page['stem'], **page['info'], 'ok': True, 'tokens': len(tokens),
+                'fields': len(result['fields']), 'tests': len(result['test_results'])}
+
+    def on_error(stage_name, item, error):
+        error = f"{stage_name}: {type(error).__name__}: {error}"
+        if isinstance(item, dict):
+            status = {'file': os.path.basename(item['input_path']), 'page': item['page'],
+                      'stem': item['stem'], 'ok': False, 'error': error}
+        else:
+            # The report could not be opened; its rendered pages (if any) carry on
+            status = {'file': os.path.basename(item), 'page': None, 'ok': False, 'error': error}
+        page_label = f" page {status['page']}" if status['page'] else ""
+        print(f"  ✗ {status['file']}{page_label}: {error}")
+        with failures_lock:
+            failures.append(status)
+        if isinstance(item, dict):
+            finish_report(item['input_path'], progress.page_done(item['input_path'], item['page']))
+
+    scheduler = StagedScheduler([
+        PipelineStage('rasterize', rasterize, workers['rasterize'], queue_size, expand=True),
+        PipelineStage('preprocess', preprocess, workers['preprocess'], queue_size),
+        PipelineStage('ocr', ocr, workers['ocr'], queue_size),
+        PipelineStage('extract', extract_page, workers['extract'], queue_size),
+        PipelineStage('write', write, workers['write'], queue_size),
+    ], on_error=on_error)
+
+    print("Threads per stage: " + ", ".join(f"{name}={workers[name]}" for name in STAGE_NAMES)
+          + f", queue size {queue_size}.\n")
+    results = scheduler.run(input_paths) + failures
+    results.sort(key=lambda s: (s['file'], s['page'] or 0))
+
+    if first_result:
+        print(f"\nFirst result written after {first_result[0]:.2f}s; "
+              f"all {len(reports)} report(s) in {scheduler.wall:.2f}s")
+    scheduler.print_stats()
+    return results
+
+
+# ============================================================================
+# INCREMENTAL EXECUTION
+# ============================================================================
+
+def restore_cached_report(input_path, pages, extraction_dir, tokens_dir=None, options=None):
+    """
+    Re-materialize outputs of a cached report that are missing on disk.
+
+    Cache entries are keyed on content, so output names are derived from
+    the current file name rather than stored in the entry.
+
+    Returns:
+        Number of pages whose outputs had to be rewritten
+    """
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    restored = 0
+    for page in pages:
+        stem = page_output_name(base_name, page['page'])
+        json_path = os.path.join(extraction_dir, f"{stem}_extracted.json")
+        if not os.path.exists(json_path):
+            save_extraction(stem, page['result'], extraction_dir)
+            restored += 1
+    if restored:
+        save_tokens(input_path, [(page['page'], page['tokens']) for page in pages],
+                    tokens_dir, options)
+    return restored
+
+
+def run_pipeline_incremental(input_folder, extraction_dir, cache, cleaned_dir=None,
+                             tokens_dir=None, workers=1, options=None):
+    """
+    Only process reports that are new or changed since they were last cached.
+
+    Unchanged reports (same content hash and config version) are served from
+    the cache; their outputs are only rewritten if missing. The previous
+    outputs of changed reports, and of reports whose input has been deleted,
+    are removed first so no stale page is listed or merged. New results are
+    added to the cache, which is then trimmed to its size limit.
+
+    Args:
+        input_folder: Directory containing input reports
+        extraction_dir: Directory for extraction JSON files
+        cache: result_cache.ResultCache instance
+        cleaned_dir: Optional directory for preprocessed page images
+        tokens_dir: Optional directory for token files
+        workers: Number of worker processes for changed reports
+        options: Processing options (see DEFAULT_OPTIONS)
+    """
+    for directory in (cleaned_dir, tokens_dir, extraction_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    pending = {}
+    cached = 0
+    current = set()
+    for file_name in sorted(os.listdir(input_folder)):
+        input_path = os.path.join(input_folder, file_name)
+        file_ext = os.path.splitext(file_name)[1].lower()
+        if not os.path.isfile(input_path) or file_ext not in ['.pdf'] + SUPPORTED_IMAGE_EXTENSIONS:
+            continue
+        try:
+            key = cache.report_key(input_path, cache_options(options))
+        except OSError as e:
+            print(f"  [Error] Cannot read {file_name}: {e}")
+            continue
+        current.add(os.path.splitext(file_name)[0])
+
+        pages = cache.get(key)
+        if pages is None:
+            pending[file_name] = key
+        else:
+            cached += 1
+            restore_cached_report(input_path, pages, extraction_dir, tokens_dir, options)
+
+    # A deleted input's outputs stay if another input (other extension) now owns the name
+    deleted = [f for f in cache.forget_missing_inputs(input_folder)
+               if os.path.splitext(f)[0] not in current]
+    for file_name in list(pending) + deleted:
+        remove_report_outputs(os.path.splitext(file_name)[0], extraction_dir, cleaned_dir, tokens_dir)
+
+    print(f"{cached} report(s) unchanged, {len(pending)} new or changed"
+          + (f", {len(deleted)} removed" if deleted else "") + ".\n")
+
+    if workers > 1 and pending:
+        tasks, results = list_page_tasks(input_folder, pending)
+        results.extend(_run_page_tasks(tasks, cleaned_dir, tokens_dir, extraction_dir,
+                                       workers, keep_outputs=True, options=options))
+
+        # Cache only reports whose every page succeeded
+        by_file = {}
+        for status in results:
+            by_file.setdefault(status['file'], []).append(status)
+        for file_name, statuses in by_file.items():
+            if all(s.get('ok') for s in statuses):
+                pages = [s['page_data'] for s in sorted(statuses, key=lambda s: s['page'])
+                         if 'page_data' in s]
+                cache.put(pending[file_name], file_name, pages)
+        print_summary(results)
+    else:
+        for file_name, key in pending.items():
+            input_path = os.path.join(input_folder, file_name)
+            try:
+                pages, failed = [], False
+                for page in iter_report_results(input_path, cleaned_dir, tokens_dir, options):
+                    if 'error' in page:
+                        failed = True
+                    else:
+                        save_extraction(page['stem'], page['result'], extraction_dir)
+                        pages.append(page)
+                    print_page_result(page)
+                # A report with failed pages is retried on the next run
+                if pages and not failed:
+                    cache.put(key, file_name, pages)
+            except Exception as e:
+                print(f"  [Error] {file_name}: {e}")
+
+    cache.save_manifest()
+    evicted = cache.evict()
+    if evicted:
+        print(f"  Evicted {evicted} least-recently-used cache entr{'y' if evicted == 1 else 'ies'}.")
+
+    if pending:
+        print("\n" + "-"*70)
+        print("Merging multi-page results...")
+        print("-"*70)
+        merge_multi_page_results(extraction_dir)
@@ -0,0 +1,127 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Report Cache: Size-bounded LRU of encoded report JSON for the review API
+# =============================================================================
+
+import os
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2  # 64 MB
+
+# Small bodies are not worth compressing
+GZIP_MIN_BYTES = 500
+
+
+class CachedReport:
+    """
+    A report ready to serve: the JSON body, its gzip form and an ETag.
+
+    The ETag is derived from the body, so it survives restarts and only
+    changes when the report's content does.
+    """
+
+    __slots__ = ('body', 'gzip_body', 'etag', 'version')
+
+    def __init__(self, data, version):
+        # Same encoding as FastAPI's JSONResponse
+        self.body = json.dumps(data, ensure_ascii=False, allow_nan=False,
+                               separators=(",", ":")).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=6) if len(self.body) >= GZIP_MIN_BYTES else None
+        self.etag = f'W/"{hashlib.sha1(self.body).hexdigest()[:20]}"'
+        self.version = version
+
+    @property
+    def size(self):
+        return len(self.body) + (len(self.gzip_body) if self.gzip_body else 0)
+
+
+class ReportCache:
+    """
+    LRU cache of parsed report files, keyed on path and validated by mtime.
+
+    Every lookup stats the file; an entry is reused only while the file's
+    (mtime_ns, size) is unchanged, so results rewritten by the pipeline are
+    picked up without explicit invalidation. Thread-safe (lookups run on
+    the API's I/O threads).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """
+        The cached report for a file, loading it on a miss.
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+        """
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        with open(path, 'r') as f:
+            entry = CachedReport(json.load(f), version)
+
+        with self._lock:
+            self._store(path, entry)
+        return entry
+
+    def invalidate(self, path):
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def _store(self, path, entry):
+        old = self._entries.pop(path, None)
+        if old is not None:
+            self._bytes -= old.size
+        if entry.size > self.max_bytes:
+            return
+        self._entries[path] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header covers the ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    strip = lambda tag: tag.strip().removeprefix('W/')
+    return any(strip(tag) == strip(etag) for tag in if_none_match.split(','))
+
+
+def accepts_gzip(accept_encoding):
+    """True if an Accept-Encoding header allows gzip (and does not refuse it with q=0)."""
+    for coding in (accept_encoding or '').split(','):
+        name, _, params = coding.strip().partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            q = params.strip().lower()
+            if not q.startswith('q='):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return True
+    return False
@@ -0,0 +1,304 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Report Index: SQLite index of extracted reports for the review API
+# =============================================================================
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+INDEX_FILE = "report_index.sqlite"
+
+STATUSES = ['pending', 'confirmed', 'corrected']
+SORT_COLUMNS = ['name', 'status', 'confidence', 'flag_count', 'test_count',
+                'extracted_at', 'reviewed_at']
+
+# Values compared when deciding between 'confirmed' and 'corrected'
+REVIEWED_TEST_KEYS = ['test_name', 'value', 'unit', 'reference_range']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    name         TEXT PRIMARY KEY,
+    status       TEXT NOT NULL DEFAULT 'pending',
+    confidence   REAL,
+    flag_count   INTEGER NOT NULL DEFAULT 0,
+    field_count  INTEGER NOT NULL DEFAULT 0,
+    test_count   INTEGER NOT NULL DEFAULT 0,
+    extracted_at REAL NOT NULL,
+    reviewed_at  REAL
+);
+CREATE INDEX IF NOT EXISTS reports_status ON reports (status, extracted_at);
+CREATE INDEX IF NOT EXISTS reports_extracted ON reports (extracted_at);
+CREATE INDEX IF NOT EXISTS reports_confidence ON reports (confidence);
+CREATE INDEX IF NOT EXISTS reports_flags ON reports (flag_count);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def index_path(extraction_dir):
+    """Location of the index for an extraction folder (kept inside it)."""
+    return os.path.join(extraction_dir, INDEX_FILE)
+
+
+def result_names(extraction_dir):
+    """JSON results of an extraction folder (what the index lists)."""
+    return [f for f in os.listdir(extraction_dir) if f.endswith('.json')]
+
+
+def summarize_result(result):
+    """
+    Listing columns of an extraction result.
+
+    Args:
+        result (dict): {'fields': {...}, 'test_results': [...]} as written by extraction
+
+    Returns:
+        dict: confidence (mean over fields and tests, None if empty),
+              flag_count, field_count, test_count
+    """
+    fields = result.get('fields', {})
+    tests = result.get('test_results', [])
+    confidences = [f['confidence'] for f in fields.values()
+                   if isinstance(f, dict) and f.get('confidence') is not None]
+    confidences += [t['confidence'] for t in tests if t.get('confidence') is not None]
+    return {
+        'confidence': round(sum(confidences) / len(confidences), 2) if confidences else None,
+        'flag_count': sum(1 for t in tests if 'flag' in t),
+        'field_count': len(fields),
+        'test_count': len(tests),
+    }
+
+
+def review_status(original, corrected):
+    """'confirmed' if the reviewer saved the extracted values unchanged, else 'corrected'."""
+    def values(result):
+        fields = {name: (f.get('value') if isinstance(f, dict) else f)
+                  for name, f in result.get('fields', {}).items()}
+        tests = [tuple(str(t.get(key, '')) for key in REVIEWED_TEST_KEYS)
+                 for t in result.get('test_results', [])]
+        return fields, tests
+
+    return 'confirmed' if values(original) == values(corrected) else 'corrected'
+
+
+class ReportIndex:
+    """
+    On-disk index of extraction results with their review status.
+
+    Extraction upserts a row per written *_extracted.json / *_merged.json,
+    the review API updates the status, and listings are paginated queries
+    instead of directory scans. Safe to share between threads; separate
+    processes (parallel pipeline workers) each open their own connection
+    and SQLite serializes their writes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    # ------------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------------
+
+    def record_extraction(self, name, result, extracted_at=None):
+        """
+        Adds or refreshes a report after extraction; it becomes 'pending' again.
+
+        Args:
+            name (str): JSON file name, e.g. 'report_page_01_extracted.json'
+            result (dict): The extraction result written to that file
+            extracted_at (float): Unix time (default: now)
+        """
+        summary = summarize_result(result)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO reports (name, status, confidence, flag_count, field_count, test_count, "
+                "extracted_at, reviewed_at) VALUES (?, 'pending', ?, ?, ?, ?, ?, NULL) "
+                "ON CONFLICT(name) DO UPDATE SET status='pending', confidence=excluded.confidence, "
+                "flag_count=excluded.flag_count, field_count=excluded.field_count, "
+                "test_count=excluded.test_count, extracted_at=excluded.extracted_at, reviewed_at=NULL",
+                (name, summary['confidence'], summary['flag_count'], summary['field_count'],
+                 summary['test_count'], extracted_at or time.time()),
+            )
+
+    def set_status(self, name, status, reviewed_at=None):
+        """Records a review ('confirmed' or 'corrected'). Returns False if the report is unknown."""
+        if status not in STATUSES:
+            raise ValueError(f"Unknown report status: {status}")
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE reports SET status = ?, reviewed_at = ? WHERE name = ?",
+                (status, reviewed_at or time.time(), name))
+        return cursor.rowcount > 0
+
+    def remove(self, names):
+        """Drops the rows of results deleted from the folder. Returns the number removed."""
+        with self._lock, self._conn:
+            cursor = self._conn.executemany("DELETE FROM reports WHERE name = ?",
+                                            [(name,) for name in names])
+        return cursor.rowcount
+
+    def rebuild(self, extraction_dir, confirmed_dir=None, names=None):
+        """
+        Indexes JSON results already in a folder (e.g. written before the
+        index existed). Reports present in confirmed_dir are marked 'confirmed'.
+
+        Args:
+            names: Only these files (default: every JSON in the folder)
+
+        Returns:
+            int: Number of reports indexed
+        """
+        if names is None:
+            names = result_names(extraction_dir)
+        confirmed = set(os.listdir(confirmed_dir)) if confirmed_dir and os.path.isdir(confirmed_dir) else set()
+        rows = []
+        for name in sorted(names):
+            path = os.path.join(extraction_dir, name)
+            try:
+                with open(path, 'r') as f:
+                    summary = summarize_result(json.load(f))
+                mtime = os.path.getmtime(path)
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"  [Warning] Not indexing {name}: {e}")
+                continue
+            reviewed = name in confirmed
+            rows.append((name, 'confirmed' if reviewed else 'pending', summary['confidence'],
+                         summary['flag_count'], summary['field_count'], summary['test_count'],
+                         mtime, mtime if reviewed else None))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO reports (name, status, confidence, flag_count, field_count, "
+                "test_count, extracted_at, reviewed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def reconcile(self, extraction_dir, confirmed_dir=None):
+        """
+        Brings the index in step with the folder's files.
+
+        The first time (no 'built' marker) every file not yet reviewed is
+        (re)indexed, including results written before the index existed.
+        After that only files without a row are added, since every mode
+        indexes results as it writes them. Either way, rows whose file is
+        gone are dropped and review statuses are kept.
+
+        Returns:
+            tuple: (reports added, rows removed)
+        """
+        on_disk = set(result_names(extraction_dir))
+        with self._lock:
+            built = self._conn.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+            rows = self._conn.execute("SELECT name, status FROM reports").fetchall()
+        indexed = {name for name, _ in rows}
+        reviewed = {name for name, status in rows if status != 'pending'}
+
+        added = self.rebuild(extraction_dir, confirmed_dir,
+                             names=(on_disk if built is None else on_disk - indexed) - reviewed)
+        removed = self.remove(sorted(indexed - on_disk))
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', ?)",
+                               (str(time.time()),))
+        return added, removed
+
+    # ------------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------------
+
+    def list_reports(self, offset=0, limit=50, status=None, flagged=None, min_confidence=None,
+                     max_confidence=None, search=None, sort='extracted_at', descending=True):
+        """
+        One page of the report listing.
+
+        Args:
+            offset, limit: Page window
+            status: Only reports with this status
+            flagged: True for reports with flagged tests, False for none
+            min_confidence, max_confidence: Confidence bounds (inclusive)
+            search: Substring of the report name
+            sort: One of SORT_COLUMNS
+            descending: Sort direction (ties broken by name)
+
+        Returns:
+            tuple: (total matching reports, list of row dicts)
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by: {sort}")
+        if status is not None and status not in STATUSES:
+            raise ValueError(f"Unknown report status: {status}")
+
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if flagged is not None:
+            conditions.append("flag_count > 0" if flagged else "flag_count = 0")
+        if min_confidence is not None:
+            conditions.append("confidence >= ?")
+            params.append(min_confidence)
+        if max_confidence is not None:
+            conditions.append("confidence <= ?")
+            params.append(max_confidence)
+        if search:
+            conditions.append("instr(name, ?) > 0")
+            params.append(search)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if descending else "ASC"
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM reports {where}", params).fetchone()[0]
+            cursor = self._conn.execute(
+                f"SELECT * FROM reports {where} ORDER BY {sort} {direction}, name {direction} "
+                f"LIMIT ? OFFSET ?", params + [limit, offset])
+            columns = [c[0] for c in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return total, rows
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(extraction_dir):
+    """Process-wide ReportIndex for an extraction folder, opened on first use."""
+    path = os.path.abspath(index_path(extraction_dir))
+    key = (os.getpid(), path)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = ReportIndex(path)
+        return _indexes[key]
+
+
+def record_extraction(extraction_dir, name, result):
+    """Keeps the folder's index in step with a newly written result (never fails the caller)."""
+    try:
+        get_index(extraction_dir).record_extraction(name, result)
+    except sqlite3.Error as e:
+        print(f"  [Warning] Could not index {name}: {e}")
+
+
+def forget_extractions(extraction_dir, names):
+    """Removes deleted results from the folder's index (never fails the caller)."""
+    if not names:
+        return
+    try:
+        get_index(extraction_dir).remove(names)
+    except sqlite3.Error as e:
+        print(f"  [Warning] Could not unindex {len(names)} result(s): {e}")
@@ -0,0 +1,196 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Result Cache: Content-hash cache of per-page tokens and extraction results
+# =============================================================================
+
+import os
+import json
+import hashlib
+import pandas as pd
+
+from module_one import PREPROCESSING_VERSION
+from module_two import OCR_VERSION
+from module_three import EXTRACTION_VERSION, CATALOG
+
+DEFAULT_CACHE_DIR = ".pipeline_cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB
+
+MANIFEST_FILE = "manifest.json"
+ENTRY_SUFFIX = ".json"
+
+
+def config_version():
+    """Version string covering every stage (and the analyte catalog) whose output is cached."""
+    return (f"pre{PREPROCESSING_VERSION}-ocr{OCR_VERSION}-ext{EXTRACTION_VERSION}"
+            f"-cat{CATALOG.source_sha256[:12]}")
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Persistent cache of pipeline results keyed on input content + config.
+
+    Each report is stored as one JSON entry holding the tokens and extraction
+    result of every page. Entries are evicted least-recently-used first
+    (tracked through file mtimes) once the cache exceeds max_bytes.
+
+    A manifest remembers the (size, mtime) of every hashed input so unchanged
+    files are recognised without re-reading them.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._manifest_path = os.path.join(cache_dir, MANIFEST_FILE)
+        self._manifest = {}
+        if os.path.exists(self._manifest_path):
+            try:
+                with open(self._manifest_path, 'r') as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                print("  [Warning] Cache manifest unreadable, rebuilding it.")
+
+    # ------------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------------
+
+    def report_key(self, input_path, options=None):
+        """Cache key for an input file: sha256(contents) + config version + run options."""
+        stat = os.stat(input_path)
+        abs_path = os.path.abspath(input_path)
+        known = self._manifest.get(abs_path)
+
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            content_hash = known['sha256']
+        else:
+            content_hash = file_sha256(input_path)
+            self._manifest[abs_path] = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha256': content_hash,
+            }
+
+        options_json = json.dumps(options or {}, sort_keys=True)
+        return hashlib.sha256(f"{content_hash}|{config_version()}|{options_json}".encode()).hexdigest()
+
+    def forget_missing_inputs(self, input_folder):
+        """
+        Drops manifest entries of inputs in input_folder that no longer exist.
+
+        Returns:
+            list: File names of the removed inputs (their outputs are stale)
+        """
+        folder = os.path.abspath(input_folder)
+        missing = [path for path in self._manifest
+                   if os.path.dirname(path) == folder and not os.path.exists(path)]
+        for path in missing:
+            del self._manifest[path]
+        return sorted(os.path.basename(path) for path in missing)
+
+    def save_manifest(self):
+        """Persist the input-file manifest."""
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+
+    # ------------------------------------------------------------------------
+    # Entries
+    # ------------------------------------------------------------------------
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """
+        Look up a cached report.
+
+        Returns:
+            List of page dicts {'page', 'tokens' (DataFrame), 'result'},
+            or None on a cache miss
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Mark as recently used for LRU eviction
+        os.utime(entry_path)
+
+        return [
+            {
+                'page': page['page'],
+                'tokens': pd.DataFrame(page['tokens']),
+                'result': page['result'],
+            }
+            for page in entry['pages']
+        ]
+
+    def put(self, key, source_name, pages):
+        """
+        Store the results of every page of a report.
+
+        Args:
+            key: Key from report_key()
+            source_name: Input file name (informational)
+            pages: List of dicts {'page', 'tokens' (DataFrame), 'result'}
+        """
+        entry = {
+            'source': source_name,
+            'config_version': config_version(),
+            'pages': [
+                {
+                    'page': page['page'],
+                    'tokens': page['tokens'].to_dict('list'),
+                    'result': page['result'],
+                }
+                for page in pages
+            ],
+        }
+
+        entry_path = self._entry_path(key)
+        tmp_path = entry_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, separators=(',', ':'))
+        os.replace(tmp_path, entry_path)
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits max_bytes."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(ENTRY_SUFFIX) or name == MANIFEST_FILE:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+
+        return evicted
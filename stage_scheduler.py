@@ -0,0 +1,184 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Stage Scheduler: Thread pools per stage connected by bounded queues
+# =============================================================================
+
+import time
+import queue
+import threading
+
+# End-of-input marker passed down the queues (one per worker of the next stage)
+_DONE = object()
+
+
+class PipelineStage:
+    """
+    One step of a staged pipeline.
+
+    Args:
+        name (str): Label for progress and statistics
+        function: Called with each input item. Returns the output item (None
+                  drops it), or with expand=True an iterable of output items,
+                  each handed on as soon as it is produced
+        workers (int): Threads running this stage
+        queue_size (int): Capacity of the queue feeding this stage; a full
+                          queue blocks the stage before it (backpressure)
+        expand (bool): See function
+    """
+
+    def __init__(self, name, function, workers=1, queue_size=4, expand=False):
+        if workers < 1:
+            raise ValueError(f"Stage '{name}' needs at least one worker")
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.queue_size = max(1, queue_size)
+        self.expand = expand
+        self._lock = threading.Lock()
+        self.items = 0
+        self.failed = 0
+        self.busy = 0.0     # seconds spent in function, blocking on output excluded
+        self.idle = 0.0     # seconds workers waited for input
+        self.blocked = 0.0  # seconds workers waited for room downstream
+
+    def _account(self, busy=0.0, idle=0.0, blocked=0.0, failed=False):
+        with self._lock:
+            self.items += 1
+            self.failed += failed
+            self.busy += busy
+            self.idle += idle
+            self.blocked += blocked
+
+
+class StagedScheduler:
+    """
+    Runs a chain of stages concurrently, each on its own thread pool.
+
+    Stages are connected by bounded queues, so at most queue_size items wait
+    in front of each stage (plus one per worker in progress) and memory
+    stays bounded however many inputs there are: a slow stage fills its
+    queue, which blocks the stage feeding it, and so on up to the input.
+    Every stage works on different items at the same time, e.g. page n+1
+    is rasterized while page n is OCR'd and page n-1 extracted.
+
+    Threads suit stages whose work releases the GIL (OpenCV, Tesseract,
+    poppler subprocesses, file I/O).
+
+    An exception in a stage fails only that item: on_error(stage_name,
+    item, exception) is called and the item is dropped.
+    """
+
+    def __init__(self, stages, on_error=None):
+        if not stages:
+            raise ValueError("A scheduler needs at least one stage")
+        self.stages = stages
+        self.on_error = on_error
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._remaining = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+        self._results = []
+        self.wall = 0.0
+
+    def run(self, items):
+        """
+        Feeds items to the first stage and blocks until every stage has drained.
+
+        Returns:
+            list: Non-None outputs of the last stage, in completion order
+        """
+        threads = [threading.Thread(target=self._worker, args=(index,), daemon=True,
+                                    name=f"{stage.name}-{n}")
+                   for index, stage in enumerate(self.stages) for n in range(stage.workers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        first = self._queues[0]
+        for item in items:
+            first.put(item)
+        for _ in range(self.stages[0].workers):
+            first.put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        self.wall = time.perf_counter() - start
+        return self._results
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        inbox = self._queues[index]
+        while True:
+            waited = time.perf_counter()
+            item = inbox.get()
+            waited = time.perf_counter() - waited
+            if item is _DONE:
+                break
+
+            blocked = 0.0
+            start = time.perf_counter()
+            try:
+                if stage.expand:
+                    for output in stage.function(item):
+                        blocked += self._hand_on(index, output)
+                else:
+                    blocked += self._hand_on(index, stage.function(item))
+                failed = False
+            except Exception as e:
+                failed = True
+                self._report_error(stage, item, e)
+            stage._account(busy=time.perf_counter() - start - blocked, idle=waited,
+                           blocked=blocked, failed=failed)
+        self._worker_done(index)
+
+    def _hand_on(self, index, output):
+        """Passes an output to the next stage; returns the seconds spent blocked."""
+        if output is None:
+            return 0.0
+        if index + 1 == len(self.stages):
+            with self._lock:
+                self._results.append(output)
+            return 0.0
+        start = time.perf_counter()
+        self._queues[index + 1].put(output)
+        return time.perf_counter() - start
+
+    def _report_error(self, stage, item, error):
+        if self.on_error is None:
+            print(f"  [Error] {stage.name}: {type(error).__name__}: {error}")
+            return
+        try:
+            self.on_error(stage.name, item, error)
+        except Exception as e:
+            print(f"  [Error] {stage.name} error handler failed: {e}")
+
+    def _worker_done(self, index):
+        """The last worker of a stage to finish tells the next stage's workers to stop."""
+        with self._lock:
+            self._remaining[index] -= 1
+            last = self._remaining[index] == 0
+        if last and index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                self._queues[index + 1].put(_DONE)
+
+    def stats(self):
+        """Per-stage item counts and time split; utilization is busy / (workers * wall)."""
+        return [{
+            'stage': stage.name,
+            'workers': stage.workers,
+            'items': stage.items,
+            'failed': stage.failed,
+            'busy_s': round(stage.busy, 3),
+            'idle_s': round(stage.idle, 3),
+            'blocked_s': round(stage.blocked, 3),
+            'utilization': round(stage.busy / (stage.workers * self.wall), 3) if self.wall else None,
+        } for stage in self.stages]
+
+    def print_stats(self):
+        """Table of the stages; the busiest one is the bottleneck to give more workers."""
+        print(f"\n  {'stage':<12} {'workers':>7} {'items':>7} {'busy s':>8} {'idle s':>8} "
+              f"{'blocked s':>9} {'util':>6}")
+        for s in self.stats():
+            utilization = f"{s['utilization']:.0%}" if s['utilization'] is not None else '-'
+            print(f"  {s['stage']:<12} {s['workers']:>7} {s['items']:>7} {s['busy_s']:>8.2f} "
+                  f"{s['idle_s']:>8.2f} {s['blocked_s']:>9.2f} {utilization:>6}")
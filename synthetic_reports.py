@@ -0,0 +1,370 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Synthetic Reports: Lab reports with known ground truth for benchmarks
+# =============================================================================
+
+import os
+import json
+import time
+import random
+import argparse
+from functools import lru_cache
+
+import cv2
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageDraw, ImageFont
+
+from module_one import page_output_name
+from module_three import CATALOG
+from token_store import save_report_tokens
+
+# A4 at 300 DPI; coordinates below are for 300 DPI and scaled for other resolutions
+PAGE_WIDTH = 2480
+PAGE_HEIGHT = 3508
+FONT_SIZE = 40
+LINE_HEIGHT = 70
+MARGIN = 150
+TABLE_COLUMNS = [150, 1050, 1350, 1750]  # test name, result, unit, reference range
+
+ROTATIONS = [0, 90, 180, 270]
+
+PDF_DATE = time.gmtime(1704067200)  # 2024-01-01
+
+HOSPITALS = ['City Care Hospital', 'Green Valley Clinic', 'Sunrise Diagnostic Centre',
+             'Lakeview Medical Center']
+FIRST_NAMES = ['Asha', 'Rahul', 'Priya', 'Vikram', 'Meera', 'Arjun', 'Kavya', 'Rohan']
+LAST_NAMES = ['Verma', 'Sharma', 'Iyer', 'Mehta', 'Nair', 'Kapoor', 'Reddy', 'Joshi']
+
+# Reference ranges for analytes whose catalog entry has none
+DEFAULT_RANGE = (70.0, 140.0)
+
+# OCR-style character confusions applied to noisy synthetic tokens
+CONFUSIONS = {'0': 'O', 'O': '0', '1': 'l', 'l': '1', '5': 'S', 'S': '5', '8': 'B', '.': ','}
+
+
+# ============================================================================
+# GROUND TRUTH
+# ============================================================================
+
+def _format_number(value, decimals):
+    return f"{value:.{decimals}f}" if decimals else str(int(round(value)))
+
+
+def random_test(analyte, rng):
+    """One test row for a catalog analyte: a value inside its reference range."""
+    low, high = analyte.range if analyte.range is not None else DEFAULT_RANGE
+    decimals = 1 if high <= 20 else 0
+    # Reference range: the middle of the plausible range; the value falls inside it
+    ref_low = low + (high - low) * rng.uniform(0.15, 0.3)
+    ref_high = low + (high - low) * rng.uniform(0.6, 0.85)
+    value = rng.uniform(ref_low, ref_high)
+    return {
+        'test_name': analyte.name,
+        'value': _format_number(value, decimals),
+        'unit': analyte.unit or '',
+        'reference_range': f"{_format_number(ref_low, decimals)} - {_format_number(ref_high, decimals)}",
+    }
+
+
+def random_fields(rng):
+    """Demographic header values, as module_three.extract_fields should return them."""
+    return {
+        'Hospital': rng.choice(HOSPITALS),
+        'Name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        'Patient ID': f"LAB{rng.randint(10000, 999999)}",
+        'Age': str(rng.randint(1, 95)),
+        'Gender': rng.choice(['Male', 'Female']),
+        'Date': f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2018, 2025)}",
+        'Doctor': f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+    }
+
+
+def generate_report(rng, name, pages=1, tests_per_page=8):
+    """
+    Ground truth of a synthetic report.
+
+    Every page repeats the patient header (as printed reports do) above its
+    own table of tests; a test appears on one page only. tests_per_page is
+    capped by the number of analytes in the catalog.
+
+    Returns:
+        dict: {'report', 'pages': [{'page', 'fields', 'tests'}]}
+    """
+    analytes = list(CATALOG.analytes)
+    fields = random_fields(rng)
+    tests_per_page = min(tests_per_page, len(analytes))
+    result_pages = []
+    for page_number in range(1, pages + 1):
+        chosen = rng.sample(analytes, tests_per_page)
+        result_pages.append({'page': page_number, 'fields': dict(fields),
+                             'tests': [random_test(a, rng) for a in chosen]})
+    return {'report': name, 'pages': result_pages}
+
+
+# ============================================================================
+# LAYOUT
+# ============================================================================
+
+@lru_cache(maxsize=8)
+def _font(size):
+    return ImageFont.load_default(size=size)
+
+
+def _line_words(text, left, top, font):
+    """Word boxes of one line of text starting at (left, top)."""
+    words = []
+    space = font.getlength(' ')
+    x = left
+    for word in text.split():
+        x0, y0, x1, y1 = font.getbbox(word)
+        words.append({'text': word, 'left': int(x + x0), 'top': int(top + y0),
+                      'width': int(x1 - x0), 'height': int(y1 - y0)})
+        x += font.getlength(word) + space
+    return words
+
+
+def layout_page(page, dpi=300):
+    """
+    Word boxes of a page, in reading order.
+
+    Args:
+        page (dict): One entry of generate_report()['pages']
+        dpi (int): Resolution the boxes are computed for
+
+    Returns:
+        list: {'text', 'left', 'top', 'width', 'height'} per word
+    """
+    scale = dpi / 300
+    font = _font(max(8, int(FONT_SIZE * scale)))
+    fields = page['fields']
+    words = []
+    y = MARGIN
+
+    def line(text, x=MARGIN):
+        words.extend(_line_words(text, int(x * scale), int(y * scale), font))
+
+    header = [
+        fields['Hospital'],
+        "LABORATORY REPORT",
+        f"Patient Name: {fields['Name']}",
+        f"Patient ID: {fields['Patient ID']}",
+        f"Age: {fields['Age']} years",
+        f"Gender: {fields['Gender']}",
+        f"Date: {fields['Date']}",
+        f"Doctor: {fields['Doctor']}",
+    ]
+    for text in header:
+        line(text)
+        y += LINE_HEIGHT
+    y += LINE_HEIGHT
+
+    for x, text in zip(TABLE_COLUMNS, ['Test Name', 'Result', 'Unit', 'Reference Range']):
+        line(text, x)
+    y += LINE_HEIGHT
+    for test in page['tests']:
+        cells = [test['test_name'], test['value'], test['unit'], test['reference_range']]
+        for x, text in zip(TABLE_COLUMNS, cells):
+            if text:
+                line(text, x)
+        y += LINE_HEIGHT
+    return words
+
+
+# ============================================================================
+# RENDERING
+# ============================================================================
+
+def render_page(words, dpi=300, rotation=0, skew=0.0, noise=0.0, seed=0):
+    """
+    Rasterizes a page layout as a grayscale scan.
+
+    Args:
+        words (list): layout_page() output (for the same dpi)
+        dpi (int): Resolution
+        rotation (int): Clockwise page rotation, one of ROTATIONS. module_one
+                        should report the same value as the rotation to undo.
+        skew (float): Small counter-clockwise rotation in degrees
+        noise (float): 0-1, Gaussian noise and speckle strength
+        seed (int): Seed of the noise
+
+    Returns:
+        np.ndarray: uint8 grayscale page
+    """
+    scale = dpi / 300
+    size = (int(PAGE_WIDTH * scale), int(PAGE_HEIGHT * scale))
+    image = Image.new('L', size, 255)
+    font = _font(max(8, int(FONT_SIZE * scale)))
+    draw = ImageDraw.Draw(image)
+    for word in words:
+        # getbbox offsets are relative to the drawing origin; undo them
+        x0, y0, _, _ = font.getbbox(word['text'])
+        draw.text((word['left'] - x0, word['top'] - y0), word['text'], fill=0, font=font)
+    page = np.array(image)
+
+    if skew:
+        h, w = page.shape
+        matrix = cv2.getRotationMatrix2D((w // 2, h // 2), skew, 1.0)
+        page = cv2.warpAffine(page, matrix, (w, h), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+
+    if noise > 0:
+        np_rng = np.random.default_rng(seed)
+        noisy = page.astype(np.float32) + np_rng.normal(0, 40 * noise, page.shape)
+        speckle = np_rng.random(page.shape) < 0.01 * noise
+        noisy[speckle] = np_rng.choice([0, 255], size=int(speckle.sum()))
+        page = np.clip(noisy, 0, 255).astype(np.uint8)
+
+    if rotation == 90:
+        page = cv2.rotate(page, cv2.ROTATE_90_CLOCKWISE)
+    elif rotation == 180:
+        page = cv2.rotate(page, cv2.ROTATE_180)
+    elif rotation == 270:
+        page = cv2.rotate(page, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return page
+
+
+# ============================================================================
+# SYNTHETIC TOKENS
+# ============================================================================
+
+def _confuse(text, rng):
+    """Replaces one character the way OCR commonly misreads it."""
+    positions = [i for i, ch in enumerate(text) if ch in CONFUSIONS]
+    if not positions:
+        return text
+    i = rng.choice(positions)
+    return text[:i] + CONFUSIONS[text[i]] + text[i + 1:]
+
+
+def synthetic_tokens(words, noise=0.0, seed=0):
+    """
+    OCR tokens for a page layout, as module_two would produce them.
+
+    With noise > 0 a share of the tokens is degraded: a misread character,
+    a low confidence, and vertical jitter of up to noise * 20 px.
+
+    Returns:
+        DataFrame: [conf, text, left, top, width, height]
+    """
+    rng = random.Random(seed)
+    rows = []
+    for word in words:
+        text, conf = word['text'], rng.randint(88, 97)
+        top = word['top']
+        if noise > 0:
+            if rng.random() < noise * 0.3:
+                text = _confuse(text, rng)
+            if rng.random() < noise * 0.2:
+                conf = rng.randint(20, 60)
+            top += int(round(rng.uniform(-1, 1) * noise * 20))
+        rows.append((float(conf), text, float(word['left']), float(top),
+                     float(word['width']), float(word['height'])))
+    return pd.DataFrame(rows, columns=['conf', 'text', 'left', 'top', 'width', 'height'])
+
+
+# ============================================================================
+# DATASET
+# ============================================================================
+
+def random_scan_settings(rng, rotation=0, skew=0.0, noise=0.0):
+    """
+    Per-page render_page() settings: `rotation` is a fixed value or 'random'
+    (any of ROTATIONS); skew is a maximum (uniform in [-skew, skew]).
+    """
+    return {
+        'rotation': rng.choice(ROTATIONS) if rotation == 'random' else int(rotation),
+        'skew': round(rng.uniform(-skew, skew), 2) if skew else 0.0,
+        'noise': noise,
+        'seed': rng.randrange(2 ** 32),
+    }
+
+
+def synthetic_dataset(reports=5, pages=1, tests_per_page=8, rotation=0, skew=0.0, noise=0.0,
+                      dpi=300, seed=0):
+    """
+    Yields synthetic reports as (truth, page_words, page_tokens).
+
+    Each truth page records its scan settings ('scan'), so the scan is
+    rendered on demand with render_page(words, dpi, **page['scan']). The
+    same arguments always produce the same reports, and the noise level
+    only changes the degradation, not the report contents or rotations.
+    """
+    rng = random.Random(seed)
+    for i in range(reports):
+        truth = generate_report(rng, f"synthetic_{i:04d}", pages, tests_per_page)
+        page_words, page_tokens = [], []
+        for page in truth['pages']:
+            page['scan'] = random_scan_settings(rng, rotation, skew, noise)
+            words = layout_page(page, dpi)
+            page_words.append(words)
+            page_tokens.append((page['page'], synthetic_tokens(words, noise, page['scan']['seed'])))
+        yield truth, page_words, page_tokens
+
+
+def save_pdf(path, images, dpi=300):
+    """Writes grayscale page images as an image-only (scanned) PDF."""
+    pil_pages = [Image.fromarray(image) for image in images]
+    # Fixed dates keep the file byte-identical between runs
+    pil_pages[0].save(path, save_all=True, append_images=pil_pages[1:], resolution=dpi,
+                      creationDate=PDF_DATE, modDate=PDF_DATE)
+
+
+def write_dataset(output_dir, reports=5, pages=1, tests_per_page=8, rotation=0, skew=0.0,
+                  noise=0.0, dpi=300, file_format='pdf', seed=0):
+    """
+    Writes synthetic reports: a scan (PDF or one PNG per page), a token
+    store in the CSV layout and a ground-truth JSON per report.
+
+    The truth file records each page's scan settings; the same seed always
+    produces the same files.
+
+    Returns:
+        list: Ground truth of the reports written
+    """
+    input_dir = os.path.join(output_dir, 'input_reports')
+    tokens_dir = os.path.join(output_dir, 'tokens')
+    truth_dir = os.path.join(output_dir, 'ground_truth')
+    for folder in (input_dir, tokens_dir, truth_dir):
+        os.makedirs(folder, exist_ok=True)
+
+    truths = []
+    for truth, page_words, page_tokens in synthetic_dataset(reports, pages, tests_per_page, rotation,
+                                                            skew, noise, dpi, seed):
+        name = truth['report']
+        images = [render_page(words, dpi, **page['scan'])
+                  for page, words in zip(truth['pages'], page_words)]
+        if file_format == 'pdf':
+            save_pdf(os.path.join(input_dir, f"{name}.pdf"), images, dpi)
+        else:
+            for page, image in zip(truth['pages'], images):
+                cv2.imwrite(os.path.join(input_dir, f"{page_output_name(name, page['page'])}.png"), image)
+        save_report_tokens(tokens_dir, name, page_tokens, 'csv')
+        with open(os.path.join(truth_dir, f"{name}.json"), 'w') as f:
+            json.dump(truth, f, indent=2, ensure_ascii=False)
+        truths.append(truth)
+    return truths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic lab reports with ground truth.")
+    parser.add_argument("output_dir", help="Folder for input_reports/, tokens/ and ground_truth/")
+    parser.add_argument("--reports", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=1, help="Pages per report")
+    parser.add_argument("--tests", type=int, default=8, help="Table rows per page")
+    parser.add_argument("--rotation", default="0", choices=[str(r) for r in ROTATIONS] + ['random'])
+    parser.add_argument("--skew", type=float, default=0.0, help="Maximum skew in degrees")
+    parser.add_argument("--noise", type=float, default=0.0, help="Scan and token noise, 0-1")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--format", choices=['pdf', 'png'], default='pdf')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    truths = write_dataset(args.output_dir, args.reports, args.pages, args.tests, args.rotation,
+                           args.skew, args.noise, args.dpi, args.format, args.seed)
+    print(f"Wrote {len(truths)} report(s) of {args.pages} page(s) to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Tests: Text-region detection and region OCR without overlapping crops
+# =============================================================================
+
+import cv2
+import numpy as np
+import pytest
+
+import ocr_backend
+from layout_analysis import detect_text_regions, merge_overlapping_regions
+from module_two import ocr_page_regions
+
+WORD_W, WORD_H = 80, 30
+
+
+class InkBoxBackend:
+    """Stand-in OCR engine: one token per blob of ink in the image it is given."""
+
+    name = 'ink-boxes'
+
+    def image_to_data(self, image):
+        ink = (np.asarray(image) < 128).astype(np.uint8)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        boxes = stats[1:]
+        return {'conf': [95] * len(boxes), 'text': ['Hemoglobin'] * len(boxes),
+                'left': [int(b[0]) for b in boxes], 'top': [int(b[1]) for b in boxes],
+                'width': [int(b[2]) for b in boxes], 'height': [int(b[3]) for b in boxes]}
+
+    def detect_rotation(self, image):
+        return 0
+
+
+@pytest.fixture
+def ink_backend():
+    previous = ocr_backend._backend
+    ocr_backend._backend = InkBoxBackend()
+    yield
+    ocr_backend._backend = previous
+
+
+def l_shaped_page():
+    """
+    A header line across the page with a column hanging from its left end
+    (one L-shaped blob), and a separate right column inside the L's box.
+    """
+    page = np.full((1500, 1200), 255, np.uint8)
+    words = []
+    for y in [100] + list(range(160, 1400, 60)):
+        xs = range(100, 1100, 100) if y == 100 else range(100, 400, 100)
+        words += [(x, y) for x in xs]
+    words += [(x, y) for y in range(300, 1200, 60) for x in range(700, 1000, 100)]
+    for x, y in words:
+        page[y:y + WORD_H, x:x + WORD_W] = 0
+    return page, words
+
+
+def overlaps(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def test_nested_blocks_become_one_region():
+    page, _ = l_shaped_page()
+    regions = detect_text_regions(page)
+    assert len(regions) == 1
+    x, y, w, h = regions[0]
+    assert (x, y) <= (100, 100) and x + w >= 1100 and y + h >= 1400
+
+
+def test_merge_overlapping_regions():
+    # Two overlapping boxes, a box nested in the union, and a separate one
+    regions = [(0, 0, 100, 50), (80, 40, 100, 50), (20, 20, 10, 10), (300, 0, 50, 50)]
+    assert merge_overlapping_regions(regions) == [(0, 0, 180, 90), (300, 0, 50, 50)]
+    # A union that reaches a box neither part overlapped on its own
+    regions = [(0, 0, 10, 100), (90, 0, 10, 100), (0, 0, 100, 10)]
+    assert merge_overlapping_regions(regions) == [(0, 0, 100, 100)]
+
+
+def test_overlapping_regions_are_ocrd_once(ink_backend):
+    page, words = l_shaped_page()
+    # The L blob's box and the right column's box, as detected before merging
+    regions = [(76, 80, 1048, 1360), (676, 280, 348, 920)]
+    assert overlaps(*regions)
+
+    tokens = ocr_page_regions(page, regions=regions, max_coverage=1.0)
+    found = sorted(zip(tokens['left'], tokens['top']))
+    assert found == sorted(words)
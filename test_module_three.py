@@ -0,0 +1,129 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Tests: Line grouping of Module 3 against the original iterrows() version
+# =============================================================================
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from module_three import (group_tokens_into_lines, group_tokens_into_token_lines,
+                          merge_multi_page_results, merge_report_pages, merged_result_name)
+
+TOLERANCES = [5, 20, 40]
+
+
+def reference_group_tokens_into_lines(df, y_tolerance=20):
+    """The original row-by-row grouping, kept as the behaviour to match."""
+    lines = []
+    df_sorted = df.sort_values(['top', 'left']).reset_index(drop=True)
+
+    current_line = []
+    current_y = None
+
+    for _, row in df_sorted.iterrows():
+        if current_y is None or abs(row['top'] - current_y) <= y_tolerance:
+            current_line.append(row.to_dict())
+            # Update running average of y-coordinate
+            current_y = row['top'] if current_y is None else (current_y + row['top']) / 2
+        else:
+            # Start new line
+            if current_line:
+                lines.append(sorted(current_line, key=lambda x: x['left']))
+            current_line = [row.to_dict()]
+            current_y = row['top']
+
+    # Add final line
+    if current_line:
+        lines.append(sorted(current_line, key=lambda x: x['left']))
+
+    return lines
+
+
+def random_tokens(rng, n, top_values):
+    """n tokens with tops drawn from top_values (few values -> many ties)."""
+    return pd.DataFrame({
+        'text': [f"w{i}" for i in range(n)],
+        'left': rng.integers(0, 2000, n),
+        'top': rng.choice(top_values, n),
+        'width': rng.integers(10, 200, n),
+        'height': rng.integers(20, 40, n),
+        'conf': rng.integers(0, 100, n),
+    })
+
+
+def assert_same_grouping(df, y_tolerance):
+    expected = reference_group_tokens_into_lines(df, y_tolerance)
+    assert group_tokens_into_lines(df, y_tolerance) == expected
+
+    token_lines = group_tokens_into_token_lines(df, y_tolerance)
+    assert len(token_lines) == len(expected)
+    for i, line in enumerate(expected):
+        assert token_lines.line_tokens(i) == [token['text'] for token in line]
+        assert token_lines.avg_conf[i] == sum(token['conf'] for token in line) / len(line)
+
+
+@pytest.mark.parametrize("y_tolerance", TOLERANCES)
+@pytest.mark.parametrize("seed", range(20))
+def test_random_tops(seed, y_tolerance):
+    rng = np.random.default_rng(seed)
+    df = random_tokens(rng, int(rng.integers(1, 300)), np.arange(0, 3000))
+    assert_same_grouping(df, y_tolerance)
+
+
+@pytest.mark.parametrize("y_tolerance", TOLERANCES)
+@pytest.mark.parametrize("seed", range(20))
+def test_tied_tops(seed, y_tolerance):
+    rng = np.random.default_rng(1000 + seed)
+    # Few distinct tops, spaced around the tolerances: ties and chained
+    # segments wider than the tolerance (the running-average scan)
+    tops = np.cumsum(rng.integers(1, 30, 12))
+    df = random_tokens(rng, int(rng.integers(1, 200)), tops)
+    assert_same_grouping(df, y_tolerance)
+
+
+@pytest.mark.parametrize("y_tolerance", TOLERANCES)
+def test_float_tops(y_tolerance):
+    rng = np.random.default_rng(7)
+    df = random_tokens(rng, 250, np.arange(0, 3000))
+    df['top'] = df['top'] + rng.random(len(df))
+    assert_same_grouping(df, y_tolerance)
+
+
+def test_single_token():
+    df = pd.DataFrame({'text': ['Hb'], 'left': [10], 'top': [5], 'width': [20],
+                       'height': [10], 'conf': [90]})
+    assert_same_grouping(df, 20)
+
+
+def write_page_results(extraction_dir, stem, test_name):
+    with open(os.path.join(extraction_dir, f"{stem}_extracted.json"), 'w') as f:
+        json.dump({'fields': {}, 'test_results': [{'test_name': test_name}]}, f)
+
+
+def test_merged_name_keeps_report_digits():
+    assert merged_result_name('lab_2024_page_01') == 'lab_2024_page_merged.json'
+    assert merged_result_name('scan_2_page_03') == 'scan_2_page_merged.json'
+    assert merged_result_name('report_page_12') == 'report_page_merged.json'
+
+
+def test_batch_and_per_report_merge_agree(tmp_path):
+    extraction_dir = str(tmp_path)
+    for base in ('lab_2024', 'lab_2025'):
+        for page in (1, 2):
+            write_page_results(extraction_dir, f"{base}_page_{page:02d}", f"{base} test {page}")
+
+    assert merge_report_pages(extraction_dir, ['lab_2024_page_01', 'lab_2024_page_02']) \
+        == 'lab_2024_page_merged.json'
+    merge_multi_page_results(extraction_dir)
+
+    merged = sorted(f for f in os.listdir(extraction_dir) if f.endswith('_merged.json'))
+    assert merged == ['lab_2024_page_merged.json', 'lab_2025_page_merged.json']
+    for base in ('lab_2024', 'lab_2025'):
+        with open(os.path.join(extraction_dir, f"{base}_page_merged.json")) as f:
+            tests = [test['test_name'] for test in json.load(f)['test_results']]
+        assert tests == [f"{base} test 1", f"{base} test 2"]
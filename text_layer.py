@@ -0,0 +1,113 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Text Layer: Word boxes from born-digital PDFs (poppler pdftotext -bbox)
+# =============================================================================
+
+import re
+import html
+import subprocess
+import pandas as pd
+
+from metrics import stage
+
+# Confidence assigned to words taken from the PDF itself rather than OCR
+TEXT_LAYER_CONF = 100
+
+TOKEN_COLUMNS = ['conf', 'text', 'left', 'top', 'width', 'height']
+
+PAGE_PATTERN = re.compile(r'<page\b[^>]*>(.*?)</page>', re.DOTALL)
+WORD_PATTERN = re.compile(
+    r'<word xMin="([-\d.]+)" yMin="([-\d.]+)" xMax="([-\d.]+)" yMax="([-\d.]+)">(.*?)</word>',
+    re.DOTALL,
+)
+
+# Characters expected in real text; broken font encodings produce other glyphs
+READABLE_PATTERN = re.compile(r'[A-Za-z0-9.,:;/%()\-+<>=&\'"#*μ]')
+
+
+def parse_bbox_html(bbox_html, dpi=300):
+    """
+    Converts `pdftotext -bbox` output into one token DataFrame per page.
+
+    PDF coordinates (points, 1/72 inch) are scaled to pixels at the given
+    DPI so the tokens line up with what OCR of a page rendered at that DPI
+    would produce (module_three's line tolerances are in those pixels).
+
+    Args:
+        bbox_html (str): XHTML written by pdftotext -bbox
+        dpi (int): Resolution the coordinates are expressed in
+
+    Returns:
+        list: DataFrames with columns [conf, text, left, top, width, height]
+    """
+    scale = dpi / 72.0
+    pages = []
+
+    for page_body in PAGE_PATTERN.findall(bbox_html):
+        rows = []
+        for x_min, y_min, x_max, y_max, text in WORD_PATTERN.findall(page_body):
+            text = html.unescape(text).strip()
+            if not text:
+                continue
+            left = round(float(x_min) * scale)
+            top = round(float(y_min) * scale)
+            rows.append((TEXT_LAYER_CONF, text, left, top,
+                         round(float(x_max) * scale) - left, round(float(y_max) * scale) - top))
+        pages.append(pd.DataFrame(rows, columns=TOKEN_COLUMNS))
+
+    return pages
+
+
+def read_text_layer(pdf_path, first_page=1, last_page=None, dpi=300):
+    """
+    Extracts the embedded words of a PDF with their bounding boxes.
+
+    A single pdftotext call covers the whole page range.
+
+    Args:
+        pdf_path (str): Path to the PDF
+        first_page (int): First 1-based page
+        last_page (int): Last page (default: end of document)
+        dpi (int): Resolution the coordinates are expressed in
+
+    Returns:
+        dict: page_number -> token DataFrame (empty for pages without text),
+              or an empty dict if pdftotext is unavailable or fails
+    """
+    command = ['pdftotext', '-bbox', '-f', str(first_page)]
+    if last_page is not None:
+        command += ['-l', str(last_page)]
+    command += [pdf_path, '-']
+
+    with stage('text_layer'):
+        try:
+            completed = subprocess.run(command, capture_output=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"  [Warning] Could not read text layer of {pdf_path}: {e}")
+            return {}
+
+        pages = parse_bbox_html(completed.stdout.decode('utf-8', errors='replace'), dpi=dpi)
+    return {first_page + i: tokens for i, tokens in enumerate(pages)}
+
+
+def has_usable_text_layer(tokens, min_words=10, min_readable_ratio=0.9):
+    """
+    Decides whether a page's text layer can replace OCR.
+
+    Scanned pages have no words (or a handful from stamps/annotations);
+    PDFs with broken font encodings yield words made of unreadable glyphs.
+
+    Args:
+        tokens (DataFrame): Output of read_text_layer for one page
+        min_words (int): Minimum number of words
+        min_readable_ratio (float): Minimum share of ordinary characters
+
+    Returns:
+        bool: True if the tokens should be used instead of OCR
+    """
+    if tokens is None or len(tokens) < min_words:
+        return False
+    text = ''.join(tokens['text'])
+    readable = len(READABLE_PATTERN.findall(text))
+    return readable / len(text) >= min_readable_ratio
@@ -0,0 +1,281 @@
+# =============================================================================
+# Student Name: Soham Chawla
+# Student ID: 2022A7PS0069P
+# Token Store: One binary columnar token file per report (replaces per-page CSV)
+# =============================================================================
+
+import os
+import re
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+
+from module_one import page_output_name
+
+STORE_SUFFIX = "_tokens.bin"
+CSV_SUFFIX = "_tokens.csv"
+STORE_MAGIC = b"LRTOKENS"
+STORE_FORMAT_VERSION = 1
+
+TOKEN_FORMATS = ['bin', 'csv']
+
+TOKEN_COLUMNS = ['conf', 'text', 'left', 'top', 'width', 'height']
+BOX_COLUMNS = ['left', 'top', 'width', 'height']
+
+PAGE_STEM_PATTERN = re.compile(r'^(.*)_page_(\d+)$')
+
+_ALIGN = 8
+
+
+def report_store_path(tokens_dir, base_name):
+    """Path of the token store holding every page of a report."""
+    return os.path.join(tokens_dir, f"{base_name}{STORE_SUFFIX}")
+
+
+def _box_dtype(values):
+    """int16 boxes unless a coordinate does not fit (very large pages)."""
+    info = np.iinfo(np.int16)
+    if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+        return np.int16
+    return np.int32
+
+
+def write_report_tokens(path, pages, failed_pages=()):
+    """
+    Writes the tokens of every page of a report to one columnar file.
+
+    Layout: STORE_MAGIC, a uint32 header length and a JSON header (page
+    numbers and, for each column, its dtype, byte offset and length),
+    followed by 8-byte aligned little-endian column blocks:
+        offsets      uint32 row offset of each page (len(pages) + 1)
+        conf         uint8  confidence, rounded
+        left/top/width/height  int16 (int32 if a value does not fit)
+        text_offsets uint32 byte offsets into text_data (rows + 1)
+        text_data    uint8  UTF-8 token texts, concatenated (string table)
+
+    The header also lists the pages that failed, so a store missing pages
+    is recognisably partial rather than silently short.
+
+    Args:
+        path (str): Output path (written atomically)
+        pages (iterable): (page_number, tokens DataFrame) pairs
+        failed_pages (iterable): Page numbers of the report that produced no tokens
+    """
+    pages = sorted(pages, key=lambda p: p[0])
+    counts = [len(tokens) for _, tokens in pages]
+    if sum(counts):
+        df = pd.concat([tokens for _, tokens in pages], ignore_index=True)
+    else:
+        df = pd.DataFrame(columns=TOKEN_COLUMNS)
+
+    columns = {}
+    columns['offsets'] = np.concatenate(([0], np.cumsum(counts, dtype=np.int64))).astype('<u4')
+    columns['conf'] = np.clip(np.round(df['conf'].to_numpy(dtype=np.float64)), 0, 255).astype(np.uint8)
+    for col in BOX_COLUMNS:
+        values = df[col].to_numpy(dtype=np.int64)
+        columns[col] = values.astype(np.dtype(_box_dtype(values)).newbyteorder('<'))
+
+    encoded = [str(text).encode('utf-8') for text in df['text']]
+    columns['text_offsets'] = np.concatenate(
+        ([0], np.cumsum([len(b) for b in encoded], dtype=np.int64))).astype('<u4')
+    columns['text_data'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    # Column offsets are relative to the end of the (padded) header
+    layout = {}
+    position = 0
+    for name, array in columns.items():
+        layout[name] = {'dtype': array.dtype.str, 'offset': position, 'length': len(array)}
+        position += -(-array.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({'version': STORE_FORMAT_VERSION, 'pages': [n for n, _ in pages],
+                         'failed': sorted(failed_pages), 'columns': layout}).encode('utf-8')
+    prefix_len = len(STORE_MAGIC) + 4 + len(header)
+    header += b' ' * (-prefix_len % _ALIGN)
+
+    # Unique temp file: job finishers and the watch daemon may write the same
+    # report's store at the same time
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(STORE_MAGIC)
+            f.write(len(header).to_bytes(4, 'little'))
+            f.write(header)
+            for array in columns.values():
+                f.write(array.tobytes())
+                f.write(b'\0' * (-array.nbytes % _ALIGN))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class TokenStore:
+    """
+    Lazy reader for a report's token file.
+
+    The file is memory-mapped and only its header is parsed on open;
+    columns are zero-copy views into the mapping, so only the bytes of the
+    pages actually read are paged in. Pages are materialized as DataFrames
+    one at a time.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        magic_len = len(STORE_MAGIC)
+        if self._data[:magic_len].tobytes() != STORE_MAGIC:
+            raise ValueError(f"Not a token store: {path}")
+        header_len = int.from_bytes(self._data[magic_len:magic_len + 4].tobytes(), 'little')
+        body = magic_len + 4 + header_len
+        header = json.loads(self._data[magic_len + 4:body].tobytes())
+        if header['version'] != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported token store version {header['version']}: {path}")
+
+        self.page_numbers = header['pages']
+        self.failed_pages = header.get('failed', [])
+        self._page_index = {n: i for i, n in enumerate(self.page_numbers)}
+        self._layout = header['columns']
+        self._body = body
+
+    def _column(self, name, start=0, end=None):
+        spec = self._layout[name]
+        dtype = np.dtype(spec['dtype'])
+        end = spec['length'] if end is None else end
+        first = self._body + spec['offset'] + start * dtype.itemsize
+        return self._data[first:first + (end - start) * dtype.itemsize].view(dtype)
+
+    def close(self):
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.page_numbers)
+
+    def __contains__(self, page_number):
+        return page_number in self._page_index
+
+    def token_count(self, page_number):
+        """Number of tokens on a page, read from the offsets column only."""
+        index = self._page_index[page_number]
+        start, end = (int(v) for v in self._column('offsets', index, index + 2))
+        return end - start
+
+    def page(self, page_number):
+        """Tokens of one page as a DataFrame [conf, text, left, top, width, height]."""
+        index = self._page_index[page_number]
+        start, end = (int(v) for v in self._column('offsets', index, index + 2))
+
+        text_offsets = self._column('text_offsets', start, end + 1)
+        base = int(text_offsets[0])
+        blob = self._column('text_data', base, int(text_offsets[-1])).tobytes()
+        bounds = (text_offsets - base).tolist()
+        texts = [blob[a:b].decode('utf-8') for a, b in zip(bounds[:-1], bounds[1:])]
+
+        data = {'conf': self._column('conf', start, end).astype(np.int64), 'text': texts}
+        for col in BOX_COLUMNS:
+            data[col] = self._column(col, start, end).astype(np.int64)
+        return pd.DataFrame(data, columns=TOKEN_COLUMNS)
+
+    def pages(self):
+        """Yields (page_number, tokens DataFrame) for every page."""
+        for page_number in self.page_numbers:
+            yield page_number, self.page(page_number)
+
+
+def save_report_tokens(tokens_dir, base_name, pages, token_format='bin', failed_pages=()):
+    """
+    Persists the tokens of a report in the chosen format.
+
+    'bin' writes a single store for the report, recording failed_pages in
+    its header; 'csv' writes the legacy <base>_page_NN_tokens.csv file per
+    non-empty page (failed pages simply have no file).
+    """
+    if token_format == 'bin':
+        write_report_tokens(report_store_path(tokens_dir, base_name), pages, failed_pages)
+    elif token_format == 'csv':
+        for page_number, tokens in pages:
+            if tokens is not None and not tokens.empty:
+                stem = page_output_name(base_name, page_number)
+                tokens.to_csv(os.path.join(tokens_dir, f"{stem}{CSV_SUFFIX}"), index=False)
+    else:
+        raise ValueError(f"Unknown token format: {token_format}")
+
+
+def load_page_tokens(tokens_dir, stem):
+    """
+    Tokens of a page from whichever format holds them.
+
+    Looks for the report's token store first and falls back to the
+    legacy per-page CSV.
+
+    Args:
+        tokens_dir (str): Token directory
+        stem (str): Page stem, e.g. 'report_page_01'
+
+    Returns:
+        DataFrame, or None if the page's tokens are not found
+    """
+    match = PAGE_STEM_PATTERN.match(stem)
+    if match:
+        store_path = report_store_path(tokens_dir, match.group(1))
+        if os.path.exists(store_path):
+            with TokenStore(store_path) as store:
+                page_number = int(match.group(2))
+                if page_number in store:
+                    return store.page(page_number)
+
+    csv_path = os.path.join(tokens_dir, f"{stem}{CSV_SUFFIX}")
+    if os.path.exists(csv_path):
+        return pd.read_csv(csv_path)
+    return None
+
+
+def page_token_count(tokens_dir, stem):
+    """
+    Number of tokens stored for a page, without materializing them.
+
+    Returns:
+        int, or None if the page's tokens are not found (see load_page_tokens)
+    """
+    match = PAGE_STEM_PATTERN.match(stem)
+    if match:
+        store_path = report_store_path(tokens_dir, match.group(1))
+        if os.path.exists(store_path):
+            with TokenStore(store_path) as store:
+                page_number = int(match.group(2))
+                if page_number in store:
+                    return store.token_count(page_number)
+
+    csv_path = os.path.join(tokens_dir, f"{stem}{CSV_SUFFIX}")
+    if os.path.exists(csv_path):
+        return len(pd.read_csv(csv_path, usecols=['conf']))
+    return None
+
+
+def iter_token_pages(tokens_dir):
+    """
+    Yields (stem, tokens DataFrame) for every page in a token directory.
+
+    Covers both token stores and legacy CSV files, in stem order.
+    """
+    entries = []
+    for file_name in os.listdir(tokens_dir):
+        if file_name.endswith(STORE_SUFFIX):
+            entries.append((file_name[:-len(STORE_SUFFIX)], file_name))
+        elif file_name.endswith(CSV_SUFFIX):
+            entries.append((file_name[:-len(CSV_SUFFIX)], file_name))
+
+    for name, file_name in sorted(entries):
+        path = os.path.join(tokens_dir, file_name)
+        if file_name.endswith(CSV_SUFFIX):
+            yield name, pd.read_csv(path)
+            continue
+        with TokenStore(path) as store:
+            for page_number, tokens in store.pages():
+                yield page_output_name(name, page_number), tokens